@@ -12,7 +12,7 @@ from tap import Tap  # pip install typed-argument-parser (https://github.com/swa
 import numpy as np
 
 import chemprop.data.utils
-from chemprop.data import set_cache_mol, empty_cache
+from chemprop.data import set_cache_max_bytes, set_cache_mol, empty_cache, set_features_cache, set_graph_cache
 from chemprop.features import get_available_features_generators
 
 
@@ -93,8 +93,20 @@ class CommonArgs(Tap):
     """Maximum number of data points to load."""
     num_workers: int = 8
     """Number of workers for the parallel data loading (0 means sequential)."""
+    featurization_workers: int = 0
+    """
+    Number of processes used to parse the molecules and generate the features when reading the data
+    (0 means in the main process). The datapoints are the same and in the same order as without workers.
+    """
     batch_size: int = 50
     """Batch size."""
+    factorized_bond_input: bool = False
+    """
+    Computes the bond input layer of the encoder as :code:`W_atom(f_atoms)[b2a] + W_bond(f_bond_features)` using the
+    atom and bond columns of :code:`W_i`, so that the atom features are not copied onto every bond of a batch.
+    The results are the same (up to floating point rounding) and existing checkpoints can be used in either mode.
+    Has no effect with :code:`atom_messages`.
+    """
     atom_descriptors: Literal['feature', 'descriptor'] = None
     """
     Custom extra atom descriptors.
@@ -115,10 +127,31 @@ class CommonArgs(Tap):
     """
     Whether to not cache the RDKit molecule for each SMILES string to reduce memory usage (cached by default).
     """
+    cache_graph_max_bytes: float = None
+    """
+    Maximum estimated memory in bytes of the in-memory cache of molecular graphs.
+    Once the cache is full, the least recently used graphs are evicted. Unbounded by default.
+    """
+    cache_mol_max_bytes: float = None
+    """
+    Maximum estimated memory in bytes of the in-memory cache of RDKit molecules.
+    Once the cache is full, the least recently used molecules are evicted. Unbounded by default.
+    """
     empty_cache: bool = False
     """
     Whether to empty all caches before training or predicting. This is necessary if multiple jobs are run within a single script and the atom or bond features change.
     """
+    graph_cache_path: str = None
+    """
+    Path to an SQLite file in which molecular graph featurizations are stored and reused across runs.
+    Graphs are keyed by the SMILES as written in the data and a hash of the featurization settings.
+    By default, graphs are not stored on disk.
+    """
+    features_cache_path: str = None
+    """
+    Path to a directory in which the outputs of :code:`features_generator` are stored and reused across runs.
+    Features are keyed by canonical SMILES and the features generator. By default, features are not stored on disk.
+    """
     constraints_path: str = None
     """
     Path to constraints applied to atomic/bond properties prediction.
@@ -236,6 +269,9 @@ class CommonArgs(Tap):
                                       'per input (i.e., number_of_molecules = 1).')
 
         set_cache_mol(not self.no_cache_mol)
+        set_cache_max_bytes(self.cache_graph_max_bytes, self.cache_mol_max_bytes)
+        set_graph_cache(self.graph_cache_path)
+        set_features_cache(self.features_cache_path)
 
         if self.empty_cache:
             empty_cache()
@@ -322,7 +358,12 @@ class TrainArgs(CommonArgs):
     Maximum number of molecules in dataset to allow caching.
     Below this number, caching is used and data loading is sequential.
     Above this number, caching is not used and data loading is parallel.
-    Use "inf" to always cache.
+    Use "inf" to always cache. Graphs are always cached if :code:`cache_graph_max_bytes` is set.
+    """
+    cache_eval_batches_max_bytes: float = None
+    """
+    Maximum estimated memory in bytes of the collated validation and test batches kept in memory after the first
+    epoch, so that later evaluations only run the model. Use "inf" for no limit. Not cached by default.
     """
     save_preds: bool = False
     """Whether to save test split predictions during training."""
@@ -356,6 +397,13 @@ class TrainArgs(CommonArgs):
     """Centers messages on atoms instead of on bonds."""
     undirected: bool = False
     """Undirected edges (always sum the two relevant bond vectors)."""
+    scatter_messages: bool = False
+    """
+    Sums the incoming messages of each atom with :code:`index_add_` over the list of bonds instead of gathering them
+    into a tensor padded to the maximum number of bonds of any atom in the batch. This gives the same results
+    (up to floating point summation order) as the padded aggregation, which also sums the messages of the padding
+    bond. Those are only zero without bias, so this cannot be combined with :code:`bias` (or :code:`bias_solvent`).
+    """
     ffn_hidden_size: int = None
     """Hidden dim for higher-capacity FFN (defaults to hidden_size)."""
     ffn_num_layers: int = 2
@@ -462,6 +510,28 @@ class TrainArgs(CommonArgs):
     """Maximum magnitude of gradient during training."""
     class_balance: bool = False
     """Trains with an equal number of positives and negatives in each batch."""
+    batch_max_atoms: int = None
+    """
+    Maximum total number of atoms in a batch. If provided (or if :code:`batch_max_bonds` is provided), batches hold
+    a varying number of molecules instead of :code:`batch_size` and training batches group molecules of similar size.
+    """
+    batch_max_bonds: int = None
+    """Maximum total number of bonds in a batch, like :code:`batch_max_atoms`."""
+    num_train_processes: int = 1
+    """
+    Number of local processes which train each model together on CPU with data parallelism (:code:`torch.distributed`
+    with the gloo backend). Each process trains on a shard of the batches of each epoch and the gradients are averaged
+    across processes, so the effective batch size is :code:`num_train_processes` times larger. The main process
+    evaluates and saves the model.
+    """
+    num_train_jobs: int = 1
+    """
+    Number of local processes which train the models of the ensemble and the folds of cross-validation concurrently.
+    The processes are forked from the main process so that they share the loaded and featurized data, and are split
+    first across folds and then across the models of each fold, with the PyTorch threads split evenly between them.
+    When the models of a fold train concurrently, model :code:`i` is initialized with :code:`pytorch_seed + i` and
+    shuffles the training data with :code:`seed + i`.
+    """
     spectra_activation: Literal['exp', 'softplus'] = 'exp'
     """Indicates which function to use in dataset_type spectra training to constrain outputs to be positive."""
     spectra_target_floor: float = 1e-8
@@ -497,6 +567,11 @@ class TrainArgs(CommonArgs):
     Default (False) is to use the checkpoint to freeze all encoders.
     (only relevant for number_of_molecules > 1, where checkpoint model has number_of_molecules = 1)
     """
+    precompute_frozen_encodings: bool = False
+    """
+    Computes the outputs of the encoder frozen with :code:`checkpoint_frzn` once before training so that each epoch
+    only runs the feed-forward layers. Dropout is not applied to the encoder outputs in this mode.
+    """
 
     def __init__(self, *args, **kwargs) -> None:
         super(TrainArgs, self).__init__(*args, **kwargs)
@@ -746,6 +821,21 @@ class TrainArgs(CommonArgs):
         if self.class_balance and self.dataset_type != 'classification':
             raise ValueError('Class balance can only be applied if the dataset type is classification.')
 
+        # Validate distributed training
+        if self.num_train_processes < 1:
+            raise ValueError(f'The number of training processes must be positive but got {self.num_train_processes}.')
+
+        if self.num_train_jobs < 1:
+            raise ValueError(f'The number of training jobs must be positive but got {self.num_train_jobs}.')
+
+        if self.num_train_processes > 1 and self.num_train_jobs > 1:
+            raise ValueError('Distributed training (num_train_processes > 1) cannot be combined with '
+                             'training several models concurrently (num_train_jobs > 1).')
+
+        if self.num_train_processes > 1 and self.cuda:
+            raise ValueError('Distributed training with num_train_processes > 1 is only available on CPU; '
+                             'use --no_cuda.')
+
         # Validate features
         if self.features_only and not (self.features_generator or self.features_path):
             raise ValueError('When using features_only, a features_generator or features_path must be provided.')
@@ -759,6 +849,10 @@ class TrainArgs(CommonArgs):
             raise ValueError('Undirected is unnecessary when using atom_messages '
                              'since atom_messages are by their nature undirected.')
 
+        if self.scatter_messages and (self.bias or (self.reaction_solvent and self.bias_solvent)):
+            raise ValueError('Scatter messages cannot be used with bias since the padded aggregation '
+                             'sums the nonzero messages of the padding bond.')
+
         # Validate split type settings
         if not (self.split_type == 'predetermined') == (self.folds_file is not None) == (self.test_fold_index is not None):
             raise ValueError('When using predetermined split type, must provide folds_file and test_fold_index.')
@@ -882,6 +976,15 @@ class TrainArgs(CommonArgs):
                 "quantile_loss_alpha should be in the range [0,0.5]"
             )
 
+        # Validate precomputing frozen encodings
+        if self.precompute_frozen_encodings:
+            if self.checkpoint_frzn is None:
+                raise ValueError('Encodings can only be precomputed when the encoder is frozen with `--checkpoint_frzn`.')
+            if self.freeze_first_only and self.number_of_molecules > 1:
+                raise ValueError('Encodings cannot be precomputed with `--freeze_first_only` since the other encoders are trained.')
+            if self.is_atom_bond_targets:
+                raise NotImplementedError('Encodings cannot be precomputed with `--is_atom_bond_targets`.')
+
 
 class PredictArgs(CommonArgs):
     """:class:`PredictArgs` includes :class:`CommonArgs` along with additional arguments used for predicting with a Chemprop model."""
@@ -896,6 +999,17 @@ class PredictArgs(CommonArgs):
     """Deprecated. Whether to calculate the variance of ensembles as a measure of epistemic uncertainty. If True, the variance is saved as an additional column for each target in the preds_path."""
     individual_ensemble_predictions: bool = False
     """Whether to return the predictions made by each of the individual models rather than the average of the ensemble"""
+    predict_chunk_size: int = None
+    """
+    Number of rows of the test CSV file to read and predict at a time. When set, predictions are appended to
+    :code:`preds_path` chunk by chunk so that memory use does not grow with the size of the file, and an interrupted
+    run with the same arguments resumes after the last completed chunk.
+    """
+    no_deduplicate_smiles: bool = False
+    """
+    Whether to predict every row separately. By default, rows with the same molecules (by canonical SMILES)
+    and features are predicted once and the predictions are copied to every such row.
+    """
     # Uncertainty arguments
     uncertainty_method: Literal[
         'mve',
@@ -974,6 +1088,19 @@ class PredictArgs(CommonArgs):
             raise ValueError('Found no checkpoints. Must specify --checkpoint_path <path> or '
                              '--checkpoint_dir <dir> containing at least one checkpoint.')
 
+        if self.predict_chunk_size is not None:
+            if self.predict_chunk_size <= 0:
+                raise ValueError('The prediction chunk size must be a positive integer.')
+            if chemprop.data.utils.is_compiled_dataset(self.test_path):
+                raise ValueError('Streaming predictions with --predict_chunk_size require a CSV test file.')
+            if any(path is not None for path in [self.features_path, self.phase_features_path,
+                                                 self.atom_descriptors_path, self.bond_descriptors_path]):
+                raise ValueError('Streaming predictions with --predict_chunk_size only support features computed '
+                                 'with --features_generator, not features loaded from files.')
+            if self.evaluation_methods is not None:
+                raise ValueError('Uncertainty evaluation requires all predictions at once and cannot be used '
+                                 'with --predict_chunk_size.')
+
         if self.ensemble_variance:
             if self.uncertainty_method in ['ensemble', None]:
                 warn(
@@ -1158,6 +1285,19 @@ class HyperoptArgs(TrainArgs):
         self.search_parameters = list(search_parameters)
 
 
+class CompileArgs(TrainArgs):
+    """:class:`CompileArgs` includes :class:`TrainArgs` along with additional arguments used for compiling a dataset."""
+
+    compiled_path: str
+    """Directory where the compiled dataset will be saved, which can then be used as :code:`--data_path`."""
+
+    def process_args(self) -> None:
+        super(CompileArgs, self).process_args()
+
+        if self.is_atom_bond_targets:
+            raise ValueError('Compiled datasets do not support atomic/bond targets.')
+
+
 class SklearnTrainArgs(TrainArgs):
     """:class:`SklearnTrainArgs` includes :class:`TrainArgs` along with additional arguments for training a scikit-learn model."""
 
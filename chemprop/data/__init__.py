@@ -1,8 +1,13 @@
-from .data import cache_graph, cache_mol, MoleculeDatapoint, MoleculeDataset, MoleculeDataLoader, \
-    MoleculeSampler, set_cache_graph, empty_cache, set_cache_mol
+from .data import cache_graph, cache_mol, cache_stats, features_cache, graph_cache, MoleculeBatchSampler, \
+    MoleculeDatapoint, MoleculeDataset, MoleculeDataLoader, MoleculeSampler, make_datapoint_pool, make_datapoints, \
+    set_cache_graph, empty_cache, set_cache_max_bytes, set_cache_mol, set_features_cache, set_graph_cache
+from .compiled import compile_dataset, CompiledDataset, is_compiled_dataset, load_compiled_dataset
+from .features_cache import FeaturesCache
+from .graph_cache import GraphCache
+from .lru_cache import LRUCache
 from .scaffold import generate_scaffold, log_scaffold_stats, scaffold_split, scaffold_to_smiles
 from .scaler import StandardScaler
-from .utils import filter_invalid_smiles, get_class_sizes, get_data, get_data_from_smiles, \
+from .utils import deduplicate_data, filter_invalid_smiles, get_class_sizes, get_data, get_data_chunks, get_data_from_smiles, \
     get_header, get_smiles, get_task_names, get_data_weights, preprocess_smiles_columns, split_data, \
     validate_data, validate_dataset_type, get_invalid_smiles_from_file, get_invalid_smiles_from_list
 
@@ -10,20 +15,38 @@ __all__ = [
     'cache_graph',
     'empty_cache',
     'cache_mol',
+    'cache_stats',
+    'compile_dataset',
+    'CompiledDataset',
+    'features_cache',
+    'FeaturesCache',
+    'graph_cache',
+    'GraphCache',
+    'is_compiled_dataset',
+    'load_compiled_dataset',
+    'LRUCache',
+    'make_datapoint_pool',
+    'make_datapoints',
+    'MoleculeBatchSampler',
     'MoleculeDatapoint',
     'MoleculeDataset',
     'MoleculeDataLoader',
     'MoleculeSampler',
     'set_cache_graph',
+    'set_cache_max_bytes',
     'set_cache_mol',
+    'set_features_cache',
+    'set_graph_cache',
     'generate_scaffold',
     'log_scaffold_stats',
     'scaffold_split',
     'scaffold_to_smiles',
     'StandardScaler',
+    'deduplicate_data',
     'filter_invalid_smiles',
     'get_class_sizes',
     'get_data',
+    'get_data_chunks',
     'get_data_weights',
     'get_data_from_smiles',
     'get_data_weights',
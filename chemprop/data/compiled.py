@@ -0,0 +1,397 @@
+from collections import OrderedDict
+import json
+from logging import Logger
+import os
+from typing import Dict, Iterator, List
+
+import numpy as np
+from tqdm import tqdm
+
+from .data import MoleculeDatapoint, MoleculeDataset
+from .graph_cache import GraphCache
+from chemprop.features import is_adding_hs, is_explicit_h, is_mol, is_reaction, MolGraph, reaction_mode
+
+# Version of the compiled dataset format, to be increased whenever the layout of the stored arrays changes
+COMPILED_DATASET_VERSION = 1
+
+# Name of the file describing the arrays of a compiled dataset
+METADATA_FILE_NAME = 'metadata.json'
+
+# Name of the file containing the SMILES of a compiled dataset
+SMILES_FILE_NAME = 'smiles.json'
+
+# Arrays stored for the graphs of each molecule column, with their data types
+GRAPH_ARRAYS = {'f_atoms': np.float32, 'f_bond': np.float32, 'b2a': np.int32, 'a2b_idx': np.int32, 'a2b_count': np.int32}
+
+
+def is_compiled_dataset(path: str) -> bool:
+    """
+    Checks whether a path points to a dataset compiled with :func:`compile_dataset`.
+
+    :param path: Path to a data CSV file or to a compiled dataset directory.
+    :return: Whether the path is a compiled dataset directory.
+    """
+    return os.path.isdir(path) and os.path.isfile(os.path.join(path, METADATA_FILE_NAME))
+
+
+class ArrayWriter:
+    """An :class:`ArrayWriter` appends arrays with a common data type and row shape to a raw binary file."""
+
+    def __init__(self, path: str, dtype: type):
+        """
+        :param path: Path to the binary file, which is overwritten.
+        :param dtype: The data type of the stored arrays.
+        """
+        self.file = open(path, 'wb')
+        self.dtype = np.dtype(dtype)
+        self.num_rows = 0
+        self.row_shape = ()
+
+    def write(self, array: np.ndarray) -> None:
+        """
+        Appends the rows of an array to the file.
+
+        :param array: An array whose rows all have the same shape as the previously written rows.
+        """
+        array = np.ascontiguousarray(array, dtype=self.dtype)
+        if self.num_rows == 0:
+            self.row_shape = array.shape[1:]
+        self.file.write(array.tobytes())
+        self.num_rows += len(array)
+
+    def close(self) -> Dict[str, object]:
+        """
+        Closes the file.
+
+        :return: A dictionary with the data type and shape of the stored array.
+        """
+        self.file.close()
+
+        return {'dtype': self.dtype.str, 'shape': [self.num_rows, *self.row_shape]}
+
+
+def compile_dataset(data: MoleculeDataset,
+                    path: str,
+                    smiles_columns: List[str],
+                    task_names: List[str],
+                    features_generator: List[str] = None,
+                    atom_descriptors: str = None) -> None:
+    r"""
+    Compiles a :class:`MoleculeDataset` into a directory of memory-mappable binary arrays.
+
+    The compiled dataset holds the SMILES, targets, data weights, features and extra atom/bond features
+    of each datapoint, as well as the :class:`~chemprop.features.MolGraph`\ s of the molecules for the current
+    featurization parameters (unless extra atom or bond features are used, since those are scaled during training).
+    It can be loaded with :func:`load_compiled_dataset` or by passing the directory as a data path to :func:`get_data`.
+
+    :param data: A :class:`MoleculeDataset` of valid molecules with unscaled features and targets.
+    :param path: Path to the directory in which the compiled dataset is saved.
+    :param smiles_columns: The names of the columns containing SMILES.
+    :param task_names: The names of the tasks.
+    :param features_generator: The features generators used to compute the features of the data.
+    :param atom_descriptors: The type of the extra atom descriptors (:code:`feature` or :code:`descriptor`).
+    """
+    os.makedirs(path, exist_ok=True)
+    arrays = {}
+
+    def save(name: str, values: List[np.ndarray], dtype: type) -> None:
+        """Saves an array and records its data type and shape."""
+        writer = ArrayWriter(os.path.join(path, f'{name}.bin'), dtype)
+        writer.write(np.array(values, dtype=dtype))
+        arrays[name] = writer.close()
+
+    def save_ragged(name: str, values: List[np.ndarray], dtype: type) -> None:
+        """Saves a list of arrays with varying numbers of rows along with the offset of each array."""
+        writer = ArrayWriter(os.path.join(path, f'{name}.bin'), dtype)
+        for value in values:
+            writer.write(value)
+        arrays[name] = writer.close()
+        save(f'{name}_offsets', np.concatenate(([0], np.cumsum([len(value) for value in values]))), np.int64)
+
+    targets = [[np.nan if target is None else target for target in d.targets] for d in data]
+    save('targets', np.reshape(targets, (len(data), len(task_names))), np.float64)
+
+    # Inequality targets are only stored if there are any
+    if data.gt_targets() is not None and (np.any(data.gt_targets()) or np.any(data.lt_targets())):
+        save('gt_targets', data.gt_targets(), bool)
+        save('lt_targets', data.lt_targets(), bool)
+
+    if len(data) > 0 and hasattr(data[0], 'data_weight'):
+        save('data_weights', data.data_weights(), np.float64)
+
+    if data.features() is not None:
+        save('features', data.features(), np.float64)
+
+    if data.phase_features() is not None:
+        save('phase_features', data.phase_features(), np.float64)
+
+    for name, values in [('atom_features', data.atom_features()),
+                         ('atom_descriptors', data.atom_descriptors()),
+                         ('bond_features', data.bond_features())]:
+        if values is not None:
+            save_ragged(name, values, np.float64)
+
+    # Graphs with extra atom or bond features are built during training since those features are scaled
+    graphs = data.atom_features() is None and data.bond_features() is None
+    if graphs:
+        num_molecules = data.number_of_molecules
+        writers = [{name: ArrayWriter(os.path.join(path, f'mol{column}_{name}.bin'), dtype)
+                    for name, dtype in GRAPH_ARRAYS.items()} for column in range(num_molecules)]
+        n_atoms = np.zeros((num_molecules, len(data) + 1), dtype=np.int64)
+        n_bonds = np.zeros((num_molecules, len(data) + 1), dtype=np.int64)
+
+        for i, d in enumerate(tqdm(data, desc='Featurizing')):
+            for column, m in enumerate(d.mol):
+                mol_graph = MolGraph(m)
+                writers[column]['f_atoms'].write(mol_graph.f_atoms)
+                writers[column]['f_bond'].write(mol_graph.f_bond)
+                writers[column]['b2a'].write(mol_graph.b2a)
+                writers[column]['a2b_idx'].write(mol_graph.a2b_idx)
+                writers[column]['a2b_count'].write(np.diff(mol_graph.a2b_ptr))
+                n_atoms[column, i + 1] = mol_graph.n_atoms
+                n_bonds[column, i + 1] = mol_graph.n_bonds
+
+        for column in range(num_molecules):
+            for name, writer in writers[column].items():
+                arrays[f'mol{column}_{name}'] = writer.close()
+            save(f'mol{column}_atom_offsets', np.cumsum(n_atoms[column]), np.int64)
+            save(f'mol{column}_bond_offsets', np.cumsum(n_bonds[column]), np.int64)
+
+    with open(os.path.join(path, SMILES_FILE_NAME), 'w') as f:
+        json.dump(data.smiles(), f)
+
+    with open(os.path.join(path, METADATA_FILE_NAME), 'w') as f:
+        json.dump({
+            'version': COMPILED_DATASET_VERSION,
+            'featurization': GraphCache.featurization() if graphs else None,
+            'num_data': len(data),
+            'number_of_molecules': data.number_of_molecules,
+            'smiles_columns': smiles_columns,
+            'task_names': task_names,
+            'features_generator': features_generator,
+            'atom_descriptors': atom_descriptors,
+            'arrays': arrays
+        }, f, indent=4)
+
+
+class CompiledDataset:
+    r"""
+    A :class:`CompiledDataset` provides access to the arrays of a dataset compiled with :func:`compile_dataset`.
+
+    Arrays are memory-mapped when first accessed, so processes reading the same compiled dataset
+    (e.g., data loader workers) share pages instead of holding copies of the data.
+    """
+
+    def __init__(self, path: str):
+        """
+        :param path: Path to the compiled dataset directory.
+        """
+        self.path = path
+
+        with open(os.path.join(path, METADATA_FILE_NAME)) as f:
+            self.metadata = json.load(f)
+
+        if self.metadata['version'] != COMPILED_DATASET_VERSION:
+            raise ValueError(f'The compiled dataset "{path}" has version {self.metadata["version"]} but version '
+                             f'{COMPILED_DATASET_VERSION} is required. Please compile the dataset again.')
+
+        self._arrays = {}
+
+    def __len__(self) -> int:
+        """Returns the number of datapoints in the compiled dataset."""
+        return self.metadata['num_data']
+
+    def has_array(self, name: str) -> bool:
+        """Returns whether the compiled dataset contains an array."""
+        return name in self.metadata['arrays']
+
+    def array(self, name: str) -> np.ndarray:
+        """
+        Returns a read-only memory-mapped array of the compiled dataset.
+
+        :param name: The name of the array.
+        :return: The array.
+        """
+        if name not in self._arrays:
+            info = self.metadata['arrays'][name]
+            shape = tuple(info['shape'])
+            if np.prod(shape) == 0:
+                self._arrays[name] = np.zeros(shape, dtype=info['dtype'])  # empty files cannot be memory-mapped
+            else:
+                self._arrays[name] = np.memmap(os.path.join(self.path, f'{name}.bin'), dtype=info['dtype'],
+                                               mode='r', shape=shape).view(np.ndarray)
+
+        return self._arrays[name]
+
+    def ragged(self, name: str, index: int) -> np.ndarray:
+        """
+        Returns the array of a datapoint from a list of arrays with varying numbers of rows.
+
+        :param name: The name of the array.
+        :param index: The index of the datapoint.
+        :return: The rows of the array belonging to the datapoint.
+        """
+        offsets = self.array(f'{name}_offsets')
+
+        return self.array(name)[offsets[index]:offsets[index + 1]]
+
+    def mol_graph(self, column: int, index: int, smiles: str) -> MolGraph:
+        """
+        Builds a :class:`~chemprop.features.MolGraph` whose arrays are views of the compiled dataset.
+
+        :param column: The index of the molecule column.
+        :param index: The index of the datapoint.
+        :param smiles: The SMILES of the molecule.
+        :return: The :class:`~chemprop.features.MolGraph` of the molecule.
+        """
+        atom_offsets, bond_offsets = self.array(f'mol{column}_atom_offsets'), self.array(f'mol{column}_bond_offsets')
+        a_start, a_end = int(atom_offsets[index]), int(atom_offsets[index + 1])
+        b_start, b_end = int(bond_offsets[index]), int(bond_offsets[index + 1])
+
+        mol_graph = MolGraph.__new__(MolGraph)
+        mol_graph.is_mol = is_mol(smiles)
+        mol_graph.is_reaction = is_reaction(mol_graph.is_mol)
+        mol_graph.is_explicit_h = is_explicit_h(mol_graph.is_mol)
+        mol_graph.is_adding_hs = is_adding_hs(mol_graph.is_mol)
+        mol_graph.reaction_mode = reaction_mode()
+        mol_graph.overwrite_default_atom_features = False
+        mol_graph.overwrite_default_bond_features = False
+        mol_graph.n_atoms = a_end - a_start
+        mol_graph.n_bonds = b_end - b_start
+        mol_graph.f_atoms = self.array(f'mol{column}_f_atoms')[a_start:a_end]
+        mol_graph.f_bond = self.array(f'mol{column}_f_bond')[b_start // 2:b_end // 2]
+        mol_graph.b2a = self.array(f'mol{column}_b2a')[b_start:b_end]
+        mol_graph.b2revb = np.arange(mol_graph.n_bonds, dtype=np.int32) ^ 1
+        mol_graph.a2b_idx = self.array(f'mol{column}_a2b_idx')[b_start:b_end]
+        mol_graph.a2b_ptr = np.zeros(mol_graph.n_atoms + 1, dtype=np.int32)
+        np.cumsum(self.array(f'mol{column}_a2b_count')[a_start:a_end], out=mol_graph.a2b_ptr[1:])
+
+        return mol_graph
+
+    def __getstate__(self) -> dict:
+        """Excludes the memory-mapped arrays when pickling so that they are mapped again rather than copied."""
+        state = self.__dict__.copy()
+        state['_arrays'] = {}
+
+        return state
+
+
+class CompiledMolGraphs:
+    r"""A :class:`CompiledMolGraphs` lazily provides the :class:`~chemprop.features.MolGraph`\ s of a compiled datapoint."""
+
+    def __init__(self, dataset: CompiledDataset, index: int, smiles: List[str]):
+        """
+        :param dataset: The :class:`CompiledDataset` containing the graphs.
+        :param index: The index of the datapoint.
+        :param smiles: The SMILES of the molecules of the datapoint.
+        """
+        self.dataset = dataset
+        self.index = index
+        self.smiles = smiles
+
+    def __len__(self) -> int:
+        return len(self.smiles)
+
+    def __getitem__(self, column: int) -> MolGraph:
+        return self.dataset.mol_graph(column, self.index, self.smiles[column])
+
+    def __iter__(self) -> Iterator[MolGraph]:
+        return (self[column] for column in range(len(self)))
+
+
+def load_compiled_dataset(path: str,
+                          target_columns: List[str] = None,
+                          features_generator: List[str] = None,
+                          max_data_size: int = None,
+                          store_row: bool = False,
+                          loss_function: str = None,
+                          skip_none_targets: bool = False,
+                          overwrite_default_atom_features: bool = False,
+                          overwrite_default_bond_features: bool = False,
+                          logger: Logger = None) -> MoleculeDataset:
+    """
+    Loads a dataset compiled with :func:`compile_dataset`.
+
+    :param path: Path to the compiled dataset directory.
+    :param target_columns: Name of the tasks to load. By default, uses all tasks of the compiled dataset.
+    :param features_generator: The features generators expected by the model, which must match
+                               the features generators used when compiling the dataset.
+    :param max_data_size: The maximum number of data points to load.
+    :param store_row: Whether to store the SMILES of each datapoint as its row.
+    :param loss_function: The loss function to be used in training.
+    :param skip_none_targets: Whether to skip datapoints whose targets are all None.
+    :param overwrite_default_atom_features: Boolean to overwrite default atom features by the extra atom features.
+    :param overwrite_default_bond_features: Boolean to overwrite default bond features by the extra bond features.
+    :param logger: A logger for recording output.
+    :return: A :class:`~chemprop.data.MoleculeDataset` whose arrays are views of the compiled dataset.
+    """
+    debug = logger.debug if logger is not None else print
+
+    dataset = CompiledDataset(path)
+    metadata = dataset.metadata
+
+    if (features_generator or None) != metadata['features_generator']:
+        raise ValueError(f'The compiled dataset "{path}" was compiled with the features generators '
+                         f'{metadata["features_generator"]} rather than {features_generator}.')
+
+    task_names = metadata['task_names']
+    if target_columns is None:
+        target_columns = task_names * 2 if loss_function == 'quantile_interval' else task_names
+    if any(column not in task_names for column in target_columns):
+        raise ValueError(f'The compiled dataset did not contain all provided target columns: {target_columns}. '
+                         f'Compiled task names are: {task_names}')
+    task_indices = [task_names.index(column) for column in target_columns]
+
+    with open(os.path.join(path, SMILES_FILE_NAME)) as f:
+        all_smiles = json.load(f)
+
+    num_data = min(len(dataset), max_data_size or float('inf'))
+    targets = dataset.array('targets')[:num_data, task_indices]
+    all_targets = np.where(np.isnan(targets), None, targets).tolist()
+
+    if dataset.has_array('gt_targets'):
+        if loss_function != 'bounded_mse':
+            raise ValueError('Inequality found in target data. To use inequality targets (> or <), '
+                             'the regression loss function bounded_mse must be used.')
+        gt_targets = dataset.array('gt_targets')[:num_data, task_indices]
+        lt_targets = dataset.array('lt_targets')[:num_data, task_indices]
+    elif loss_function == 'bounded_mse':
+        gt_targets = lt_targets = np.zeros(targets.shape, dtype=bool)
+    else:
+        gt_targets = lt_targets = None
+
+    data_weights = dataset.array('data_weights') if dataset.has_array('data_weights') else None
+    features = dataset.array('features') if dataset.has_array('features') else None
+    phase_features = dataset.array('phase_features') if dataset.has_array('phase_features') else None
+    atom_features = dataset.has_array('atom_features')
+    atom_descriptors = dataset.has_array('atom_descriptors')
+    bond_features = dataset.has_array('bond_features')
+
+    # Stored graphs are only used with the featurization parameters they were computed with
+    graphs = metadata['featurization'] is not None
+    if graphs and metadata['featurization'] != GraphCache.featurization():
+        debug(f'Warning: the graphs of the compiled dataset "{path}" were computed with different featurization '
+              f'parameters and are computed again from SMILES.')
+        graphs = False
+
+    data = MoleculeDataset([
+        MoleculeDatapoint(
+            smiles=all_smiles[i],
+            targets=all_targets[i],
+            row=OrderedDict(zip(metadata['smiles_columns'], all_smiles[i])) if store_row else None,
+            data_weight=data_weights[i] if data_weights is not None else None,
+            gt_targets=gt_targets[i] if gt_targets is not None else None,
+            lt_targets=lt_targets[i] if lt_targets is not None else None,
+            features=features[i] if features is not None else None,
+            phase_features=phase_features[i] if phase_features is not None else None,
+            atom_features=dataset.ragged('atom_features', i) if atom_features else None,
+            atom_descriptors=dataset.ragged('atom_descriptors', i) if atom_descriptors else None,
+            bond_features=dataset.ragged('bond_features', i) if bond_features else None,
+            overwrite_default_atom_features=overwrite_default_atom_features,
+            overwrite_default_bond_features=overwrite_default_bond_features,
+            mol_graphs=CompiledMolGraphs(dataset, i, all_smiles[i]) if graphs else None
+        ) for i in tqdm(range(num_data))
+        if not (skip_none_targets and all(target is None for target in all_targets[i]))
+    ])
+
+    return data
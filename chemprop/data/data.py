@@ -1,26 +1,41 @@
 import threading
 from collections import OrderedDict
+from contextlib import nullcontext
+from itertools import islice
+from multiprocessing import Pool
 from random import Random
-from typing import Dict, Iterator, List, Optional, Union, Tuple
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Union, Tuple
 
 import numpy as np
 from torch.utils.data import DataLoader, Dataset, Sampler
 from rdkit import Chem
 
+from .features_cache import FeaturesCache
+from .graph_cache import GraphCache
+from .lru_cache import get_batch_graph_size, get_mol_graph_size, get_mol_size, LRUCache
 from .scaler import StandardScaler
-from chemprop.features import get_features_generator
+from chemprop.features import get_batch_features_generator
 from chemprop.features import BatchMolGraph, MolGraph
 from chemprop.features import is_explicit_h, is_reaction, is_adding_hs, is_mol
+from chemprop.features import featurization
 from chemprop.rdkit import make_mol
 
 # Cache of graph featurizations
 CACHE_GRAPH = True
-SMILES_TO_GRAPH: Dict[str, MolGraph] = {}
+SMILES_TO_GRAPH: LRUCache = LRUCache(get_size=get_mol_graph_size)
+
+
+# Persistent on-disk cache of graph featurizations
+GRAPH_CACHE: Optional[GraphCache] = None
+
+
+# Persistent on-disk cache of molecule-level features
+FEATURES_CACHE: Optional[FeaturesCache] = None
 
 
 # Cache of RDKit molecules
 CACHE_MOL = True
-SMILES_TO_MOL: Dict[str, Union[Chem.Mol, Tuple[Chem.Mol, Chem.Mol]]] = {}
+SMILES_TO_MOL: LRUCache = LRUCache(get_size=get_mol_size)
 
 
 def cache_graph() -> bool:
@@ -34,6 +49,61 @@ def set_cache_graph(cache_graph: bool) -> None:
     CACHE_GRAPH = cache_graph
 
 
+def graph_cache() -> Optional[GraphCache]:
+    r"""Returns the persistent :class:`GraphCache` of :class:`~chemprop.features.MolGraph`\ s (None if disabled)."""
+    return GRAPH_CACHE
+
+
+def set_graph_cache(path: Optional[str]) -> None:
+    r"""
+    Sets the path to the persistent :class:`GraphCache` of :class:`~chemprop.features.MolGraph`\ s.
+
+    :param path: Path to an SQLite database file, or None to disable the persistent cache.
+    """
+    global GRAPH_CACHE
+    if path is None:
+        GRAPH_CACHE = None
+    elif GRAPH_CACHE is None or GRAPH_CACHE.path != path:
+        GRAPH_CACHE = GraphCache(path)
+
+
+def features_cache() -> Optional[FeaturesCache]:
+    r"""Returns the persistent :class:`FeaturesCache` of features generator outputs (None if disabled)."""
+    return FEATURES_CACHE
+
+
+def set_features_cache(path: Optional[str]) -> None:
+    r"""
+    Sets the path to the persistent :class:`FeaturesCache` of features generator outputs.
+
+    :param path: Path to a directory, or None to disable the persistent cache.
+    """
+    global FEATURES_CACHE
+    if path is None:
+        FEATURES_CACHE = None
+    elif FEATURES_CACHE is None or FEATURES_CACHE.path != path:
+        FEATURES_CACHE = FeaturesCache(path)
+
+
+def set_cache_max_bytes(graph_max_bytes: Optional[float], mol_max_bytes: Optional[float]) -> None:
+    r"""
+    Sets the memory budgets of the caches of :class:`~chemprop.features.MolGraph`\ s and RDKit molecules.
+
+    Once a cache exceeds its budget, its least recently used entries are evicted.
+
+    :param graph_max_bytes: Maximum estimated memory of the cached :class:`~chemprop.features.MolGraph`\ s
+                            in bytes (None for unbounded).
+    :param mol_max_bytes: Maximum estimated memory of the cached RDKit molecules in bytes (None for unbounded).
+    """
+    SMILES_TO_GRAPH.set_max_bytes(graph_max_bytes)
+    SMILES_TO_MOL.set_max_bytes(mol_max_bytes)
+
+
+def cache_stats() -> str:
+    r"""Returns a summary of the sizes and hit rates of the caches of :class:`~chemprop.features.MolGraph`\ s and RDKit molecules."""
+    return f'Graph cache: {SMILES_TO_GRAPH.stats()}\nMolecule cache: {SMILES_TO_MOL.stats()}'
+
+
 def empty_cache():
     r"""Empties the cache of :class:`~chemprop.features.MolGraph` and RDKit molecules."""
     SMILES_TO_GRAPH.clear()
@@ -68,7 +138,8 @@ class MoleculeDatapoint:
                  atom_descriptors: np.ndarray = None,
                  bond_features: np.ndarray = None,
                  overwrite_default_atom_features: bool = False,
-                 overwrite_default_bond_features: bool = False):
+                 overwrite_default_bond_features: bool = False,
+                 mol_graphs: Sequence[MolGraph] = None):
         """
         :param smiles: A list of the SMILES strings for the molecules.
         :param targets: A list of targets for the molecule (contains None for unknown target values).
@@ -83,7 +154,8 @@ class MoleculeDatapoint:
         :param bond_features: A numpy array containing additional bond features to featurize the molecule
         :param overwrite_default_atom_features: Boolean to overwrite default atom features by atom_features
         :param overwrite_default_bond_features: Boolean to overwrite default bond features by bond_features
-
+        :param mol_graphs: Precomputed graphs of the molecules (e.g., from a compiled dataset), which are used
+                           instead of featurizing the SMILES.
         """
         if features is not None and features_generator is not None:
             raise ValueError('Cannot provide both loaded features and a features generator.')
@@ -99,6 +171,8 @@ class MoleculeDatapoint:
         self.bond_features = bond_features
         self.overwrite_default_atom_features = overwrite_default_atom_features
         self.overwrite_default_bond_features = overwrite_default_bond_features
+        self.mol_graphs = mol_graphs
+        self.encoding = None
         self.is_mol_list = [is_mol(s) for s in smiles]
         self.is_reaction_list = [is_reaction(x) for x in self.is_mol_list]
         self.is_explicit_h_list = [is_explicit_h(x) for x in self.is_mol_list]
@@ -113,26 +187,7 @@ class MoleculeDatapoint:
 
         # Generate additional features if given a generator
         if self.features_generator is not None:
-            self.features = []
-
-            for fg in self.features_generator:
-                features_generator = get_features_generator(fg)
-                for m, reaction in zip(self.mol, self.is_reaction_list):
-                    if not reaction:
-                        if m is not None and m.GetNumHeavyAtoms() > 0:
-                            self.features.extend(features_generator(m))
-                        # for H2
-                        elif m is not None and m.GetNumHeavyAtoms() == 0:
-                            # not all features are equally long, so use methane as dummy molecule to determine length
-                            self.features.extend(np.zeros(len(features_generator(Chem.MolFromSmiles('C')))))                           
-                    else:
-                        if m[0] is not None and m[1] is not None and m[0].GetNumHeavyAtoms() > 0:
-                            self.features.extend(features_generator(m[0]))
-                        elif m[0] is not None and m[1] is not None and m[0].GetNumHeavyAtoms() == 0:
-                            self.features.extend(np.zeros(len(features_generator(Chem.MolFromSmiles('C')))))   
-                    
-
-            self.features = np.array(self.features)
+            _generate_features([self])
 
         # Fix nans in features
         replace_token = 0
@@ -162,7 +217,8 @@ class MoleculeDatapoint:
         mol = make_mols(self.smiles, self.is_reaction_list, self.is_explicit_h_list, self.is_adding_hs_list)
         if cache_mol():
             for s, m in zip(self.smiles, mol):
-                SMILES_TO_MOL[s] = m
+                if s not in SMILES_TO_MOL:
+                    SMILES_TO_MOL[s] = m
 
         return mol
 
@@ -207,6 +263,14 @@ class MoleculeDatapoint:
         """
         self.bond_features = bond_features
 
+    def set_encoding(self, encoding: Optional[np.ndarray]) -> None:
+        """
+        Sets the precomputed encoding of the molecule, which is used instead of its graph by a model.
+
+        :param encoding: A 1D numpy array containing the output of a frozen encoder or None to use the graph.
+        """
+        self.encoding = encoding
+
     def extend_features(self, features: np.ndarray) -> None:
         """
         Extends the features of the molecule.
@@ -298,26 +362,66 @@ class MoleculeDataset(Dataset):
         if self._batch_graph is None:
             self._batch_graph = []
 
-            mol_graphs = []
+            # Load graphs which are not in memory from the persistent cache. Graphs with extra atom or bond
+            # features are not stored since those features depend on the data rather than the SMILES.
+            stored_smiles, stored_graphs = set(), {}
+            if GRAPH_CACHE is not None:
+                for d in self._data:
+                    if d.mol_graphs is None and d.atom_features is None and d.bond_features is None:
+                        stored_smiles.update(s for s in d.smiles if s not in SMILES_TO_GRAPH)
+                stored_graphs = GRAPH_CACHE.get(list(stored_smiles))
+            new_graphs = {}
+
+            # With several molecules per datapoint (e.g., solute and solvent), the same molecule is often repeated
+            # in a column, so each distinct molecule of a column is featurized and encoded once per batch.
+            # Graphs with extra atom or bond features are specific to their datapoint and are not deduplicated.
+            number_of_molecules = self.number_of_molecules
+            dedupe = number_of_molecules > 1 and all(d.atom_features is None and d.bond_features is None
+                                                     for d in self._data)
+            mol_graphs = [[] for _ in range(number_of_molecules)]
+            mol_indices = [[] for _ in range(number_of_molecules)]
+            unique_smiles = [{} for _ in range(number_of_molecules)]
             for d in self._data:
-                mol_graphs_list = []
-                for s, m in zip(d.smiles, d.mol):
-                    if s in SMILES_TO_GRAPH:
-                        mol_graph = SMILES_TO_GRAPH[s]
+                mols = None  # Only needed for graphs which are not cached
+                for i, s in enumerate(d.smiles):
+                    if dedupe and s in unique_smiles[i]:
+                        mol_indices[i].append(unique_smiles[i][s])
+                        continue
+
+                    if d.mol_graphs is not None:
+                        mol_graph = d.mol_graphs[i]
                     else:
-                        if len(d.smiles) > 1 and (d.atom_features is not None or d.bond_features is not None):
-                            raise NotImplementedError('Atom descriptors are currently only supported with one molecule '
-                                                      'per input (i.e., number_of_molecules = 1).')
-
-                        mol_graph = MolGraph(m, d.atom_features, d.bond_features,
-                                             overwrite_default_atom_features=d.overwrite_default_atom_features,
-                                             overwrite_default_bond_features=d.overwrite_default_bond_features)
-                        if cache_graph():
-                            SMILES_TO_GRAPH[s] = mol_graph
-                    mol_graphs_list.append(mol_graph)
-                mol_graphs.append(mol_graphs_list)
-
-            self._batch_graph = [BatchMolGraph([g[i] for g in mol_graphs]) for i in range(len(mol_graphs[0]))]
+                        mol_graph = SMILES_TO_GRAPH.get(s)
+                        if mol_graph is None and s in stored_graphs:
+                            mol_graph = stored_graphs[s]
+                            if cache_graph():
+                                SMILES_TO_GRAPH[s] = mol_graph
+                        elif mol_graph is None:
+                            if len(d.smiles) > 1 and (d.atom_features is not None or d.bond_features is not None):
+                                raise NotImplementedError('Atom descriptors are currently only supported with one '
+                                                          'molecule per input (i.e., number_of_molecules = 1).')
+
+                            mols = d.mol if mols is None else mols
+                            mol_graph = MolGraph(mols[i], d.atom_features, d.bond_features,
+                                                 overwrite_default_atom_features=d.overwrite_default_atom_features,
+                                                 overwrite_default_bond_features=d.overwrite_default_bond_features)
+                            if cache_graph():
+                                SMILES_TO_GRAPH[s] = mol_graph
+                            if s in stored_smiles:
+                                new_graphs[s] = mol_graph
+
+                    if dedupe:
+                        unique_smiles[i][s] = len(mol_graphs[i])
+                    mol_indices[i].append(len(mol_graphs[i]))
+                    mol_graphs[i].append(mol_graph)
+
+            if GRAPH_CACHE is not None:
+                GRAPH_CACHE.put(new_graphs)
+
+            self._batch_graph = [
+                BatchMolGraph(graphs, mol_index=np.array(indices) if len(graphs) < len(indices) else None)
+                for graphs, indices in zip(mol_graphs, mol_indices)
+            ]
 
         return self._batch_graph
 
@@ -332,6 +436,31 @@ class MoleculeDataset(Dataset):
 
         return [d.features for d in self._data]
 
+    def encodings(self) -> Optional[np.ndarray]:
+        """
+        Returns the precomputed encodings of the molecules (if they exist).
+
+        :return: A 2D numpy array containing the encoding of each molecule or None if there are no encodings.
+        """
+        if len(self._data) == 0 or self._data[0].encoding is None:
+            return None
+
+        return np.stack([d.encoding for d in self._data])
+
+    def set_encodings(self, encodings: Optional[np.ndarray]) -> None:
+        """
+        Sets the precomputed encodings of the molecules.
+
+        :param encodings: A 2D numpy array containing the encoding of each molecule or None to remove the encodings.
+        """
+        if encodings is None:
+            encodings = [None] * len(self._data)
+        elif len(encodings) != len(self._data):
+            raise ValueError('Number of encodings must match the number of molecules in the dataset.')
+
+        for d, encoding in zip(self._data, encodings):
+            d.set_encoding(encoding)
+
     def phase_features(self) -> List[np.ndarray]:
         """
         Returns the phase features associated with each molecule (if they exist).
@@ -582,25 +711,40 @@ class MoleculeDataset(Dataset):
 
 
 class MoleculeSampler(Sampler):
-    """A :class:`MoleculeSampler` samples data from a :class:`MoleculeDataset` for a :class:`MoleculeDataLoader`."""
+    """
+    A :class:`MoleculeSampler` samples data from a :class:`MoleculeDataset` for a :class:`MoleculeDataLoader`.
+
+    For distributed training, each of :code:`num_replicas` processes samples a disjoint shard of the indices
+    of each epoch. All processes must use the same seed so that they shuffle the indices in the same order.
+    The indices are padded by repeating the first ones so that every shard has the same length.
+    """
 
     def __init__(self,
                  dataset: MoleculeDataset,
                  class_balance: bool = False,
                  shuffle: bool = False,
-                 seed: int = 0):
+                 seed: int = 0,
+                 num_replicas: int = 1,
+                 rank: int = 0):
         """
         :param class_balance: Whether to perform class balancing (i.e., use an equal number of positive
                               and negative molecules). Set shuffle to True in order to get a random
                               subset of the larger class.
         :param shuffle: Whether to shuffle the data.
         :param seed: Random seed. Only needed if :code:`shuffle` is True.
+        :param num_replicas: The number of processes among which the indices are sharded.
+        :param rank: The rank of the process whose shard of the indices is sampled.
         """
         super(Sampler, self).__init__()
 
+        if not 0 <= rank < num_replicas:
+            raise ValueError(f'The rank must be between 0 and {num_replicas - 1} but got {rank}.')
+
         self.dataset = dataset
         self.class_balance = class_balance
         self.shuffle = shuffle
+        self.num_replicas = num_replicas
+        self.rank = rank
 
         self._random = Random(seed)
 
@@ -631,11 +775,141 @@ class MoleculeSampler(Sampler):
             if self.shuffle:
                 self._random.shuffle(indices)
 
+        if self.num_replicas > 1 and len(indices) > 0:
+            total_size = len(self) * self.num_replicas
+            indices = [indices[i % len(indices)] for i in range(total_size)][self.rank::self.num_replicas]
+
         return iter(indices)
 
     def __len__(self) -> int:
         """Returns the number of indices that will be sampled."""
-        return self.length
+        return -(-self.length // self.num_replicas)
+
+
+class MoleculeBatchSampler(Sampler):
+    """
+    A :class:`MoleculeBatchSampler` samples batches of data from a :class:`MoleculeDataset` for a
+    :class:`MoleculeDataLoader` whose molecules have at most a given total number of atoms and/or bonds.
+
+    When shuffling, the indices of each epoch are split into pools which are sorted by molecule size
+    before they are cut into batches, so that molecules of similar size are batched together, and the
+    order of the batches is shuffled. Otherwise, consecutive molecules are batched in order.
+
+    For distributed training, each of :code:`num_replicas` processes samples a disjoint shard of the batches
+    of each epoch, padded by repeating the first batches so that every process takes the same number of steps.
+    """
+
+    def __init__(self,
+                 dataset: MoleculeDataset,
+                 max_atoms: int = None,
+                 max_bonds: int = None,
+                 class_balance: bool = False,
+                 shuffle: bool = False,
+                 seed: int = 0,
+                 pool_size: int = 1000,
+                 num_replicas: int = 1,
+                 rank: int = 0):
+        """
+        :param dataset: The :class:`MoleculeDataset` to sample batches from.
+        :param max_atoms: The maximum total number of atoms in a batch.
+        :param max_bonds: The maximum total number of (undirected) bonds in a batch.
+        :param class_balance: Whether to perform class balancing (i.e., use an equal number of positive
+                              and negative molecules). Set shuffle to True in order to get a random
+                              subset of the larger class.
+        :param shuffle: Whether to shuffle the data.
+        :param seed: Random seed. Only needed if :code:`shuffle` is True.
+        :param pool_size: The number of datapoints sorted by size together when shuffling.
+        :param num_replicas: The number of processes among which the batches are sharded.
+        :param rank: The rank of the process whose shard of the batches is sampled.
+        """
+        super(Sampler, self).__init__()
+
+        if max_atoms is None and max_bonds is None:
+            raise ValueError('At least one of max_atoms and max_bonds must be provided.')
+
+        if not 0 <= rank < num_replicas:
+            raise ValueError(f'The rank must be between 0 and {num_replicas - 1} but got {rank}.')
+
+        self.dataset = dataset
+        self.max_atoms = max_atoms
+        self.max_bonds = max_bonds
+        self.shuffle = shuffle
+        self.pool_size = pool_size
+        self.num_replicas = num_replicas
+        self.rank = rank
+
+        # The indices of all processes are batched in the same order before the batches are sharded
+        self._sampler = MoleculeSampler(dataset=dataset, class_balance=class_balance, shuffle=shuffle, seed=seed)
+        self._random = Random(seed)
+        self._batches = None
+
+        self.num_atoms, self.num_bonds = np.zeros(len(dataset), dtype=int), np.zeros(len(dataset), dtype=int)
+        for i, d in enumerate(dataset):
+            if d.mol_graphs is not None:
+                self.num_atoms[i] = sum(mol_graph.n_atoms for mol_graph in d.mol_graphs)
+                self.num_bonds[i] = sum(mol_graph.n_bonds for mol_graph in d.mol_graphs) // 2
+            else:
+                mols = [m[0] if isinstance(m, tuple) else m for m in d.mol]
+                self.num_atoms[i] = sum(m.GetNumAtoms() for m in mols if m is not None)
+                self.num_bonds[i] = sum(m.GetNumBonds() for m in mols if m is not None)
+
+    def _make_batches(self) -> List[List[int]]:
+        """Splits the indices of an epoch into batches."""
+        indices = list(self._sampler)
+
+        if self.shuffle:
+            sizes = list(zip(self.num_atoms, self.num_bonds))
+            indices = [index for i in range(0, len(indices), self.pool_size)
+                       for index in sorted(indices[i:i + self.pool_size], key=lambda j: sizes[j])]
+
+        batches, batch, num_atoms, num_bonds = [], [], 0, 0
+        for index in indices:
+            exceeds_atoms = self.max_atoms is not None and num_atoms + self.num_atoms[index] > self.max_atoms
+            exceeds_bonds = self.max_bonds is not None and num_bonds + self.num_bonds[index] > self.max_bonds
+            if len(batch) > 0 and (exceeds_atoms or exceeds_bonds):
+                batches.append(batch)
+                batch, num_atoms, num_bonds = [], 0, 0
+
+            batch.append(index)
+            num_atoms += self.num_atoms[index]
+            num_bonds += self.num_bonds[index]
+
+        if len(batch) > 0:
+            batches.append(batch)
+
+        if self.shuffle:
+            self._random.shuffle(batches)
+
+        if self.num_replicas > 1 and len(batches) > 0:
+            total_size = -(-len(batches) // self.num_replicas) * self.num_replicas
+            batches = [batches[i % len(batches)] for i in range(total_size)][self.rank::self.num_replicas]
+
+        return batches
+
+    def __iter__(self) -> Iterator[List[int]]:
+        """Creates an iterator over batches of indices to sample."""
+        batches = self._batches if self._batches is not None else self._make_batches()
+        self._batches = None
+
+        return iter(batches)
+
+    def __len__(self) -> int:
+        """Returns the number of batches that will be sampled in the next epoch."""
+        if self._batches is None:
+            self._batches = self._make_batches()
+
+        return len(self._batches)
+
+    @property
+    def num_samples(self) -> int:
+        """Returns the number of indices that will be sampled in each epoch."""
+        if self.num_replicas > 1:
+            if self._batches is None:
+                self._batches = self._make_batches()
+
+            return sum(len(batch) for batch in self._batches)
+
+        return len(self._sampler)
 
 
 def construct_molecule_batch(data: List[MoleculeDatapoint]) -> MoleculeDataset:
@@ -643,17 +917,35 @@ def construct_molecule_batch(data: List[MoleculeDatapoint]) -> MoleculeDataset:
     Constructs a :class:`MoleculeDataset` from a list of :class:`MoleculeDatapoint`\ s.
 
     Additionally, precomputes the :class:`~chemprop.features.BatchMolGraph` for the constructed
-    :class:`MoleculeDataset`.
+    :class:`MoleculeDataset` unless the molecules have precomputed encodings.
 
     :param data: A list of :class:`MoleculeDatapoint`\ s.
     :return: A :class:`MoleculeDataset` containing all the :class:`MoleculeDatapoint`\ s.
     """
     data = MoleculeDataset(data)
-    data.batch_graph()  # Forces computation and caching of the BatchMolGraph for the molecules
+    if len(data) == 0 or data[0].encoding is None:
+        data.batch_graph()  # Forces computation and caching of the BatchMolGraph for the molecules
 
     return data
 
 
+def get_batch_size(batch: MoleculeDataset) -> int:
+    """
+    Estimates the memory used by a batch built by :func:`construct_molecule_batch`.
+
+    :param batch: A :class:`MoleculeDataset` whose :class:`~chemprop.features.BatchMolGraph` has been computed
+                  (or whose molecules have precomputed encodings).
+    :return: The estimated number of bytes used by the graphs and the features of the batch.
+    """
+    size = sum(get_batch_graph_size(batch_graph) for batch_graph in batch._batch_graph or [])
+    for d in batch:
+        for features in (d.features, d.atom_descriptors, d.atom_features, d.bond_features, d.encoding):
+            if isinstance(features, np.ndarray):
+                size += features.nbytes
+
+    return size
+
+
 class MoleculeDataLoader(DataLoader):
     """A :class:`MoleculeDataLoader` is a PyTorch :class:`DataLoader` for loading a :class:`MoleculeDataset`."""
 
@@ -663,10 +955,15 @@ class MoleculeDataLoader(DataLoader):
                  num_workers: int = 8,
                  class_balance: bool = False,
                  shuffle: bool = False,
-                 seed: int = 0):
+                 seed: int = 0,
+                 max_batch_atoms: int = None,
+                 max_batch_bonds: int = None,
+                 cache_batches_max_bytes: float = None,
+                 num_replicas: int = 1,
+                 rank: int = 0):
         """
         :param dataset: The :class:`MoleculeDataset` containing the molecules to load.
-        :param batch_size: Batch size.
+        :param batch_size: Batch size. Not used if :code:`max_batch_atoms` or :code:`max_batch_bonds` is provided.
         :param num_workers: Number of workers used to build batches.
         :param class_balance: Whether to perform class balancing (i.e., use an equal number of positive
                               and negative molecules). Class balance is only available for single task
@@ -674,13 +971,26 @@ class MoleculeDataLoader(DataLoader):
                               subset of the larger class.
         :param shuffle: Whether to shuffle the data.
         :param seed: Random seed. Only needed if shuffle is True.
-        """
+        :param max_batch_atoms: The maximum total number of atoms in a batch. If provided, batches contain a varying
+                                number of molecules of similar size (see :class:`MoleculeBatchSampler`).
+        :param max_batch_bonds: The maximum total number of bonds in a batch, like :code:`max_batch_atoms`.
+        :param cache_batches_max_bytes: If provided, the collated batches of the first full iteration are kept
+                                        and returned by later iterations as long as their estimated memory is
+                                        at most this many bytes. Only available without shuffle and class balance.
+        :param num_replicas: The number of processes of distributed training among which the data is sharded.
+        :param rank: The rank of the process which loads its shard of the data.
+        """
+        if cache_batches_max_bytes is not None and (shuffle or class_balance):
+            raise ValueError('Batches can only be cached when class balance and shuffle are disabled.')
+
         self._dataset = dataset
         self._batch_size = batch_size
         self._num_workers = num_workers
         self._class_balance = class_balance
         self._shuffle = shuffle
         self._seed = seed
+        self._cache_batches_max_bytes = cache_batches_max_bytes
+        self._cached_batches = None
         self._context = None
         self._timeout = 0
         is_main_thread = threading.current_thread() is threading.main_thread()
@@ -688,23 +998,45 @@ class MoleculeDataLoader(DataLoader):
             self._context = 'forkserver'  # In order to prevent a hanging
             self._timeout = 3600  # Just for sure that the DataLoader won't hang
 
-        self._sampler = MoleculeSampler(
-            dataset=self._dataset,
-            class_balance=self._class_balance,
-            shuffle=self._shuffle,
-            seed=self._seed
-        )
+        if max_batch_atoms is not None or max_batch_bonds is not None:
+            self._sampler = MoleculeBatchSampler(
+                dataset=self._dataset,
+                max_atoms=max_batch_atoms,
+                max_bonds=max_batch_bonds,
+                class_balance=self._class_balance,
+                shuffle=self._shuffle,
+                seed=self._seed,
+                num_replicas=num_replicas,
+                rank=rank
+            )
+            sampler_kwargs = {'batch_sampler': self._sampler}
+        else:
+            self._sampler = MoleculeSampler(
+                dataset=self._dataset,
+                class_balance=self._class_balance,
+                shuffle=self._shuffle,
+                seed=self._seed,
+                num_replicas=num_replicas,
+                rank=rank
+            )
+            sampler_kwargs = {'batch_size': self._batch_size, 'sampler': self._sampler}
 
         super(MoleculeDataLoader, self).__init__(
             dataset=self._dataset,
-            batch_size=self._batch_size,
-            sampler=self._sampler,
             num_workers=self._num_workers,
             collate_fn=construct_molecule_batch,
             multiprocessing_context=self._context,
-            timeout=self._timeout
+            timeout=self._timeout,
+            **sampler_kwargs
         )
 
+    def _indices(self) -> Iterator[int]:
+        """Creates an iterator over the indices of the molecules in the order in which they are loaded."""
+        if isinstance(self._sampler, MoleculeBatchSampler):
+            return (index for batch in self._sampler for index in batch)
+
+        return iter(self._sampler)
+
     @property
     def targets(self) -> List[List[Optional[float]]]:
         """
@@ -715,7 +1047,7 @@ class MoleculeDataLoader(DataLoader):
         if self._class_balance or self._shuffle:
             raise ValueError('Cannot safely extract targets when class balance or shuffle are enabled.')
 
-        return [self._dataset[index].targets for index in self._sampler]
+        return [self._dataset[index].targets for index in self._indices()]
 
     @property
     def gt_targets(self) -> List[List[Optional[bool]]]:
@@ -730,7 +1062,7 @@ class MoleculeDataLoader(DataLoader):
         if not hasattr(self._dataset[0],'gt_targets'):
             return None
 
-        return [self._dataset[index].gt_targets for index in self._sampler]
+        return [self._dataset[index].gt_targets for index in self._indices()]
 
     @property
     def lt_targets(self) -> List[List[Optional[bool]]]:
@@ -745,18 +1077,53 @@ class MoleculeDataLoader(DataLoader):
         if not hasattr(self._dataset[0],'lt_targets'):
             return None
 
-        return [self._dataset[index].lt_targets for index in self._sampler]
+        return [self._dataset[index].lt_targets for index in self._indices()]
 
 
     @property
     def iter_size(self) -> int:
         """Returns the number of data points included in each full iteration through the :class:`MoleculeDataLoader`."""
+        if isinstance(self._sampler, MoleculeBatchSampler):
+            return self._sampler.num_samples
+
         return len(self._sampler)
 
     def __iter__(self) -> Iterator[MoleculeDataset]:
         r"""Creates an iterator which returns :class:`MoleculeDataset`\ s"""
+        if self._cached_batches is not None:
+            return iter(self._cached_batches)
+
+        if self._cache_batches_max_bytes is not None:
+            return self._iter_and_cache()
+
         return super(MoleculeDataLoader, self).__iter__()
 
+    def _iter_and_cache(self) -> Iterator[MoleculeDataset]:
+        r"""
+        Creates an iterator which returns :class:`MoleculeDataset`\ s and keeps them for later iterations.
+
+        If the batches exceed the memory budget, caching is disabled for this :class:`MoleculeDataLoader`.
+        """
+        batches, num_bytes = [], 0
+        for batch in super(MoleculeDataLoader, self).__iter__():
+            if batches is not None:
+                num_bytes += get_batch_size(batch)
+                if num_bytes <= self._cache_batches_max_bytes:
+                    batches.append(batch)
+                else:
+                    batches = None
+                    self._cache_batches_max_bytes = None
+
+            yield batch
+
+        if batches is not None:
+            self._cached_batches = batches
+
+    @property
+    def is_cached(self) -> bool:
+        """Whether the collated batches are cached, which is the case after a full iteration within the budget."""
+        return self._cached_batches is not None
+
     
 def make_mols(smiles: List[str], reaction_list: List[bool], keep_h_list: List[bool], add_h_list: List[bool]):
     """
@@ -770,9 +1137,165 @@ def make_mols(smiles: List[str], reaction_list: List[bool], keep_h_list: List[bo
     """
     mol = []
     for s, reaction, keep_h, add_h in zip(smiles, reaction_list, keep_h_list, add_h_list):
-        if reaction:
-            mol.append(SMILES_TO_MOL[s] if s in SMILES_TO_MOL else (make_mol(s.split(">")[0], keep_h, add_h), make_mol(s.split(">")[-1], keep_h, add_h)))
-        else:
-            mol.append(SMILES_TO_MOL[s] if s in SMILES_TO_MOL else make_mol(s, keep_h, add_h))
+        m = SMILES_TO_MOL.get(s)
+        if m is None:
+            if reaction:
+                m = (make_mol(s.split(">")[0], keep_h, add_h), make_mol(s.split(">")[-1], keep_h, add_h))
+            else:
+                m = make_mol(s, keep_h, add_h)
+        mol.append(m)
     return mol
 
+
+
+def _generate_features(data: Sequence[MoleculeDatapoint]) -> None:
+    r"""
+    Generates the features of the features generators of :class:`MoleculeDatapoint`\ s.
+
+    The features of each features generator are computed for the molecules of all datapoints at once with its
+    batch version (see :func:`~chemprop.features.get_batch_features_generator`), which gives the same features
+    as applying it to each molecule. Molecules without heavy atoms (e.g., H2) get zero features, the reactants
+    stand for reactions and molecules which could not be parsed get no features.
+
+    :param data: A list of :class:`MoleculeDatapoint`\ s with features generators.
+    """
+    mols = [[m if not reaction else m[0] if m[0] is not None and m[1] is not None else None
+             for m, reaction in zip(d.mol, d.is_reaction_list)] for d in data]
+
+    features = {}
+    for fg in dict.fromkeys(fg for d in data for fg in d.features_generator):
+        if FEATURES_CACHE is not None:
+            batch_features_generator = FEATURES_CACHE.batch_features_generator(fg)
+        else:
+            batch_features_generator = get_batch_features_generator(fg)
+
+        indices = [(i, j) for i, d in enumerate(data) if fg in d.features_generator
+                   for j, m in enumerate(mols[i]) if m is not None]
+        heavy_indices = [(i, j) for i, j in indices if mols[i][j].GetNumHeavyAtoms() > 0]
+        if len(heavy_indices) > 0:
+            batch_features = batch_features_generator([mols[i][j] for i, j in heavy_indices])
+            features.update(((fg, i, j), mol_features) for (i, j), mol_features in zip(heavy_indices, batch_features))
+
+        # Not all features are equally long, so use methane as dummy molecule to determine the length
+        if len(heavy_indices) < len(indices):
+            num_features = batch_features_generator([Chem.MolFromSmiles('C')]).shape[1]
+            features.update(((fg, i, j), np.zeros(num_features)) for i, j in indices if (fg, i, j) not in features)
+
+    for i, d in enumerate(data):
+        d_features = [features[fg, i, j] for fg in d.features_generator for j in range(len(mols[i]))
+                      if (fg, i, j) in features]
+        d.features = np.concatenate(d_features) if len(d_features) > 0 else np.array([])
+        d.features = d.raw_features = np.where(np.isnan(d.features), 0, d.features)
+
+
+def _make_datapoints(datapoint_kwargs: List[Dict[str, Any]]) -> List[MoleculeDatapoint]:
+    r"""
+    Constructs :class:`MoleculeDatapoint`\ s, generating the features of their features generators for all
+    of them at once (see :func:`_generate_features`).
+
+    :param datapoint_kwargs: A list of keyword arguments for :class:`MoleculeDatapoint`.
+    :return: A list of :class:`MoleculeDatapoint`\ s.
+    """
+    data = []
+    for kwargs in datapoint_kwargs:
+        features_generator = kwargs.get('features_generator')
+        if features_generator is not None and kwargs.get('features') is not None:
+            raise ValueError('Cannot provide both loaded features and a features generator.')
+
+        d = MoleculeDatapoint(**{**kwargs, 'features_generator': None})
+        d.features_generator = features_generator
+        data.append(d)
+
+    _generate_features([d for d in data if d.features_generator is not None])
+
+    return data
+
+
+def _init_datapoint_worker(params: featurization.Featurization_parameters,
+                           cache_mol: bool,
+                           features_cache: Optional[FeaturesCache]) -> None:
+    """
+    Copies the featurization parameters and caching settings of the main process into a worker process.
+
+    :param params: The featurization parameters of the main process.
+    :param cache_mol: Whether the main process caches RDKit molecules.
+    :param features_cache: The persistent features cache of the main process.
+    """
+    global FEATURES_CACHE
+    featurization.PARAMS = params
+    set_cache_mol(cache_mol)
+    FEATURES_CACHE = features_cache
+
+
+def _make_datapoints_chunk(datapoint_kwargs: List[Dict[str, Any]]) -> List[Tuple[MoleculeDatapoint, Optional[list]]]:
+    r"""
+    Constructs the :class:`MoleculeDatapoint`\ s of a chunk in a worker process.
+
+    :param datapoint_kwargs: A list of keyword arguments for :class:`MoleculeDatapoint`.
+    :return: A list of tuples of each datapoint and its RDKit molecules (or None if molecules are not cached).
+    """
+    data = _make_datapoints(datapoint_kwargs)
+    mols = [d.mol if cache_mol() else None for d in data]
+    SMILES_TO_MOL.clear()
+    if FEATURES_CACHE is not None:
+        FEATURES_CACHE.flush()
+
+    return list(zip(data, mols))
+
+
+def make_datapoint_pool(num_workers: int) -> Pool:
+    r"""
+    Starts a pool of worker processes which construct :class:`MoleculeDatapoint`\ s (see :func:`make_datapoints`),
+    e.g. to reuse the same workers for the datapoints of many chunks of a file.
+
+    The workers copy the featurization parameters, molecule caching setting and features cache of the main process
+    when the pool is started.
+
+    :param num_workers: The number of worker processes.
+    :return: A :class:`multiprocessing.pool.Pool`, which should be closed or used as a context manager.
+    """
+    initargs = (featurization.PARAMS, cache_mol(), FEATURES_CACHE)
+
+    return Pool(num_workers, initializer=_init_datapoint_worker, initargs=initargs)
+
+
+def make_datapoints(datapoint_kwargs: Iterable[Dict[str, Any]],
+                    num_workers: int = 0,
+                    chunk_size: int = 1000,
+                    pool: Pool = None) -> Iterator[MoleculeDatapoint]:
+    r"""
+    Constructs :class:`MoleculeDatapoint`\ s, optionally parsing the molecules and generating the features
+    in a pool of worker processes.
+
+    The datapoints are constructed in chunks, and the features of their features generators are computed for
+    all molecules of a chunk at once with the batch features generators. The datapoints are yielded in the order
+    of :code:`datapoint_kwargs` and are the same as when they are constructed one at a time in the main process.
+    The RDKit molecules parsed by the workers are added to the molecule cache.
+    Features generators must be registered when :mod:`chemprop` is imported to be available in the workers.
+    Features computed for the persistent features cache are written to disk once all datapoints are constructed.
+
+    :param datapoint_kwargs: An iterable of keyword arguments for :class:`MoleculeDatapoint`.
+    :param num_workers: The number of worker processes. With 0 or 1, the datapoints are constructed in the main process.
+    :param chunk_size: The number of datapoints sent to a worker at once.
+    :param pool: A pool of workers started by :func:`make_datapoint_pool`, which is used instead of starting
+                 :code:`num_workers` workers and is left open.
+    :return: An iterator over the constructed :class:`MoleculeDatapoint`\ s.
+    """
+    datapoint_kwargs = iter(datapoint_kwargs)
+    chunks = iter(lambda: list(islice(datapoint_kwargs, chunk_size)), [])
+
+    if pool is None and num_workers <= 1:
+        for chunk in chunks:
+            yield from _make_datapoints(chunk)
+        if FEATURES_CACHE is not None:
+            FEATURES_CACHE.flush()
+        return
+
+    with make_datapoint_pool(num_workers) if pool is None else nullcontext(pool) as pool:
+        for chunk in pool.imap(_make_datapoints_chunk, chunks):
+            for d, mol in chunk:
+                if mol is not None:
+                    for s, m in zip(d.smiles, mol):
+                        if s not in SMILES_TO_MOL:
+                            SMILES_TO_MOL[s] = m
+                yield d
@@ -0,0 +1,298 @@
+from collections import defaultdict
+import hashlib
+import inspect
+import os
+import sqlite3
+from typing import Dict, List, Tuple
+
+import numpy as np
+from rdkit import Chem, rdBase
+
+from .graph_cache import MAX_QUERY_SIZE
+from chemprop.features import get_batch_features_generator, get_features_generator, is_adding_hs, is_explicit_h
+from chemprop.features.features_generators import BatchFeaturesGenerator, FeaturesGenerator, Molecule
+
+# Version of the stored features format, to be increased whenever the layout of the stored arrays changes
+FEATURES_CACHE_VERSION = 1
+
+# Name of the SQLite database indexing the stored features
+INDEX_FILE_NAME = 'index.sqlite3'
+
+# Number of computed features kept in memory by a features generator before they are written to disk
+MAX_PENDING_FEATURES = 1000
+
+
+class FeaturesCache:
+    """
+    A :class:`FeaturesCache` persists the molecule-level features of features generators in a directory on disk
+    so that they only need to be computed once across training, prediction and hyperparameter optimization runs.
+
+    The features of each features generator are appended to a raw binary file of float64 rows which is
+    memory-mapped for reading, and an SQLite database maps canonical SMILES to rows. Features are keyed by
+    the name, signature, default parameters and source code of the features generator together with the RDKit
+    version and the hydrogen settings used to build molecules, so changing any of them stores new features.
+    Changes to code which the features generator calls (e.g., a helper function or an updated package) are not
+    detected, so features generators whose results change that way need a new cache path.
+    """
+
+    def __init__(self, path: str):
+        """
+        :param path: Path to the directory of the cache, which is created if it does not exist.
+        """
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self._connection = None
+        self._pid = None
+        self._arrays = {}
+        self._pending = defaultdict(dict)
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        """An SQLite connection to the index, opened separately in each process (e.g., data loading workers)."""
+        if self._connection is None or self._pid != os.getpid():
+            os.makedirs(self.path, exist_ok=True)
+
+            self._connection = sqlite3.connect(os.path.join(self.path, INDEX_FILE_NAME), timeout=60,
+                                               isolation_level=None)
+            self._connection.execute('CREATE TABLE IF NOT EXISTS arrays ('
+                                     'key TEXT PRIMARY KEY, '
+                                     'file TEXT NOT NULL, '
+                                     'num_features INTEGER NOT NULL, '
+                                     'num_rows INTEGER NOT NULL)')
+            self._connection.execute('CREATE TABLE IF NOT EXISTS features ('
+                                     'key TEXT NOT NULL, '
+                                     'smiles TEXT NOT NULL, '
+                                     'row INTEGER NOT NULL, '
+                                     'PRIMARY KEY (key, smiles))')
+            self._arrays = {}
+            self._pid = os.getpid()
+
+        return self._connection
+
+    @staticmethod
+    def key(features_generator: str) -> str:
+        """
+        Returns the key identifying the stored features of a features generator.
+
+        :param features_generator: The name of a registered features generator.
+        :return: A string which changes whenever the code of the features generator or the molecules it is given
+                 change.
+        """
+        generator = get_features_generator(features_generator)
+        try:
+            source = inspect.getsource(generator)
+        except (OSError, TypeError):
+            # The source is unavailable for functions defined interactively, so use their bytecode instead
+            source = generator.__code__.co_code.hex() if hasattr(generator, '__code__') else ''
+        state = (
+            f'{generator.__module__}.{generator.__qualname__}{inspect.signature(generator)}',
+            hashlib.sha256(source.encode()).hexdigest(), rdBase.rdkitVersion, is_adding_hs(True), is_explicit_h(False)
+        )
+
+        return f'{FEATURES_CACHE_VERSION}-{features_generator}-{hashlib.sha256(repr(state).encode()).hexdigest()[:16]}'
+
+    def _array(self, key: str, row: int) -> np.ndarray:
+        """
+        Returns the memory-mapped features of a key, mapping the file again if it has grown beyond a row.
+
+        :param key: The key of the features.
+        :param row: A row which must be part of the returned array.
+        :return: A read-only memory-mapped 2D array of features.
+        """
+        array = self._arrays.get(key)
+        if array is None or row >= len(array):
+            file, num_features = self.connection.execute(
+                'SELECT file, num_features FROM arrays WHERE key = ?', (key,)
+            ).fetchone()
+            file = os.path.join(self.path, file)
+            num_rows = os.path.getsize(file) // (num_features * np.dtype(np.float64).itemsize)
+            array = self._arrays[key] = np.memmap(file, dtype=np.float64, mode='r', shape=(num_rows, num_features))
+
+        return array
+
+    def get(self, features_generator: str, smiles: List[str]) -> Dict[str, np.ndarray]:
+        """
+        Loads the stored features of a list of canonical SMILES.
+
+        :param features_generator: The name of a registered features generator.
+        :param smiles: A list of canonical SMILES strings.
+        :return: A dictionary mapping each SMILES found in the cache to its features.
+        """
+        return self._get(self.key(features_generator), smiles)
+
+    def _get(self, key: str, smiles: List[str]) -> Dict[str, np.ndarray]:
+        """
+        Loads the stored features of a list of canonical SMILES under a key.
+
+        :param key: The key of the features.
+        :param smiles: A list of canonical SMILES strings.
+        :return: A dictionary mapping each SMILES found in the cache to its features.
+        """
+        unique_smiles = list(dict.fromkeys(smiles))
+
+        features = {s: self._pending[key][s] for s in unique_smiles if s in self._pending[key]}
+        query_smiles = [s for s in unique_smiles if s not in features]
+        for i in range(0, len(query_smiles), MAX_QUERY_SIZE):
+            chunk = query_smiles[i:i + MAX_QUERY_SIZE]
+            rows = self.connection.execute(
+                f'SELECT smiles, row FROM features WHERE key = ? AND smiles IN ({", ".join("?" * len(chunk))})',
+                [key] + chunk
+            ).fetchall()
+            features.update((s, np.array(self._array(key, row)[row])) for s, row in rows)
+
+        self.hits += len(features)
+        self.misses += len(unique_smiles) - len(features)
+
+        return features
+
+    def put(self, features_generator: str, features: Dict[str, np.ndarray]) -> None:
+        """
+        Stores the features of molecules in the cache. Molecules which are already stored are skipped.
+
+        :param features_generator: The name of a registered features generator.
+        :param features: A dictionary mapping canonical SMILES strings to their features.
+        """
+        self._put(self.key(features_generator), features)
+
+    def _put(self, key: str, features: Dict[str, np.ndarray]) -> None:
+        """
+        Stores the features of molecules under a key.
+
+        :param key: The key of the features.
+        :param features: A dictionary mapping canonical SMILES strings to their features.
+        """
+        if len(features) == 0:
+            return
+
+        # Hold the write lock of the index while appending so that concurrent runs do not write the same rows
+        connection = self.connection
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            smiles = list(features.keys())
+            stored_smiles = set()
+            for i in range(0, len(smiles), MAX_QUERY_SIZE):
+                chunk = smiles[i:i + MAX_QUERY_SIZE]
+                stored_smiles.update(s for s, in connection.execute(
+                    f'SELECT smiles FROM features WHERE key = ? AND smiles IN ({", ".join("?" * len(chunk))})',
+                    [key] + chunk
+                ))
+            smiles = [s for s in smiles if s not in stored_smiles]
+
+            if len(smiles) > 0:
+                array = np.stack([np.asarray(features[s], dtype=np.float64) for s in smiles])
+                file, num_rows = self._file(key, array.shape[1])
+
+                # Rows beyond the committed number of rows are left over from interrupted writes and are overwritten
+                with open(os.path.join(self.path, file), 'r+b') as f:
+                    f.seek(num_rows * array.shape[1] * array.itemsize)
+                    f.write(np.ascontiguousarray(array).tobytes())
+
+                connection.executemany('INSERT INTO features (key, smiles, row) VALUES (?, ?, ?)',
+                                       [(key, s, num_rows + i) for i, s in enumerate(smiles)])
+                connection.execute('UPDATE arrays SET num_rows = ? WHERE key = ?', (num_rows + len(smiles), key))
+
+            connection.execute('COMMIT')
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+
+    def _file(self, key: str, num_features: int) -> Tuple[str, int]:
+        """
+        Gets the file storing the features of a key, creating it if needed. Must be called within a transaction.
+
+        :param key: The key of the features.
+        :param num_features: The number of features of each molecule.
+        :return: A tuple containing the name of the file and the number of rows stored in it.
+        """
+        row = self.connection.execute('SELECT file, num_features, num_rows FROM arrays WHERE key = ?',
+                                      (key,)).fetchone()
+        if row is None:
+            file = f'{hashlib.sha256(key.encode()).hexdigest()[:16]}.bin'
+            open(os.path.join(self.path, file), 'wb').close()
+            self.connection.execute('INSERT INTO arrays (key, file, num_features, num_rows) VALUES (?, ?, ?, 0)',
+                                    (key, file, num_features))
+            return file, 0
+
+        file, stored_num_features, num_rows = row
+        if stored_num_features != num_features:
+            raise ValueError(f'Features cache "{self.path}" stores {stored_num_features} features per molecule '
+                             f'for "{key}" but {num_features} features were computed.')
+
+        return file, num_rows
+
+    def features_generator(self, features_generator: str) -> FeaturesGenerator:
+        """
+        Wraps a features generator so that it looks up features in the cache before computing them.
+
+        Computed features are kept in memory and written to disk in groups (see :meth:`flush`).
+
+        :param features_generator: The name of a registered features generator.
+        :return: A features generator which loads stored features by canonical SMILES.
+        """
+        key = self.key(features_generator)
+        generator = get_features_generator(features_generator)
+
+        def cached_features_generator(mol: Molecule) -> np.ndarray:
+            smiles = Chem.MolToSmiles(Chem.MolFromSmiles(mol) if type(mol) == str else mol)
+            features = self._get(key, [smiles]).get(smiles)
+            if features is None:
+                features = self._pending[key][smiles] = np.asarray(generator(mol), dtype=np.float64)
+                if sum(len(pending) for pending in self._pending.values()) >= MAX_PENDING_FEATURES:
+                    self.flush()
+
+            return features
+
+        return cached_features_generator
+
+    def batch_features_generator(self, features_generator: str) -> BatchFeaturesGenerator:
+        """
+        Wraps the batch version of a features generator (see :func:`~chemprop.features.get_batch_features_generator`)
+        so that it looks up the features of all molecules in the cache and only computes the missing ones.
+
+        :param features_generator: The name of a registered features generator.
+        :return: A batch features generator which loads stored features by canonical SMILES.
+        """
+        key = self.key(features_generator)
+        generator = get_batch_features_generator(features_generator)
+
+        def cached_batch_features_generator(mols: List[Molecule]) -> np.ndarray:
+            smiles = [Chem.MolToSmiles(Chem.MolFromSmiles(mol) if type(mol) == str else mol) for mol in mols]
+            features = self._get(key, smiles)
+
+            missing_mols = {s: mol for s, mol in zip(smiles, mols) if s not in features}
+            if len(missing_mols) > 0:
+                for s, mol_features in zip(missing_mols, generator(list(missing_mols.values()))):
+                    features[s] = self._pending[key][s] = mol_features
+                if sum(len(pending) for pending in self._pending.values()) >= MAX_PENDING_FEATURES:
+                    self.flush()
+
+            return np.array([features[s] for s in smiles], dtype=np.float64)
+
+        return cached_batch_features_generator
+
+    def flush(self) -> None:
+        """Writes the features computed by the features generators of :meth:`features_generator` to disk."""
+        for key in list(self._pending.keys()):
+            self._put(key, self._pending[key])
+            del self._pending[key]
+
+    @property
+    def hit_rate(self) -> float:
+        """The fraction of lookups which were found in the cache."""
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups > 0 else 0.0
+
+    def stats(self) -> str:
+        """Returns a summary of the cache hits and misses in this process."""
+        return f'Features cache "{self.path}": {self.hits:,} hits, {self.misses:,} misses ' \
+               f'(hit rate = {self.hit_rate:.2%})'
+
+    def __getstate__(self) -> dict:
+        """Excludes the SQLite connection, memory maps and unwritten features when pickling (e.g., for workers)."""
+        state = self.__dict__.copy()
+        state['_connection'] = state['_pid'] = None
+        state['_arrays'] = {}
+        state['_pending'] = defaultdict(dict)
+
+        return state
@@ -0,0 +1,117 @@
+import os
+import pickle
+import sqlite3
+from typing import Dict, List
+
+from chemprop.features import featurization_parameters_hash, MolGraph
+
+# Version of the stored graph format, to be increased whenever the layout of a MolGraph or the keys change
+GRAPH_CACHE_VERSION = 3
+
+# Maximum number of SMILES looked up in a single query (SQLite limits the number of query parameters)
+MAX_QUERY_SIZE = 500
+
+
+class GraphCache:
+    r"""
+    A :class:`GraphCache` persists :class:`~chemprop.features.MolGraph`\ s in an SQLite database on disk
+    so that molecules only need to be featurized once across training, prediction and hyperparameter optimization runs.
+
+    Graphs are keyed by the SMILES as given in the data together with a hash of the featurization parameters
+    (see :meth:`~chemprop.features.featurization_parameters_hash`), so changing settings such as explicit
+    hydrogens or the reaction mode never returns stale graphs. The SMILES are not canonicalized, which would
+    require parsing every molecule on each lookup and would not preserve the atom order of the input.
+    """
+
+    def __init__(self, path: str):
+        """
+        :param path: Path to the SQLite database file, which is created if it does not exist.
+        """
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self._connection = None
+        self._pid = None
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        """An SQLite connection to the database, opened separately in each process (e.g., data loader workers)."""
+        if self._connection is None or self._pid != os.getpid():
+            if os.path.dirname(self.path) != '':
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+
+            self._connection = sqlite3.connect(self.path, timeout=60)
+            self._connection.execute('CREATE TABLE IF NOT EXISTS graph ('
+                                     'featurization TEXT NOT NULL, '
+                                     'smiles TEXT NOT NULL, '
+                                     'mol_graph BLOB NOT NULL, '
+                                     'PRIMARY KEY (featurization, smiles))')
+            self._connection.commit()
+            self._pid = os.getpid()
+
+        return self._connection
+
+    @staticmethod
+    def featurization() -> str:
+        """Returns the key identifying the current graph format and featurization parameters."""
+        return f'{GRAPH_CACHE_VERSION}-{featurization_parameters_hash()}'
+
+    def get(self, smiles: List[str]) -> Dict[str, MolGraph]:
+        r"""
+        Loads the stored :class:`~chemprop.features.MolGraph`\ s of a list of SMILES.
+
+        :param smiles: A list of SMILES strings.
+        :return: A dictionary mapping each SMILES found in the cache to its :class:`~chemprop.features.MolGraph`.
+        """
+        featurization = self.featurization()
+        unique_smiles = list(dict.fromkeys(smiles))
+
+        mol_graphs = {}
+        for i in range(0, len(unique_smiles), MAX_QUERY_SIZE):
+            query_smiles = unique_smiles[i:i + MAX_QUERY_SIZE]
+            rows = self.connection.execute(
+                f'SELECT smiles, mol_graph FROM graph WHERE featurization = ? '
+                f'AND smiles IN ({", ".join("?" * len(query_smiles))})',
+                [featurization] + query_smiles
+            ).fetchall()
+            mol_graphs.update((s, pickle.loads(mol_graph)) for s, mol_graph in rows)
+
+        self.hits += len(mol_graphs)
+        self.misses += len(unique_smiles) - len(mol_graphs)
+
+        return mol_graphs
+
+    def put(self, mol_graphs: Dict[str, MolGraph]) -> None:
+        r"""
+        Stores :class:`~chemprop.features.MolGraph`\ s in the cache.
+
+        :param mol_graphs: A dictionary mapping SMILES strings to their :class:`~chemprop.features.MolGraph`.
+        """
+        if len(mol_graphs) == 0:
+            return
+
+        featurization = self.featurization()
+        with self.connection:
+            self.connection.executemany(
+                'INSERT OR REPLACE INTO graph (featurization, smiles, mol_graph) VALUES (?, ?, ?)',
+                [(featurization, s, pickle.dumps(mol_graph, protocol=pickle.HIGHEST_PROTOCOL))
+                 for s, mol_graph in mol_graphs.items()]
+            )
+
+    @property
+    def hit_rate(self) -> float:
+        """The fraction of lookups which were found in the cache."""
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups > 0 else 0.0
+
+    def stats(self) -> str:
+        """Returns a summary of the cache hits and misses in this process."""
+        return f'Graph cache "{self.path}": {self.hits:,} hits, {self.misses:,} misses ' \
+               f'(hit rate = {self.hit_rate:.2%})'
+
+    def __getstate__(self) -> dict:
+        """Excludes the SQLite connection when pickling (e.g., when sending the cache to data loader workers)."""
+        state = self.__dict__.copy()
+        state['_connection'] = state['_pid'] = None
+
+        return state
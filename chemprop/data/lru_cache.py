@@ -0,0 +1,171 @@
+from collections import OrderedDict
+import sys
+from typing import Any, Callable, Hashable, Optional, Tuple, Union
+
+import numpy as np
+from rdkit import Chem
+import torch
+
+from chemprop.features import BatchMolGraph, MolGraph
+
+# Estimated memory used by an RDKit molecule (measured from the resident memory of parsed molecules)
+MOL_BASE_BYTES = 1000
+MOL_ATOM_BYTES = 1000
+MOL_BOND_BYTES = 200
+
+
+def get_mol_size(mol: Optional[Union[Chem.Mol, Tuple[Chem.Mol, Chem.Mol]]]) -> int:
+    """
+    Estimates the memory used by an RDKit molecule (or a tuple of reactant and product molecules).
+
+    :param mol: An RDKit molecule, a tuple of RDKit molecules or None.
+    :return: The estimated number of bytes used by the molecule.
+    """
+    if mol is None:
+        return sys.getsizeof(mol)
+
+    if isinstance(mol, tuple):
+        return sys.getsizeof(mol) + sum(get_mol_size(m) for m in mol)
+
+    return MOL_BASE_BYTES + MOL_ATOM_BYTES * mol.GetNumAtoms() + MOL_BOND_BYTES * mol.GetNumBonds()
+
+
+def get_mol_graph_size(mol_graph: MolGraph) -> int:
+    """
+    Estimates the memory used by a :class:`~chemprop.features.MolGraph`.
+
+    :param mol_graph: A :class:`~chemprop.features.MolGraph`.
+    :return: The estimated number of bytes used by the graph and its arrays.
+    """
+    size = sys.getsizeof(mol_graph)
+    for name in MolGraph.__slots__:
+        value = getattr(mol_graph, name)
+        size += value.nbytes if isinstance(value, np.ndarray) else sys.getsizeof(value)
+
+    return size
+
+
+def get_batch_graph_size(batch_graph: BatchMolGraph) -> int:
+    """
+    Estimates the memory used by a :class:`~chemprop.features.BatchMolGraph`.
+
+    The combined atom/bond features :code:`f_bonds` are counted even if they have not been built yet
+    since they are built (and kept) by the first forward pass of a model using bond messages.
+
+    :param batch_graph: A :class:`~chemprop.features.BatchMolGraph`.
+    :return: The estimated number of bytes used by the graph and its tensors.
+    """
+    size = sys.getsizeof(batch_graph)
+    for value in vars(batch_graph).values():
+        if isinstance(value, torch.Tensor):
+            size += value.element_size() * value.nelement()
+        elif isinstance(value, list):
+            size += sys.getsizeof(value) + sum(sys.getsizeof(v) for v in value)
+        else:
+            size += sys.getsizeof(value)
+
+    if batch_graph._f_bonds is None:
+        size += batch_graph.n_bonds * batch_graph.bond_fdim * batch_graph.f_atoms.element_size()
+
+    return size
+
+
+class LRUCache:
+    """
+    An :class:`LRUCache` is a dictionary-like cache with an optional memory budget.
+
+    Once the estimated memory of the cached values exceeds the budget, the least recently used
+    values are evicted. Lookups through :meth:`get` are counted to report the hit rate of the cache.
+    """
+
+    def __init__(self, get_size: Callable[[Any], int], max_bytes: Optional[float] = None):
+        """
+        :param get_size: A function estimating the memory used by a value in bytes.
+        :param max_bytes: The maximum estimated memory of the cached values in bytes (None for unbounded).
+        """
+        self.get_size = get_size
+        self.max_bytes = max_bytes
+        self.num_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._data = OrderedDict()  # maps each key to a tuple of (value, size)
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._data
+
+    def __getitem__(self, key: Hashable) -> Any:
+        value, _ = self._data[key]
+        self._data.move_to_end(key)
+
+        return value
+
+    def __setitem__(self, key: Hashable, value: Any) -> None:
+        size = self.get_size(value) if self.max_bytes is not None else 0
+
+        if key in self._data:
+            self.num_bytes -= self._data[key][1]
+        self._data[key] = (value, size)
+        self._data.move_to_end(key)
+        self.num_bytes += size
+
+        self._evict()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """
+        Looks up a key and records whether it was a hit or a miss.
+
+        :param key: The key to look up.
+        :param default: The value to return if the key is not in the cache.
+        :return: The cached value or :code:`default`.
+        """
+        if key in self._data:
+            self.hits += 1
+            return self[key]
+
+        self.misses += 1
+
+        return default
+
+    def clear(self) -> None:
+        """Removes all values from the cache (the hit and miss counts are kept)."""
+        self._data.clear()
+        self.num_bytes = 0
+
+    def set_max_bytes(self, max_bytes: Optional[float]) -> None:
+        """
+        Sets the memory budget of the cache, evicting values if necessary.
+
+        :param max_bytes: The maximum estimated memory of the cached values in bytes (None for unbounded).
+        """
+        if max_bytes is not None and self.max_bytes is None:
+            # Sizes are only computed for bounded caches
+            self._data = OrderedDict((key, (value, self.get_size(value))) for key, (value, _) in self._data.items())
+            self.num_bytes = sum(size for _, size in self._data.values())
+
+        self.max_bytes = max_bytes
+        self._evict()
+
+    def _evict(self) -> None:
+        """Evicts the least recently used values until the cache fits within its memory budget."""
+        if self.max_bytes is None:
+            return
+
+        while self.num_bytes > self.max_bytes and len(self._data) > 0:
+            _, (_, size) = self._data.popitem(last=False)
+            self.num_bytes -= size
+            self.evictions += 1
+
+    @property
+    def hit_rate(self) -> float:
+        """The fraction of lookups which were found in the cache."""
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups > 0 else 0.0
+
+    def stats(self) -> str:
+        """Returns a summary of the size and hit rate of the cache."""
+        return f'{len(self):,} entries ({self.num_bytes / 1e6:,.1f} MB), {self.hits:,} hits, ' \
+               f'{self.misses:,} misses (hit rate = {self.hit_rate:.2%}), {self.evictions:,} evictions'
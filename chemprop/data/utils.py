@@ -1,16 +1,19 @@
 from collections import OrderedDict, defaultdict
+from contextlib import nullcontext
 import csv
+from itertools import islice
 from logging import Logger
 import pickle
 from random import Random
-from typing import List, Set, Tuple, Union
+from typing import Iterator, List, Set, Tuple, Union
 import os
 
 from rdkit import Chem
 import numpy as np
 from tqdm import tqdm
 
-from .data import MoleculeDatapoint, MoleculeDataset, make_mols
+from .compiled import CompiledDataset, is_compiled_dataset, load_compiled_dataset
+from .data import MoleculeDataset, make_datapoint_pool, make_datapoints, make_mols
 from .scaffold import log_scaffold_stats, scaffold_split
 from chemprop.args import PredictArgs, TrainArgs
 from chemprop.features import load_features, load_valid_atom_or_bond_features, is_mol
@@ -19,9 +22,13 @@ def get_header(path: str) -> List[str]:
     """
     Returns the header of a data CSV file.
 
-    :param path: Path to a CSV file.
+    :param path: Path to a CSV file (or a compiled dataset, whose header is its SMILES columns and task names).
     :return: A list of strings containing the strings in the comma-separated header.
     """
+    if is_compiled_dataset(path):
+        metadata = CompiledDataset(path).metadata
+        return metadata['smiles_columns'] + metadata['task_names']
+
     with open(path) as f:
         header = next(csv.reader(f))
 
@@ -44,7 +51,7 @@ def preprocess_smiles_columns(path: str,
     """
 
     if smiles_columns is None:
-        if os.path.isfile(path):
+        if os.path.isfile(path) or is_compiled_dataset(path):
             columns = get_header(path)
             smiles_columns = columns[:number_of_molecules]
         else:
@@ -52,7 +59,7 @@ def preprocess_smiles_columns(path: str,
     else:
         if not isinstance(smiles_columns,list):
             smiles_columns=[smiles_columns]
-        if os.path.isfile(path):
+        if os.path.isfile(path) or is_compiled_dataset(path):
             columns = get_header(path)
             if len(smiles_columns) != number_of_molecules:
                 raise ValueError('Length of smiles_columns must match number_of_molecules.')
@@ -176,6 +183,33 @@ def filter_invalid_smiles(data: MoleculeDataset) -> MoleculeDataset:
                             and all(m[0].GetNumHeavyAtoms() + m[1].GetNumHeavyAtoms() > 0 for m in datapoint.mol if isinstance(m, tuple))])
 
 
+def deduplicate_data(data: MoleculeDataset) -> Tuple[MoleculeDataset, List[int]]:
+    """
+    Finds the distinct inputs of a dataset, comparing molecules by canonical SMILES along with their features.
+
+    :param data: A :class:`~chemprop.data.MoleculeDataset` with valid molecules.
+    :return: A tuple containing a :class:`~chemprop.data.MoleculeDataset` with the first datapoint of each distinct
+             input and a list with the index in it of the input of each datapoint in :code:`data`.
+    """
+    unique_indices, indices = {}, []
+    for d in data:
+        canonical_smiles = tuple(
+            tuple(Chem.MolToSmiles(m) for m in mol) if isinstance(mol, tuple) else Chem.MolToSmiles(mol)
+            for mol in d.mol
+        )
+        features = tuple(
+            np.asarray(array).tobytes() if array is not None else None
+            for array in (d.features, d.phase_features, d.atom_descriptors, d.atom_features, d.bond_features)
+        )
+        indices.append(unique_indices.setdefault((canonical_smiles, features), len(unique_indices)))
+
+    first_indices = {}
+    for i, index in enumerate(indices):
+        first_indices.setdefault(index, i)
+
+    return MoleculeDataset([data[i] for i in first_indices.values()]), indices
+
+
 def get_invalid_smiles_from_file(path: str = None,
                smiles_columns: Union[str, List[str]] = None,
                header: bool = True,
@@ -245,11 +279,15 @@ def get_data(path: str,
              store_row: bool = False,
              logger: Logger = None,
              loss_function: str = None,
-             skip_none_targets: bool = False) -> MoleculeDataset:
+             skip_none_targets: bool = False,
+             featurization_workers: int = None) -> MoleculeDataset:
     """
     Gets SMILES and target values from a CSV file.
 
-    :param path: Path to a CSV file.
+    If :code:`path` is a dataset compiled with :func:`~chemprop.data.compile_dataset`, the SMILES, targets, features
+    and graphs are loaded from the compiled dataset instead, which holds the features given when compiling it.
+
+    :param path: Path to a CSV file or to a compiled dataset directory.
     :param smiles_columns: The names of the columns containing SMILES.
                            By default, uses the first :code:`number_of_molecules` columns.
     :param target_columns: Name of the columns containing target values. By default, uses all columns
@@ -271,6 +309,8 @@ def get_data(path: str,
     :param skip_none_targets: Whether to skip targets that are all 'None'. This is mostly relevant when --target_columns
                               are passed in, so only a subset of tasks are examined.
     :param loss_function: The loss function to be used in training.
+    :param featurization_workers: The number of processes used to parse the molecules and generate the features.
+                                  If provided, it is used in place of :code:`args.featurization_workers`.
     :return: A :class:`~chemprop.data.MoleculeDataset` containing SMILES and target values along
              with other info such as additional features when desired.
     """
@@ -290,10 +330,27 @@ def get_data(path: str,
             else args.bond_features_path
         max_data_size = max_data_size if max_data_size is not None else args.max_data_size
         loss_function = loss_function if loss_function is not None else args.loss_function
+        featurization_workers = featurization_workers if featurization_workers is not None \
+            else args.featurization_workers
 
     if not isinstance(smiles_columns, list):
         smiles_columns = preprocess_smiles_columns(path=path, smiles_columns=smiles_columns)
 
+    if is_compiled_dataset(path):
+        return load_compiled_dataset(
+            path=path,
+            target_columns=get_task_names(path=path, smiles_columns=smiles_columns, target_columns=target_columns,
+                                          ignore_columns=ignore_columns, loss_function=loss_function),
+            features_generator=features_generator,
+            max_data_size=max_data_size,
+            store_row=store_row,
+            loss_function=loss_function,
+            skip_none_targets=skip_none_targets,
+            overwrite_default_atom_features=args.overwrite_default_atom_features if args is not None else False,
+            overwrite_default_bond_features=args.overwrite_default_bond_features if args is not None else False,
+            logger=logger
+        )
+
     max_data_size = max_data_size or float('inf')
 
     # Load features
@@ -413,8 +470,8 @@ def get_data(path: str,
             except Exception as e:
                 raise ValueError(f'Failed to load or validate custom bond features: {e}')
 
-        data = MoleculeDataset([
-            MoleculeDatapoint(
+        datapoint_kwargs = (
+            dict(
                 smiles=smiles,
                 targets=targets,
                 row=all_rows[i] if store_row else None,
@@ -429,9 +486,10 @@ def get_data(path: str,
                 bond_features=bond_features[i] if bond_features is not None else None,
                 overwrite_default_atom_features=args.overwrite_default_atom_features if args is not None else False,
                 overwrite_default_bond_features=args.overwrite_default_bond_features if args is not None else False
-            ) for i, (smiles, targets) in tqdm(enumerate(zip(all_smiles, all_targets)),
-                                               total=len(all_smiles))
-        ])
+            ) for i, (smiles, targets) in enumerate(zip(all_smiles, all_targets))
+        )
+        data = MoleculeDataset(list(tqdm(make_datapoints(datapoint_kwargs, num_workers=featurization_workers or 0),
+                                         total=len(all_smiles))))
 
     # Filter out invalid SMILES
     if skip_invalid_smiles:
@@ -447,7 +505,8 @@ def get_data(path: str,
 def get_data_from_smiles(smiles: List[List[str]],
                          skip_invalid_smiles: bool = True,
                          logger: Logger = None,
-                         features_generator: List[str] = None) -> MoleculeDataset:
+                         features_generator: List[str] = None,
+                         featurization_workers: int = 0) -> MoleculeDataset:
     """
     Converts a list of SMILES to a :class:`~chemprop.data.MoleculeDataset`.
 
@@ -455,17 +514,18 @@ def get_data_from_smiles(smiles: List[List[str]],
     :param skip_invalid_smiles: Whether to skip and filter out invalid smiles using :func:`filter_invalid_smiles`
     :param logger: A logger for recording output.
     :param features_generator: List of features generators.
+    :param featurization_workers: The number of processes used to parse the molecules and generate the features.
     :return: A :class:`~chemprop.data.MoleculeDataset` with all of the provided SMILES.
     """
     debug = logger.debug if logger is not None else print
 
-    data = MoleculeDataset([
-        MoleculeDatapoint(
+    data = MoleculeDataset(list(make_datapoints((
+        dict(
             smiles=smile,
             row=OrderedDict({'smiles': smile}),
             features_generator=features_generator
         ) for smile in smiles
-    ])
+    ), num_workers=featurization_workers)))
 
     # Filter out invalid SMILES
     if skip_invalid_smiles:
@@ -478,6 +538,58 @@ def get_data_from_smiles(smiles: List[List[str]],
     return data
 
 
+def get_data_chunks(path: str,
+                    chunk_size: int,
+                    smiles_columns: List[str] = None,
+                    skip_rows: int = 0,
+                    max_data_size: int = None,
+                    features_generator: List[str] = None,
+                    store_row: bool = False,
+                    args: Union[TrainArgs, PredictArgs] = None) -> Iterator[MoleculeDataset]:
+    """
+    Reads SMILES from a CSV file in chunks so that the whole file is never held in memory.
+
+    Invalid SMILES are kept, as in :func:`get_data` with :code:`skip_invalid_smiles=False`, so that the
+    datapoints of each chunk line up with the rows of the file.
+
+    :param path: Path to a CSV file.
+    :param chunk_size: The number of rows in each chunk.
+    :param smiles_columns: The names of the columns containing SMILES.
+                           By default, uses the first :code:`number_of_molecules` columns.
+    :param skip_rows: The number of data rows to skip at the start of the file, e.g. when resuming.
+    :param max_data_size: The maximum number of data rows to read, including the skipped rows.
+    :param features_generator: A list of features generators to use.
+    :param store_row: Whether to store the raw CSV row in each :class:`~chemprop.data.data.MoleculeDatapoint`.
+    :param args: Arguments, either :class:`~chemprop.args.TrainArgs` or :class:`~chemprop.args.PredictArgs`.
+    :return: An iterator over :class:`~chemprop.data.MoleculeDataset`\ s of at most :code:`chunk_size` datapoints.
+    """
+    if not isinstance(smiles_columns, list):
+        smiles_columns = preprocess_smiles_columns(path=path, smiles_columns=smiles_columns)
+
+    # The worker processes featurizing the molecules are started once and reused for all chunks
+    num_workers = args.featurization_workers if args is not None else 0
+    with open(path) as f, make_datapoint_pool(num_workers) if num_workers > 1 else nullcontext() as pool:
+        reader = csv.DictReader(f)
+        if any([c not in reader.fieldnames for c in smiles_columns]):
+            raise ValueError(f'Data file did not contain all provided smiles columns: {smiles_columns}. Data file field names are: {reader.fieldnames}')
+
+        rows = islice(reader, skip_rows, max_data_size)
+        while True:
+            chunk = list(islice(rows, chunk_size))
+            if len(chunk) == 0:
+                break
+
+            yield MoleculeDataset(list(make_datapoints((
+                dict(
+                    smiles=[row[c] for c in smiles_columns],
+                    row=row if store_row else None,
+                    features_generator=features_generator,
+                    overwrite_default_atom_features=args.overwrite_default_atom_features if args is not None else False,
+                    overwrite_default_bond_features=args.overwrite_default_bond_features if args is not None else False
+                ) for row in chunk
+            ), pool=pool)))
+
+
 def get_inequality_targets(path: str, target_columns: List[str] = None) -> List[str]:
     """
 
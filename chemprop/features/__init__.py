@@ -1,21 +1,29 @@
-from .features_generators import get_available_features_generators, get_features_generator, \
-    morgan_binary_features_generator, morgan_counts_features_generator, rdkit_2d_features_generator, \
-    rdkit_2d_normalized_features_generator, register_features_generator
-from .featurization import atom_features, bond_features, BatchMolGraph, get_atom_fdim, get_bond_fdim, mol2graph, \
-    MolGraph, onek_encoding_unk, set_extra_atom_fdim, set_extra_bond_fdim, set_reaction, set_explicit_h, \
-    set_adding_hs, is_reaction, is_explicit_h, is_adding_hs, is_mol, reset_featurization_parameters
+from .features_generators import get_available_features_generators, get_batch_features_generator, \
+    get_features_generator, morgan_binary_features_generator, morgan_counts_features_generator, \
+    rdkit_2d_features_generator, rdkit_2d_normalized_features_generator, register_batch_features_generator, \
+    register_features_generator
+from .featurization import atom_features, atom_features_array, bond_features, bond_features_array, BatchMolGraph, \
+    featurization_parameters_hash, get_atom_fdim, get_bond_fdim, mol2graph, MolGraph, onek_encoding_unk, onek_encoding_unk_indices, \
+    set_extra_atom_fdim, set_extra_bond_fdim, set_reaction, set_explicit_h, set_adding_hs, is_reaction, is_explicit_h, \
+    is_adding_hs, is_mol, reaction_mode, reset_featurization_parameters
 from .utils import load_features, save_features, load_valid_atom_or_bond_features
 
 __all__ = [
     'get_available_features_generators',
+    'get_batch_features_generator',
     'get_features_generator',
     'morgan_binary_features_generator',
     'morgan_counts_features_generator',
     'rdkit_2d_features_generator',
     'rdkit_2d_normalized_features_generator',
+    'register_batch_features_generator',
+    'register_features_generator',
     'atom_features',
+    'atom_features_array',
     'bond_features',
+    'bond_features_array',
     'BatchMolGraph',
+    'featurization_parameters_hash',
     'get_atom_fdim',
     'set_extra_atom_fdim',
     'get_bond_fdim',
@@ -27,9 +35,11 @@ __all__ = [
     'is_explicit_h',
     'is_adding_hs',
     'is_mol',
+    'reaction_mode',
     'mol2graph',
     'MolGraph',
     'onek_encoding_unk',
+    'onek_encoding_unk_indices',
     'load_features',
     'save_features',
     'load_valid_atom_or_bond_features',
@@ -1,4 +1,5 @@
-from typing import Callable, List, Union
+from functools import lru_cache
+from typing import Callable, List, Sequence, Tuple, Union
 
 import numpy as np
 from rdkit import Chem, DataStructs
@@ -7,9 +8,11 @@ from rdkit.Chem import AllChem
 
 Molecule = Union[str, Chem.Mol]
 FeaturesGenerator = Callable[[Molecule], np.ndarray]
+BatchFeaturesGenerator = Callable[[Sequence[Molecule]], np.ndarray]
 
 
 FEATURES_GENERATOR_REGISTRY = {}
+BATCH_FEATURES_GENERATOR_REGISTRY = {}
 
 
 def register_features_generator(features_generator_name: str) -> Callable[[FeaturesGenerator], FeaturesGenerator]:
@@ -45,6 +48,44 @@ def get_available_features_generators() -> List[str]:
     return list(FEATURES_GENERATOR_REGISTRY.keys())
 
 
+def register_batch_features_generator(features_generator_name: str) \
+        -> Callable[[BatchFeaturesGenerator], BatchFeaturesGenerator]:
+    """
+    Creates a decorator which registers a batch version of a features generator by the name of the features generator.
+
+    A batch features generator computes the features of a list of molecules at once as a 2D float64 array, which
+    contains the same values as applying the features generator to each molecule.
+
+    :param features_generator_name: The name of the features generator which the batch features generator computes.
+    :return: A decorator which will add a batch features generator to the registry using the specified name.
+    """
+    def decorator(batch_features_generator: BatchFeaturesGenerator) -> BatchFeaturesGenerator:
+        BATCH_FEATURES_GENERATOR_REGISTRY[features_generator_name] = batch_features_generator
+        return batch_features_generator
+
+    return decorator
+
+
+def get_batch_features_generator(features_generator_name: str) -> BatchFeaturesGenerator:
+    """
+    Gets the batch version of a registered features generator by name.
+
+    Features generators without a registered batch version are applied to each molecule in turn.
+
+    :param features_generator_name: The name of the features generator.
+    :return: A function which computes the features of a list of molecules as a 2D float64 array.
+    """
+    if features_generator_name in BATCH_FEATURES_GENERATOR_REGISTRY:
+        return BATCH_FEATURES_GENERATOR_REGISTRY[features_generator_name]
+
+    features_generator = get_features_generator(features_generator_name)
+
+    def batch_features_generator(mols: Sequence[Molecule]) -> np.ndarray:
+        return np.array([features_generator(mol) for mol in mols], dtype=np.float64)
+
+    return batch_features_generator
+
+
 MORGAN_RADIUS = 2
 MORGAN_NUM_BITS = 2048
 
@@ -92,6 +133,53 @@ def morgan_counts_features_generator(mol: Molecule,
 try:
     from descriptastorus.descriptors import rdDescriptors, rdNormalizedDescriptors
 
+    @lru_cache(maxsize=None)
+    def _rdkit_2d_generator() -> rdDescriptors.RDKit2D:
+        """Returns the RDKit 2D descriptor generator of this process, which is created on first use."""
+        return rdDescriptors.RDKit2D()
+
+    @lru_cache(maxsize=None)
+    def _rdkit_2d_normalized_generator() -> rdNormalizedDescriptors.RDKit2DNormalized:
+        """Returns the RDKit 2D normalized descriptor generator of this process, which is created on first use."""
+        return rdNormalizedDescriptors.RDKit2DNormalized()
+
+    def _descriptor_mol(mol: Molecule) -> Chem.Mol:
+        """
+        Prepares a molecule for descriptastorus, which computes descriptors of molecules parsed from SMILES.
+
+        RDKit molecules are used as they are unless they contain explicit hydrogens, which are removed by
+        converting the molecule to SMILES and back.
+
+        :param mol: A molecule (i.e., either a SMILES or an RDKit molecule).
+        :return: An RDKit molecule.
+        """
+        if type(mol) == str:
+            return Chem.MolFromSmiles(mol)
+        if mol.GetNumAtoms() != mol.GetNumHeavyAtoms():
+            return Chem.MolFromSmiles(Chem.MolToSmiles(mol, isomericSmiles=True))
+
+        return mol
+
+    def _rdkit_2d_descriptors(mols: Sequence[Molecule]) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Computes the RDKit 2D descriptors of a list of molecules.
+
+        :param mols: A list of molecules (i.e., either SMILES or RDKit molecules).
+        :return: A tuple containing a 2D float64 array of descriptors and a 2D boolean array indicating
+                 which descriptors could not be computed (and are 0 in the array of descriptors).
+        """
+        generator = _rdkit_2d_generator()
+        descriptors = np.empty((len(mols), len(generator.columns)))
+        failed = np.zeros(descriptors.shape, dtype=bool)
+        for i, mol in enumerate(mols):
+            values = generator.calculateMol(_descriptor_mol(mol), None)
+            for j, value in enumerate(values):
+                if value is None:
+                    values[j], failed[i, j] = 0.0, True
+            descriptors[i] = values
+
+        return descriptors, failed
+
     @register_features_generator('rdkit_2d')
     def rdkit_2d_features_generator(mol: Molecule) -> np.ndarray:
         """
@@ -100,9 +188,7 @@ try:
         :param mol: A molecule (i.e., either a SMILES or an RDKit molecule).
         :return: A 1D numpy array containing the RDKit 2D features.
         """
-        smiles = Chem.MolToSmiles(mol, isomericSmiles=True) if type(mol) != str else mol
-        generator = rdDescriptors.RDKit2D()
-        features = generator.process(smiles)[1:]
+        features = _rdkit_2d_generator().processMol(_descriptor_mol(mol), mol)[1:]
 
         return features
 
@@ -114,9 +200,38 @@ try:
         :param mol: A molecule (i.e., either a SMILES or an RDKit molecule).
         :return: A 1D numpy array containing the RDKit 2D normalized features.
         """
-        smiles = Chem.MolToSmiles(mol, isomericSmiles=True) if type(mol) != str else mol
-        generator = rdNormalizedDescriptors.RDKit2DNormalized()
-        features = generator.process(smiles)[1:]
+        features = _rdkit_2d_normalized_generator().processMol(_descriptor_mol(mol), mol)[1:]
+
+        return features
+
+    @register_batch_features_generator('rdkit_2d')
+    def rdkit_2d_batch_features_generator(mols: Sequence[Molecule]) -> np.ndarray:
+        """
+        Generates RDKit 2D features for a list of molecules.
+
+        :param mols: A list of molecules (i.e., either SMILES or RDKit molecules).
+        :return: A 2D float64 numpy array containing the RDKit 2D features of each molecule.
+        """
+        descriptors, _ = _rdkit_2d_descriptors(mols)
+
+        return descriptors
+
+    @register_batch_features_generator('rdkit_2d_normalized')
+    def rdkit_2d_normalized_batch_features_generator(mols: Sequence[Molecule]) -> np.ndarray:
+        """
+        Generates RDKit 2D normalized features for a list of molecules.
+
+        The cumulative distribution functions used for normalization are applied to each descriptor
+        of all molecules at once.
+
+        :param mols: A list of molecules (i.e., either SMILES or RDKit molecules).
+        :return: A 2D float64 numpy array containing the RDKit 2D normalized features of each molecule.
+        """
+        descriptors, failed = _rdkit_2d_descriptors(mols)
+        features = np.zeros(descriptors.shape)
+        for j, (name, _) in enumerate(_rdkit_2d_generator().columns):
+            if name in rdNormalizedDescriptors.cdfs:
+                features[:, j] = np.where(failed[:, j], 0.0, rdNormalizedDescriptors.cdfs[name](descriptors[:, j]))
 
         return features
 except ImportError:
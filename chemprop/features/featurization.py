@@ -1,5 +1,7 @@
-from typing import List, Tuple, Union
+from collections import defaultdict
+from typing import List, Optional, Sequence, Tuple, Union
 from itertools import zip_longest
+import hashlib
 import logging
 
 from rdkit import Chem
@@ -8,6 +10,36 @@ import numpy as np
 
 from chemprop.rdkit import make_mol
 
+def onek_encoding_table(choices_list: List[List[int]]) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Builds a lookup table for one-hot encoding several integer features into consecutive blocks at once.
+
+    Each feature occupies :code:`len(choices) + 1` positions, the last of which is for uncommon values.
+
+    :param choices_list: A list containing the possible values of each feature.
+    :return: A tuple containing the smallest choice of each feature, the number of table entries of each feature
+             (one per value between its smallest and largest choice), the start of the entries of each feature
+             in the table, and the table itself. The table maps each entry to the position of the one in the
+             concatenated encodings and the entry following those of a feature holds its uncommon value position.
+    """
+    lows, sizes, starts, table = [], [], [], []
+    offset = 0
+    for choices in choices_list:
+        choices = [int(choice) for choice in choices]
+        low = min(choices)
+        entries = [offset + len(choices)] * (max(choices) - low + 2)
+        for index, choice in reversed(list(enumerate(choices))):
+            entries[choice - low] = offset + index
+
+        lows.append(low)
+        sizes.append(len(entries) - 1)
+        starts.append(len(table))
+        table.extend(entries)
+        offset += len(choices) + 1
+
+    return np.array(lows), np.array(sizes), np.array(starts), np.array(table)
+
+
 class Featurization_parameters:
     """
     A class holding molecule featurization parameters as attributes.
@@ -39,6 +71,7 @@ class Featurization_parameters:
 
         # len(choices) + 1 to include room for uncommon values; + 2 at end for IsAromatic and mass
         self.ATOM_FDIM = sum(len(choices) + 1 for choices in self.ATOM_FEATURES.values()) + 2
+        self.ATOM_FEATURES_TABLE = onek_encoding_table(list(self.ATOM_FEATURES.values()))
         self.EXTRA_ATOM_FDIM = 0
         self.BOND_FDIM = 14
         self.EXTRA_BOND_FDIM = 0
@@ -64,6 +97,21 @@ def reset_featurization_parameters(logger: logging.Logger = None) -> None:
     PARAMS = Featurization_parameters()
 
 
+def featurization_parameters_hash() -> str:
+    """
+    Computes a hash of the molecule featurization parameters which determine the contents of a :class:`MolGraph`.
+
+    :return: A hexadecimal string which changes whenever the featurization parameters change.
+    """
+    state = (
+        {name: [int(choice) for choice in choices] for name, choices in PARAMS.ATOM_FEATURES.items()},
+        PARAMS.ATOM_FDIM, PARAMS.EXTRA_ATOM_FDIM, PARAMS.BOND_FDIM, PARAMS.EXTRA_BOND_FDIM,
+        PARAMS.REACTION_MODE, PARAMS.EXPLICIT_H, PARAMS.REACTION, PARAMS.ADDING_H
+    )
+
+    return hashlib.sha256(repr(state).encode()).hexdigest()[:16]
+
+
 def get_atom_fdim(overwrite_default_atom: bool = False, is_reaction: bool = False) -> int:
     """
     Gets the dimensionality of the atom feature vector.
@@ -250,6 +298,122 @@ def bond_features(bond: Chem.rdchem.Bond) -> List[Union[bool, int, float]]:
     return fbond
 
 
+def onek_encoding_unk_indices(values: np.ndarray,
+                              table: Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]) -> np.ndarray:
+    """
+    Vectorized counterpart of :meth:`onek_encoding_unk` which returns the position of the one
+    in the one-hot encoding of each value rather than the encodings themselves.
+
+    :param values: A 2D integer array of shape :code:`(num_values, num_features)` containing the values of
+                   the first :code:`num_features` features encoded by :code:`table`.
+    :param table: A lookup table built by :meth:`onek_encoding_table`.
+    :return: A 2D integer array containing the position of the one in the concatenated encodings for each value.
+    """
+    num_features = values.shape[1]
+    lows, sizes, starts, entries = table
+    lows, sizes, starts = lows[:num_features], sizes[:num_features], starts[:num_features]
+
+    values = values - lows
+    values = np.where((values >= 0) & (values < sizes), values, sizes)
+
+    return entries[starts + values]
+
+
+def atom_features_array(atoms: Sequence[Chem.rdchem.Atom], dtype: type = np.float32) -> np.ndarray:
+    """
+    Builds the feature vectors for a sequence of atoms at once.
+
+    RDKit atom properties are gathered into integer arrays which are one-hot encoded in bulk
+    into a preallocated buffer. Row :code:`i` is identical to :code:`atom_features(atoms[i])`
+    once cast to :code:`dtype`.
+
+    :param atoms: A sequence of RDKit atoms.
+    :param dtype: The data type of the returned array.
+    :return: A 2D array of shape :code:`(len(atoms), ATOM_FDIM)` containing the atom features.
+    """
+    features = np.zeros((len(atoms), PARAMS.ATOM_FDIM), dtype=dtype)
+    if len(atoms) == 0:
+        return features
+
+    properties = np.array([
+        (atom.GetAtomicNum() - 1,
+         atom.GetTotalDegree(),
+         atom.GetFormalCharge(),
+         int(atom.GetChiralTag()),
+         atom.GetTotalNumHs(),
+         int(atom.GetHybridization()),
+         atom.GetIsAromatic(),
+         atom.GetMass())
+        for atom in atoms
+    ], dtype=np.float64)
+    masses = properties[:, -1]
+    properties = properties[:, :-1].astype(np.int64)
+
+    rows = np.arange(len(atoms))[:, None]
+    features[rows, onek_encoding_unk_indices(properties[:, :-1], PARAMS.ATOM_FEATURES_TABLE)] = 1
+    features[:, -2] = properties[:, -1]
+    features[:, -1] = masses * 0.01  # scaled to about the same range as other features
+
+    return features
+
+
+def atom_features_zeros_array(atoms: Sequence[Chem.rdchem.Atom], dtype: type = np.float32) -> np.ndarray:
+    """
+    Builds the feature vectors containing only the atom number information for a sequence of atoms at once.
+
+    :param atoms: A sequence of RDKit atoms.
+    :param dtype: The data type of the returned array.
+    :return: A 2D array of shape :code:`(len(atoms), ATOM_FDIM)` where row :code:`i` is identical
+             to :code:`atom_features_zeros(atoms[i])`.
+    """
+    features = np.zeros((len(atoms), PARAMS.ATOM_FDIM), dtype=dtype)
+    if len(atoms) == 0:
+        return features
+
+    atomic_nums = np.array([[atom.GetAtomicNum() - 1] for atom in atoms], dtype=np.int64)
+    features[np.arange(len(atoms))[:, None], onek_encoding_unk_indices(atomic_nums, PARAMS.ATOM_FEATURES_TABLE)] = 1
+
+    return features
+
+
+def bond_features_array(bonds: Sequence[Optional[Chem.rdchem.Bond]], dtype: type = np.float32) -> np.ndarray:
+    """
+    Builds the feature vectors for a sequence of bonds at once.
+
+    :param bonds: A sequence of RDKit bonds. Entries may be None, in which case the
+                  "bond is None" feature is set as in :meth:`bond_features`.
+    :param dtype: The data type of the returned array.
+    :return: A 2D array of shape :code:`(len(bonds), BOND_FDIM)` where row :code:`i` is identical
+             to :code:`bond_features(bonds[i])`.
+    """
+    features = np.zeros((len(bonds), PARAMS.BOND_FDIM), dtype=dtype)
+    if len(bonds) == 0:
+        return features
+
+    # Bond type, conjugation, ring membership and stereo; a bond type of -1 marks a missing bond
+    properties = np.array([
+        (int(bond.GetBondType()), bond.GetIsConjugated(), bond.IsInRing(), int(bond.GetStereo()))
+        if bond is not None else (-1, 0, 0, 0)
+        for bond in bonds
+    ], dtype=np.int64)
+    bond_types, missing = properties[:, 0], properties[:, 0] == -1
+
+    features[:, 0] = missing
+    features[:, 1] = bond_types == int(Chem.rdchem.BondType.SINGLE)
+    features[:, 2] = bond_types == int(Chem.rdchem.BondType.DOUBLE)
+    features[:, 3] = bond_types == int(Chem.rdchem.BondType.TRIPLE)
+    features[:, 4] = bond_types == int(Chem.rdchem.BondType.AROMATIC)
+    features[:, 5] = properties[:, 1]
+    features[:, 6] = properties[:, 2]
+
+    stereo = properties[:, 3]
+    stereo = np.where((stereo >= 0) & (stereo < 6), stereo, 6)
+    present = np.flatnonzero(~missing)
+    features[present, 7 + stereo[present]] = 1
+
+    return features
+
+
 def map_reac_to_prod(mol_reac: Chem.Mol, mol_prod: Chem.Mol):
     """
     Build a dictionary of mapping atom indices in the reactants to the products.
@@ -290,12 +454,15 @@ class MolGraph:
     A MolGraph computes the following attributes:
 
     * :code:`n_atoms`: The number of atoms in the molecule.
-    * :code:`n_bonds`: The number of bonds in the molecule.
-    * :code:`f_atoms`: A mapping from an atom index to a list of atom features.
-    * :code:`f_bonds`: A mapping from a bond index to a list of bond features.
-    * :code:`a2b`: A mapping from an atom index to a list of incoming bond indices.
-    * :code:`b2a`: A mapping from a bond index to the index of the atom the bond originates from.
-    * :code:`b2revb`: A mapping from a bond index to the index of the reverse bond.
+    * :code:`n_bonds`: The number of (directed) bonds in the molecule.
+    * :code:`f_atoms`: A float32 array mapping from an atom index to the atom features.
+    * :code:`f_bond`: A float32 array mapping from each pair of directed bonds :code:`2i` and :code:`2i + 1`
+      to their bond features.
+    * :code:`a2b_ptr`: CSR row pointers into :code:`a2b_idx`, such that the incoming bonds of atom :code:`a`
+      are :code:`a2b_idx[a2b_ptr[a]:a2b_ptr[a + 1]]`.
+    * :code:`a2b_idx`: CSR indices of the incoming bonds of each atom.
+    * :code:`b2a`: An array mapping from a bond index to the index of the atom the bond originates from.
+    * :code:`b2revb`: An array mapping from a bond index to the index of the reverse bond.
     * :code:`overwrite_default_atom_features`: A boolean to overwrite default atom descriptors.
     * :code:`overwrite_default_bond_features`: A boolean to overwrite default bond descriptors.
     * :code:`is_mol`: A boolean whether the input is a molecule.
@@ -303,8 +470,15 @@ class MolGraph:
     * :code:`is_explicit_h`: A boolean whether to retain explicit Hs (for reaction mode)
     * :code:`is_adding_hs`: A boolean whether to add explicit Hs (not for reaction mode)
     * :code:`reaction_mode`:  Reaction mode to construct atom and bond feature vectors
+
+    The combined atom/bond features :code:`f_bonds` and the lists of incoming bonds :code:`a2b` are computed
+    on demand, so that only compact arrays are kept when graphs are cached.
     """
 
+    __slots__ = ('is_mol', 'is_reaction', 'is_explicit_h', 'is_adding_hs', 'reaction_mode', 'n_atoms', 'n_bonds',
+                 'f_atoms', 'f_bond', 'a2b_ptr', 'a2b_idx', 'b2a', 'b2revb',
+                 'overwrite_default_atom_features', 'overwrite_default_bond_features')
+
     def __init__(self, mol: Union[str, Chem.Mol, Tuple[Chem.Mol, Chem.Mol]],
                  atom_features_extra: np.ndarray = None,
                  bond_features_extra: np.ndarray = None,
@@ -332,66 +506,52 @@ class MolGraph:
 
         self.n_atoms = 0  # number of atoms
         self.n_bonds = 0  # number of bonds
-        self.f_atoms = []  # mapping from atom index to atom features
-        self.f_bonds = []  # mapping from bond index to concat(in_atom, bond) features
-        self.a2b = []  # mapping from atom index to incoming bond indices
-        self.b2a = []  # mapping from bond index to the index of the atom the bond is coming from
-        self.b2revb = []  # mapping from bond index to the index of the reverse bond
+        self.f_atoms = None  # array mapping from atom index to atom features
+        self.f_bond = None  # array mapping from each pair of directed bonds to the bond features
+        self.a2b_ptr = None  # CSR row pointers of the mapping from atom index to incoming bond indices
+        self.a2b_idx = None  # CSR indices of the mapping from atom index to incoming bond indices
+        self.b2a = None  # mapping from bond index to the index of the atom the bond is coming from
+        self.b2revb = None  # mapping from bond index to the index of the reverse bond
         self.overwrite_default_atom_features = overwrite_default_atom_features
         self.overwrite_default_bond_features = overwrite_default_bond_features
 
         if not self.is_reaction:
             # Get atom features
-            self.f_atoms = [atom_features(atom) for atom in mol.GetAtoms()]
+            if atom_features_extra is not None and len(atom_features_extra) != mol.GetNumAtoms():
+                raise ValueError(f'The number of atoms in {Chem.MolToSmiles(mol)} is different from the length of '
+                                 f'the extra atom features')
+
+            self.f_atoms = atom_features_array(list(mol.GetAtoms()))
             if atom_features_extra is not None:
+                atom_features_extra = np.asarray(atom_features_extra, dtype=np.float32)
                 if overwrite_default_atom_features:
-                    self.f_atoms = [descs.tolist() for descs in atom_features_extra]
+                    self.f_atoms = atom_features_extra
                 else:
-                    self.f_atoms = [f_atoms + descs.tolist() for f_atoms, descs in zip(self.f_atoms, atom_features_extra)]
+                    self.f_atoms = np.hstack((self.f_atoms, atom_features_extra))
 
             self.n_atoms = len(self.f_atoms)
-            if atom_features_extra is not None and len(atom_features_extra) != self.n_atoms:
-                raise ValueError(f'The number of atoms in {Chem.MolToSmiles(mol)} is different from the length of '
-                                 f'the extra atom features')
 
-            # Initialize atom to bond mapping for each atom
-            for _ in range(self.n_atoms):
-                self.a2b.append([])
+            # Get bonds, ordered by the pair of atoms (a1 < a2) they connect
+            bonds = sorted(((tuple(sorted((bond.GetBeginAtomIdx(), bond.GetEndAtomIdx()))), bond)
+                            for bond in mol.GetBonds()), key=lambda pair_bond: pair_bond[0])
+            pairs = [pair for pair, _ in bonds]
+            bonds = [bond for _, bond in bonds]
 
-            # Get bond features
-            for a1 in range(self.n_atoms):
-                for a2 in range(a1 + 1, self.n_atoms):
-                    bond = mol.GetBondBetweenAtoms(a1, a2)
-
-                    if bond is None:
-                        continue
-
-                    f_bond = bond_features(bond)
-                    if bond_features_extra is not None:
-                        descr = bond_features_extra[bond.GetIdx()].tolist()
-                        if overwrite_default_bond_features:
-                            f_bond = descr
-                        else:
-                            f_bond += descr
-
-                    self.f_bonds.append(self.f_atoms[a1] + f_bond)
-                    self.f_bonds.append(self.f_atoms[a2] + f_bond)
-
-                    # Update index mappings
-                    b1 = self.n_bonds
-                    b2 = b1 + 1
-                    self.a2b[a2].append(b1)  # b1 = a1 --> a2
-                    self.b2a.append(a1)
-                    self.a2b[a1].append(b2)  # b2 = a2 --> a1
-                    self.b2a.append(a2)
-                    self.b2revb.append(b2)
-                    self.b2revb.append(b1)
-                    self.n_bonds += 2
-
-            if bond_features_extra is not None and len(bond_features_extra) != self.n_bonds / 2:
+            if bond_features_extra is not None and len(bond_features_extra) != len(bonds):
                 raise ValueError(f'The number of bonds in {Chem.MolToSmiles(mol)} is different from the length of '
                                  f'the extra bond features')
 
+            # Get bond features
+            f_bond = bond_features_array(bonds)
+            if bond_features_extra is not None:
+                descr = np.asarray(bond_features_extra, dtype=np.float32)[[bond.GetIdx() for bond in bonds]]
+                if overwrite_default_bond_features:
+                    f_bond = descr
+                else:
+                    f_bond = np.hstack((f_bond, descr))
+
+            self.add_bonds(pairs, f_bond)
+
         else: # Reaction mode
             if atom_features_extra is not None:
                 raise NotImplementedError('Extra atom features are currently not supported for reactions')
@@ -401,94 +561,142 @@ class MolGraph:
             mol_reac = mol[0]
             mol_prod = mol[1]
             ri2pi, pio, rio = map_reac_to_prod(mol_reac, mol_prod)
-           
+
+            # Atom features are combined in double precision and only cast to float32 at the end,
+            # so that the differences match those computed from the per-atom feature lists
+            atoms_reac = list(mol_reac.GetAtoms())
+            atoms_only_prod = [mol_prod.GetAtomWithIdx(index) for index in pio]
+            f_atoms_prod_all = atom_features_array(list(mol_prod.GetAtoms()), dtype=np.float64)
+            f_atoms_only_prod = f_atoms_prod_all[np.array(pio, dtype=np.int64)]
+            in_prod = np.array([atom.GetIdx() not in rio for atom in atoms_reac], dtype=bool)
+            reac_to_prod = np.array([ri2pi[atom.GetIdx()] for atom in atoms_reac if atom.GetIdx() not in rio],
+                                    dtype=np.int64)
+
             # Get atom features
             if self.reaction_mode in ['reac_diff','prod_diff', 'reac_prod']:
                 #Reactant: regular atom features for each atom in the reactants, as well as zero features for atoms that are only in the products (indices in pio)
-                f_atoms_reac = [atom_features(atom) for atom in mol_reac.GetAtoms()] + [atom_features_zeros(mol_prod.GetAtomWithIdx(index)) for index in pio]
-                
+                f_atoms_reac = np.vstack((atom_features_array(atoms_reac, dtype=np.float64),
+                                          atom_features_zeros_array(atoms_only_prod, dtype=np.float64)))
+
                 #Product: regular atom features for each atom that is in both reactants and products (not in rio), other atom features zero,
                 #regular features for atoms that are only in the products (indices in pio)
-                f_atoms_prod = [atom_features(mol_prod.GetAtomWithIdx(ri2pi[atom.GetIdx()])) if atom.GetIdx() not in rio else
-                                atom_features_zeros(atom) for atom in mol_reac.GetAtoms()] + [atom_features(mol_prod.GetAtomWithIdx(index)) for index in pio]
+                f_atoms_prod_reac = atom_features_zeros_array(atoms_reac, dtype=np.float64)
             else: #balance
                 #Reactant: regular atom features for each atom in the reactants, copy features from product side for atoms that are only in the products (indices in pio)
-                f_atoms_reac = [atom_features(atom) for atom in mol_reac.GetAtoms()] + [atom_features(mol_prod.GetAtomWithIdx(index)) for index in pio]
-                
+                f_atoms_reac = np.vstack((atom_features_array(atoms_reac, dtype=np.float64), f_atoms_only_prod))
+
                 #Product: regular atom features for each atom that is in both reactants and products (not in rio), copy features from reactant side for
                 #other atoms, regular features for atoms that are only in the products (indices in pio)
-                f_atoms_prod = [atom_features(mol_prod.GetAtomWithIdx(ri2pi[atom.GetIdx()])) if atom.GetIdx() not in rio else
-                                atom_features(atom) for atom in mol_reac.GetAtoms()] + [atom_features(mol_prod.GetAtomWithIdx(index)) for index in pio]
+                f_atoms_prod_reac = atom_features_array(atoms_reac, dtype=np.float64)
+            f_atoms_prod_reac[in_prod] = f_atoms_prod_all[reac_to_prod]
+            f_atoms_prod = np.vstack((f_atoms_prod_reac, f_atoms_only_prod))
 
             if self.reaction_mode in ['reac_diff', 'prod_diff', 'reac_diff_balance', 'prod_diff_balance']:
-                f_atoms_diff = [list(map(lambda x, y: x - y, ii, jj)) for ii, jj in zip(f_atoms_prod, f_atoms_reac)]
+                f_atoms_diff = f_atoms_prod - f_atoms_reac
             if self.reaction_mode in ['reac_prod', 'reac_prod_balance']:
-                self.f_atoms = [x+y[PARAMS.MAX_ATOMIC_NUM+1:] for x,y in zip(f_atoms_reac, f_atoms_prod)]
+                self.f_atoms = np.hstack((f_atoms_reac, f_atoms_prod[:, PARAMS.MAX_ATOMIC_NUM+1:]))
             elif self.reaction_mode in ['reac_diff', 'reac_diff_balance']:
-                self.f_atoms = [x+y[PARAMS.MAX_ATOMIC_NUM+1:] for x,y in zip(f_atoms_reac, f_atoms_diff)]
+                self.f_atoms = np.hstack((f_atoms_reac, f_atoms_diff[:, PARAMS.MAX_ATOMIC_NUM+1:]))
             elif self.reaction_mode in ['prod_diff', 'prod_diff_balance']:
-                self.f_atoms = [x+y[PARAMS.MAX_ATOMIC_NUM+1:] for x,y in zip(f_atoms_prod, f_atoms_diff)]
+                self.f_atoms = np.hstack((f_atoms_prod, f_atoms_diff[:, PARAMS.MAX_ATOMIC_NUM+1:]))
+            self.f_atoms = self.f_atoms.astype(np.float32)
             self.n_atoms = len(self.f_atoms)
             n_atoms_reac = mol_reac.GetNumAtoms()
 
-            # Initialize atom to bond mapping for each atom
-            for _ in range(self.n_atoms):
-                self.a2b.append([])
-
-            # Get bond features
-            for a1 in range(self.n_atoms):
-                for a2 in range(a1 + 1, self.n_atoms):
-                    if a1 >= n_atoms_reac and a2 >= n_atoms_reac: # Both atoms only in product
-                        bond_prod = mol_prod.GetBondBetweenAtoms(pio[a1 - n_atoms_reac], pio[a2 - n_atoms_reac])
-                        if self.reaction_mode in ['reac_prod_balance', 'reac_diff_balance', 'prod_diff_balance']:
-                            bond_reac = bond_prod
-                        else:
-                            bond_reac = None
-                    elif a1 < n_atoms_reac and a2 >= n_atoms_reac: # One atom only in product
+            # Only pairs of atoms bonded in the reactants or in the products can be bonded in the graph, where each
+            # product atom corresponds to the reactant atoms mapped to it or to its index after the reactant atoms
+            prod_to_atoms = defaultdict(list)
+            for reac_idx, prod_idx in ri2pi.items():
+                prod_to_atoms[prod_idx].append(reac_idx)
+            for index, prod_idx in enumerate(pio):
+                prod_to_atoms[prod_idx].append(n_atoms_reac + index)
+
+            candidates = {tuple(sorted((bond.GetBeginAtomIdx(), bond.GetEndAtomIdx()))) for bond in mol_reac.GetBonds()}
+            for bond in mol_prod.GetBonds():
+                for a1 in prod_to_atoms[bond.GetBeginAtomIdx()]:
+                    for a2 in prod_to_atoms[bond.GetEndAtomIdx()]:
+                        candidates.add((min(a1, a2), max(a1, a2)))
+
+            # Get bonds, ordered by the pair of atoms (a1 < a2) they connect
+            pairs, bonds_reac, bonds_prod = [], [], []
+            for a1, a2 in sorted(candidates):
+                if a1 >= n_atoms_reac and a2 >= n_atoms_reac: # Both atoms only in product
+                    bond_prod = mol_prod.GetBondBetweenAtoms(pio[a1 - n_atoms_reac], pio[a2 - n_atoms_reac])
+                    if self.reaction_mode in ['reac_prod_balance', 'reac_diff_balance', 'prod_diff_balance']:
+                        bond_reac = bond_prod
+                    else:
                         bond_reac = None
-                        if a1 in ri2pi.keys():
-                            bond_prod = mol_prod.GetBondBetweenAtoms(ri2pi[a1], pio[a2 - n_atoms_reac])
-                        else:
-                            bond_prod = None # Atom atom only in reactant, the other only in product
+                elif a1 < n_atoms_reac and a2 >= n_atoms_reac: # One atom only in product
+                    bond_reac = None
+                    if a1 in ri2pi.keys():
+                        bond_prod = mol_prod.GetBondBetweenAtoms(ri2pi[a1], pio[a2 - n_atoms_reac])
+                    else:
+                        bond_prod = None # Atom atom only in reactant, the other only in product
+                else:
+                    bond_reac = mol_reac.GetBondBetweenAtoms(a1, a2)
+                    if a1 in ri2pi.keys() and a2 in ri2pi.keys():
+                        bond_prod = mol_prod.GetBondBetweenAtoms(ri2pi[a1], ri2pi[a2]) #Both atoms in both reactant and product
                     else:
-                        bond_reac = mol_reac.GetBondBetweenAtoms(a1, a2)
-                        if a1 in ri2pi.keys() and a2 in ri2pi.keys():
-                            bond_prod = mol_prod.GetBondBetweenAtoms(ri2pi[a1], ri2pi[a2]) #Both atoms in both reactant and product
-                        else:
-                            if self.reaction_mode in ['reac_prod_balance', 'reac_diff_balance', 'prod_diff_balance']:
-                                if a1 in ri2pi.keys() or a2 in ri2pi.keys():
-                                    bond_prod = None # One atom only in reactant
-                                else:
-                                    bond_prod = bond_reac # Both atoms only in reactant
-                            else:    
-                                bond_prod = None # One or both atoms only in reactant
-
-                    if bond_reac is None and bond_prod is None:
-                        continue
-
-                    f_bond_reac = bond_features(bond_reac)
-                    f_bond_prod = bond_features(bond_prod)
-                    if self.reaction_mode in ['reac_diff', 'prod_diff', 'reac_diff_balance', 'prod_diff_balance']:
-                        f_bond_diff = [y - x for x, y in zip(f_bond_reac, f_bond_prod)]
-                    if self.reaction_mode in ['reac_prod', 'reac_prod_balance']:
-                        f_bond = f_bond_reac + f_bond_prod
-                    elif self.reaction_mode in ['reac_diff', 'reac_diff_balance']:
-                        f_bond = f_bond_reac + f_bond_diff
-                    elif self.reaction_mode in ['prod_diff', 'prod_diff_balance']:
-                        f_bond = f_bond_prod + f_bond_diff
-                    self.f_bonds.append(self.f_atoms[a1] + f_bond)
-                    self.f_bonds.append(self.f_atoms[a2] + f_bond)
-
-                    # Update index mappings
-                    b1 = self.n_bonds
-                    b2 = b1 + 1
-                    self.a2b[a2].append(b1)  # b1 = a1 --> a2
-                    self.b2a.append(a1)
-                    self.a2b[a1].append(b2)  # b2 = a2 --> a1
-                    self.b2a.append(a2)
-                    self.b2revb.append(b2)
-                    self.b2revb.append(b1)
-                    self.n_bonds += 2                
+                        if self.reaction_mode in ['reac_prod_balance', 'reac_diff_balance', 'prod_diff_balance']:
+                            if a1 in ri2pi.keys() or a2 in ri2pi.keys():
+                                bond_prod = None # One atom only in reactant
+                            else:
+                                bond_prod = bond_reac # Both atoms only in reactant
+                        else:    
+                            bond_prod = None # One or both atoms only in reactant
+
+                if bond_reac is None and bond_prod is None:
+                    continue
+
+                pairs.append((a1, a2))
+                bonds_reac.append(bond_reac)
+                bonds_prod.append(bond_prod)
+
+            # Get bond features
+            f_bond_reac = bond_features_array(bonds_reac)
+            f_bond_prod = bond_features_array(bonds_prod)
+            if self.reaction_mode in ['reac_diff', 'prod_diff', 'reac_diff_balance', 'prod_diff_balance']:
+                f_bond_diff = f_bond_prod - f_bond_reac
+            if self.reaction_mode in ['reac_prod', 'reac_prod_balance']:
+                f_bond = np.hstack((f_bond_reac, f_bond_prod))
+            elif self.reaction_mode in ['reac_diff', 'reac_diff_balance']:
+                f_bond = np.hstack((f_bond_reac, f_bond_diff))
+            elif self.reaction_mode in ['prod_diff', 'prod_diff_balance']:
+                f_bond = np.hstack((f_bond_prod, f_bond_diff))
+
+            self.add_bonds(pairs, f_bond)
+
+    def add_bonds(self, pairs: List[Tuple[int, int]], f_bond: np.ndarray) -> None:
+        """
+        Sets the two directed bonds b1 = a1 --> a2 and b2 = a2 --> a1 for each bond between a pair of atoms.
+
+        The directed bonds of the i-th pair have the indices :code:`2i` and :code:`2i + 1`.
+
+        :param pairs: A list of (a1, a2) atom index pairs, one per bond.
+        :param f_bond: A 2D array containing the bond features of each bond in :code:`pairs`.
+        """
+        self.f_bond = np.ascontiguousarray(f_bond, dtype=np.float32)
+        self.b2a = np.array(pairs, dtype=np.int32).reshape(-1)
+        self.n_bonds = len(self.b2a)
+        self.b2revb = np.arange(self.n_bonds, dtype=np.int32) ^ 1
+
+        # Each bond comes into the atom its reverse bond originates from, and the incoming bonds of each atom
+        # are kept in order of bond index
+        b2a_in = self.b2a[self.b2revb]
+        self.a2b_idx = np.argsort(b2a_in, kind='stable').astype(np.int32)
+        self.a2b_ptr = np.zeros(self.n_atoms + 1, dtype=np.int32)
+        np.cumsum(np.bincount(b2a_in, minlength=self.n_atoms), out=self.a2b_ptr[1:])
+
+    @property
+    def f_bonds(self) -> np.ndarray:
+        """A float32 array mapping from a bond index to the concat(in_atom, bond) features."""
+        return np.hstack((self.f_atoms[self.b2a], np.repeat(self.f_bond, 2, axis=0)))
+
+    @property
+    def a2b(self) -> List[List[int]]:
+        """A mapping from an atom index to a list of incoming bond indices."""
+        return [self.a2b_idx[self.a2b_ptr[a]:self.a2b_ptr[a + 1]].tolist() for a in range(self.n_atoms)]
+
 
 class BatchMolGraph:
     """
@@ -501,13 +709,19 @@ class BatchMolGraph:
     * :code:`a_scope`: A list of tuples indicating the start and end atom indices for each molecule.
     * :code:`b_scope`: A list of tuples indicating the start and end bond indices for each molecule.
     * :code:`max_num_bonds`: The maximum number of bonds neighboring an atom in this batch.
+    * :code:`f_bond_features`: A mapping from a bond index to its bond features, without the features of the atom
+      the bond comes from. :code:`f_bonds` is built from it and :code:`f_atoms` when first needed.
     * :code:`b2b`: (Optional) A mapping from a bond index to incoming bond indices.
     * :code:`a2a`: (Optional): A mapping from an atom index to neighboring atom indices.
+    * :code:`mol_index`: (Optional) A mapping from each row of the batch to the index of its molecule in the
+      :class:`BatchMolGraph` when repeated molecules are only included once.
     """
 
-    def __init__(self, mol_graphs: List[MolGraph]):
+    def __init__(self, mol_graphs: List[MolGraph], mol_index: Optional[np.ndarray] = None):
         r"""
         :param mol_graphs: A list of :class:`MolGraph`\ s from which to construct the :class:`BatchMolGraph`.
+        :param mol_index: An array with the index in :code:`mol_graphs` of the molecule of each row of the batch
+                          if repeated molecules are only included once. None if there is one graph per row.
         """
         self.overwrite_default_atom_features = mol_graphs[0].overwrite_default_atom_features
         self.overwrite_default_bond_features = mol_graphs[0].overwrite_default_bond_features
@@ -519,43 +733,64 @@ class BatchMolGraph:
                                       is_reaction=self.is_reaction)
 
         # Start n_atoms and n_bonds at 1 b/c zero padding
-        self.n_atoms = 1  # number of atoms (start at 1 b/c need index 0 as padding)
-        self.n_bonds = 1  # number of bonds (start at 1 b/c need index 0 as padding)
-        self.a_scope = []  # list of tuples indicating (start_atom_index, num_atoms) for each molecule
-        self.b_scope = []  # list of tuples indicating (start_bond_index, num_bonds) for each molecule
+        n_atoms = np.array([mol_graph.n_atoms for mol_graph in mol_graphs], dtype=np.int64)
+        n_bonds = np.array([mol_graph.n_bonds for mol_graph in mol_graphs], dtype=np.int64)
+        atom_offsets = 1 + np.cumsum(n_atoms) - n_atoms  # index of the first atom of each molecule
+        bond_offsets = 1 + np.cumsum(n_bonds) - n_bonds  # index of the first bond of each molecule
+        self.n_atoms = 1 + int(n_atoms.sum())  # number of atoms (start at 1 b/c need index 0 as padding)
+        self.n_bonds = 1 + int(n_bonds.sum())  # number of bonds (start at 1 b/c need index 0 as padding)
+        # Lists of tuples indicating (start_atom_index, num_atoms) and (start_bond_index, num_bonds) for each molecule
+        self.a_scope = list(zip(atom_offsets.tolist(), n_atoms.tolist()))
+        self.b_scope = list(zip(bond_offsets.tolist(), n_bonds.tolist()))
 
         # All start with zero padding so that indexing with zero padding returns zeros
-        f_atoms = [[0] * self.atom_fdim]  # atom features
-        f_bonds = [[0] * self.bond_fdim]  # combined atom/bond features
-        a2b = [[]]  # mapping from atom index to incoming bond indices
-        b2a = [0]  # mapping from bond index to the index of the atom the bond is coming from
-        b2revb = [0]  # mapping from bond index to the index of the reverse bond
-        for mol_graph in mol_graphs:
-            f_atoms.extend(mol_graph.f_atoms)
-            f_bonds.extend(mol_graph.f_bonds)
-
-            for a in range(mol_graph.n_atoms):
-                a2b.append([b + self.n_bonds for b in mol_graph.a2b[a]])
-
-            for b in range(mol_graph.n_bonds):
-                b2a.append(self.n_atoms + mol_graph.b2a[b])
-                b2revb.append(self.n_bonds + mol_graph.b2revb[b])
-
-            self.a_scope.append((self.n_atoms, mol_graph.n_atoms))
-            self.b_scope.append((self.n_bonds, mol_graph.n_bonds))
-            self.n_atoms += mol_graph.n_atoms
-            self.n_bonds += mol_graph.n_bonds
-
-        self.max_num_bonds = max(1, max(
-            len(in_bonds) for in_bonds in a2b))  # max with 1 to fix a crash in rare case of all single-heavy-atom mols
-
-        self.f_atoms = torch.FloatTensor(f_atoms)
-        self.f_bonds = torch.FloatTensor(f_bonds)
-        self.a2b = torch.LongTensor([a2b[a] + [0] * (self.max_num_bonds - len(a2b[a])) for a in range(self.n_atoms)])
-        self.b2a = torch.LongTensor(b2a)
-        self.b2revb = torch.LongTensor(b2revb)
+        # Atom features
+        f_atoms = np.concatenate([np.zeros((1, self.atom_fdim), dtype=np.float32)]
+                                 + [mol_graph.f_atoms for mol_graph in mol_graphs], axis=0)
+
+        # Mapping from bond index to the index of the atom the bond is coming from
+        b2a = np.zeros(self.n_bonds, dtype=np.int64)
+        b2a[1:] = np.concatenate([mol_graph.b2a for mol_graph in mol_graphs])
+        b2a[1:] += np.repeat(atom_offsets, n_bonds)
+
+        # Mapping from bond index to the index of the reverse bond
+        b2revb = np.zeros(self.n_bonds, dtype=np.int64)
+        b2revb[1:] = np.concatenate([mol_graph.b2revb for mol_graph in mol_graphs])
+        b2revb[1:] += np.repeat(bond_offsets, n_bonds)
+
+        # Bond features of each directed bond (the combined atom/bond features are only built if needed)
+        f_bond_features = np.zeros((self.n_bonds, self.bond_fdim - self.atom_fdim), dtype=np.float32)
+        f_bond_features[1:] = np.repeat(np.concatenate([mol_graph.f_bond for mol_graph in mol_graphs]), 2, axis=0)
+
+        # Mapping from atom index to incoming bond indices, padded with zeros, from the CSR mappings of each molecule
+        # (every bond comes into exactly one atom, so each molecule has n_bonds entries)
+        a2b_counts = np.zeros(self.n_atoms, dtype=np.int64)
+        a2b_counts[1:] = np.concatenate([np.diff(mol_graph.a2b_ptr) for mol_graph in mol_graphs])
+        self.max_num_bonds = max(1, int(a2b_counts.max()))  # max with 1 to fix a crash in rare case of all single-heavy-atom mols
+
+        a2b_rows = np.repeat(np.arange(self.n_atoms), a2b_counts)
+        a2b_cols = np.arange(len(a2b_rows)) - np.repeat(np.cumsum(a2b_counts) - a2b_counts, a2b_counts)
+        a2b = np.zeros((self.n_atoms, self.max_num_bonds), dtype=np.int64)
+        a2b[a2b_rows, a2b_cols] = np.concatenate([mol_graph.a2b_idx for mol_graph in mol_graphs]) \
+            + np.repeat(bond_offsets, n_bonds)
+
+        self.f_atoms = torch.from_numpy(f_atoms)
+        self.f_bond_features = torch.from_numpy(f_bond_features)
+        self._f_bonds = None
+        self.a2b = torch.from_numpy(a2b)
+        self.b2a = torch.from_numpy(b2a)
+        self.b2revb = torch.from_numpy(b2revb)
         self.b2b = None  # try to avoid computing b2b b/c O(n_atoms^3)
         self.a2a = None  # only needed if using atom messages
+        self.mol_index = torch.from_numpy(mol_index) if mol_index is not None else None
+
+    @property
+    def f_bonds(self) -> torch.FloatTensor:
+        """A mapping from a bond index to the concat(in_atom, bond) features, computed when first accessed."""
+        if self._f_bonds is None:
+            self._f_bonds = torch.cat((self.f_atoms[self.b2a], self.f_bond_features), dim=1)
+
+        return self._f_bonds
 
     def get_components(self, atom_messages: bool = False) -> Tuple[torch.FloatTensor, torch.FloatTensor,
                                                                    torch.LongTensor, torch.LongTensor, torch.LongTensor,
@@ -579,9 +814,7 @@ class BatchMolGraph:
                  and scope of the atoms and bonds (i.e., the indices of the molecules they belong to).
         """
         if atom_messages:
-            f_bonds = self.f_bonds[:, -get_bond_fdim(atom_messages=atom_messages,
-                                                     overwrite_default_atom=self.overwrite_default_atom_features,
-                                                     overwrite_default_bond=self.overwrite_default_bond_features):]
+            f_bonds = self.f_bond_features
         else:
             f_bonds = self.f_bonds
 
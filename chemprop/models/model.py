@@ -144,8 +144,31 @@ class MoleculeModel(nn.Module):
                 for param in list(self.ffn.parameters())[0:2 * args.frzn_ffn_layers]:  # Freeze weights and bias for given number of layers
                     param.requires_grad = False
 
+    def encode(self,
+               batch: Union[List[List[str]], List[List[Chem.Mol]], List[List[Tuple[Chem.Mol, Chem.Mol]]], List[BatchMolGraph], np.ndarray],
+               features_batch: List[np.ndarray] = None,
+               atom_descriptors_batch: List[np.ndarray] = None,
+               atom_features_batch: List[np.ndarray] = None,
+               bond_features_batch: List[np.ndarray] = None) -> torch.Tensor:
+        """
+        Encodes the input molecules with the message passing network, unless their encodings are precomputed.
+
+        :param batch: A list of list of SMILES, a list of list of RDKit molecules, a
+                      list of :class:`~chemprop.features.featurization.BatchMolGraph`, or a 2D numpy array
+                      with the precomputed encodings of the molecules (see :meth:`~chemprop.data.MoleculeDataset.encodings`).
+        :param features_batch: A list of numpy arrays containing additional features.
+        :param atom_descriptors_batch: A list of numpy arrays containing additional atom descriptors.
+        :param atom_features_batch: A list of numpy arrays containing additional atom features.
+        :param bond_features_batch: A list of numpy arrays containing additional bond features.
+        :return: The encodings of the molecules, which are the inputs of the feed-forward layers.
+        """
+        if isinstance(batch, np.ndarray):
+            return torch.from_numpy(batch).float().to(self.encoder.device)
+
+        return self.encoder(batch, features_batch, atom_descriptors_batch, atom_features_batch, bond_features_batch)
+
     def fingerprint(self,
-                    batch: Union[List[List[str]], List[List[Chem.Mol]], List[List[Tuple[Chem.Mol, Chem.Mol]]], List[BatchMolGraph]],
+                    batch: Union[List[List[str]], List[List[Chem.Mol]], List[List[Tuple[Chem.Mol, Chem.Mol]]], List[BatchMolGraph], np.ndarray],
                     features_batch: List[np.ndarray] = None,
                     atom_descriptors_batch: List[np.ndarray] = None,
                     atom_features_batch: List[np.ndarray] = None,
@@ -154,8 +177,9 @@ class MoleculeModel(nn.Module):
         """
         Encodes the latent representations of the input molecules from intermediate stages of the model.
 
-        :param batch: A list of list of SMILES, a list of list of RDKit molecules, or a
-                      list of :class:`~chemprop.features.featurization.BatchMolGraph`.
+        :param batch: A list of list of SMILES, a list of list of RDKit molecules, a
+                      list of :class:`~chemprop.features.featurization.BatchMolGraph`, or a 2D numpy array with
+                      the precomputed encodings of the molecules (see :meth:`encode`).
                       The outer list or BatchMolGraph is of length :code:`num_molecules` (number of datapoints in batch),
                       the inner list is of length :code:`number_of_molecules` (number of molecules per datapoint).
         :param features_batch: A list of numpy arrays containing additional features.
@@ -165,16 +189,16 @@ class MoleculeModel(nn.Module):
         :return: The latent fingerprint vectors.
         """
         if fingerprint_type == 'MPN':
-            return self.encoder(batch, features_batch, atom_descriptors_batch,
-                                atom_features_batch, bond_features_batch)
+            return self.encode(batch, features_batch, atom_descriptors_batch,
+                               atom_features_batch, bond_features_batch)
         elif fingerprint_type == 'last_FFN':
-            return self.ffn[:-1](self.encoder(batch, features_batch, atom_descriptors_batch,
-                                              atom_features_batch, bond_features_batch))
+            return self.ffn[:-1](self.encode(batch, features_batch, atom_descriptors_batch,
+                                             atom_features_batch, bond_features_batch))
         else:
             raise ValueError(f'Unsupported fingerprint type {fingerprint_type}.')
 
     def forward(self,
-                batch: Union[List[List[str]], List[List[Chem.Mol]], List[List[Tuple[Chem.Mol, Chem.Mol]]], List[BatchMolGraph]],
+                batch: Union[List[List[str]], List[List[Chem.Mol]], List[List[Tuple[Chem.Mol, Chem.Mol]]], List[BatchMolGraph], np.ndarray],
                 features_batch: List[np.ndarray] = None,
                 atom_descriptors_batch: List[np.ndarray] = None,
                 atom_features_batch: List[np.ndarray] = None,
@@ -182,8 +206,9 @@ class MoleculeModel(nn.Module):
         """
         Runs the :class:`MoleculeModel` on input.
 
-        :param batch: A list of list of SMILES, a list of list of RDKit molecules, or a
-                      list of :class:`~chemprop.features.featurization.BatchMolGraph`.
+        :param batch: A list of list of SMILES, a list of list of RDKit molecules, a
+                      list of :class:`~chemprop.features.featurization.BatchMolGraph`, or a 2D numpy array with
+                      the precomputed encodings of the molecules (see :meth:`encode`).
                       The outer list or BatchMolGraph is of length :code:`num_molecules` (number of datapoints in batch),
                       the inner list is of length :code:`number_of_molecules` (number of molecules per datapoint).
         :param features_batch: A list of numpy arrays containing additional features.
@@ -193,8 +218,8 @@ class MoleculeModel(nn.Module):
         :return: The output of the :class:`MoleculeModel`, containing a list of property predictions
         """
 
-        output = self.ffn(self.encoder(batch, features_batch, atom_descriptors_batch,
-                                       atom_features_batch, bond_features_batch))
+        output = self.ffn(self.encode(batch, features_batch, atom_descriptors_batch,
+                                      atom_features_batch, bond_features_batch))
 
         if self.classification and not (self.training and self.no_training_normalization) and self.loss_function != 'dirichlet':
             output = self.sigmoid(output)
@@ -5,6 +5,7 @@ import numpy as np
 from rdkit import Chem
 import torch
 import torch.nn as nn
+import torch.nn.functional as F
 
 from chemprop.args import TrainArgs
 from chemprop.features import BatchMolGraph, get_atom_fdim, get_bond_fdim, mol2graph
@@ -34,6 +35,8 @@ class MPNEncoder(nn.Module):
         self.dropout = args.dropout
         self.layers_per_message = 1
         self.undirected = args.undirected
+        self.scatter_messages = args.scatter_messages
+        self.factorized_bond_input = args.factorized_bond_input and not args.atom_messages
         self.device = args.device
         self.aggregation = args.aggregation
         self.aggregation_norm = args.aggregation_norm
@@ -44,7 +47,7 @@ class MPNEncoder(nn.Module):
         # Activation
         self.act_func = get_activation_function(args.activation)
 
-        # Cached zeros
+        # Cached zeros (no longer used in the readout, but kept so that saved checkpoints load)
         self.cached_zero_vector = nn.Parameter(torch.zeros(self.hidden_size), requires_grad=False)
 
         # Input
@@ -82,15 +85,25 @@ class MPNEncoder(nn.Module):
             atom_descriptors_batch = [np.zeros([1, atom_descriptors_batch[0].shape[1]])] + atom_descriptors_batch   # padding the first with 0 to match the atom_hiddens
             atom_descriptors_batch = torch.from_numpy(np.concatenate(atom_descriptors_batch, axis=0)).float().to(self.device)
 
-        f_atoms, f_bonds, a2b, b2a, b2revb, a_scope, b_scope = mol_graph.get_components(atom_messages=self.atom_messages)
+        # With factorized bond input, only the bond features are needed (as with atom messages)
+        f_atoms, f_bonds, a2b, b2a, b2revb, a_scope, b_scope = mol_graph.get_components(
+            atom_messages=self.atom_messages or self.factorized_bond_input
+        )
         f_atoms, f_bonds, a2b, b2a, b2revb = f_atoms.to(self.device), f_bonds.to(self.device), a2b.to(self.device), b2a.to(self.device), b2revb.to(self.device)
 
-        if self.atom_messages:
+        if self.scatter_messages:
+            # b2a of the reverse bond maps each bond to the atom it goes to
+            b2a_in = b2a[b2revb]
+        elif self.atom_messages:
             a2a = mol_graph.get_a2a().to(self.device)
 
         # Input
         if self.atom_messages:
             input = self.W_i(f_atoms)  # num_atoms x hidden_size
+        elif self.factorized_bond_input:
+            # W_i(concat(f_atoms[b2a], f_bonds)) without materializing the concatenation
+            input = F.linear(f_atoms, self.W_i.weight[:, :self.atom_fdim], self.W_i.bias)[b2a] \
+                + F.linear(f_bonds, self.W_i.weight[:, self.atom_fdim:])  # num_bonds x hidden_size
         else:
             input = self.W_i(f_bonds)  # num_bonds x hidden_size
         message = self.act_func(input)  # num_bonds x hidden_size
@@ -100,7 +113,10 @@ class MPNEncoder(nn.Module):
             if self.undirected:
                 message = (message + message[b2revb]) / 2
 
-            if self.atom_messages:
+            if self.atom_messages and self.scatter_messages:
+                nei_message = torch.cat((message[b2a], f_bonds), dim=1)  # num_bonds x hidden + bond_fdim
+                message = nei_message.new_zeros(len(message), nei_message.size(1)).index_add_(0, b2a_in, nei_message)  # num_atoms x hidden + bond_fdim
+            elif self.atom_messages:
                 nei_a_message = index_select_ND(message, a2a)  # num_atoms x max_num_bonds x hidden
                 nei_f_bonds = index_select_ND(f_bonds, a2b)  # num_atoms x max_num_bonds x bond_fdim
                 nei_message = torch.cat((nei_a_message, nei_f_bonds), dim=2)  # num_atoms x max_num_bonds x hidden + bond_fdim
@@ -108,8 +124,11 @@ class MPNEncoder(nn.Module):
             else:
                 # m(a1 -> a2) = [sum_{a0 \in nei(a1)} m(a0 -> a1)] - m(a2 -> a1)
                 # message      a_message = sum(nei_a_message)      rev_message
-                nei_a_message = index_select_ND(message, a2b)  # num_atoms x max_num_bonds x hidden
-                a_message = nei_a_message.sum(dim=1)  # num_atoms x hidden
+                if self.scatter_messages:
+                    a_message = message.new_zeros(len(f_atoms), message.size(1)).index_add_(0, b2a_in, message)  # num_atoms x hidden
+                else:
+                    nei_a_message = index_select_ND(message, a2b)  # num_atoms x max_num_bonds x hidden
+                    a_message = nei_a_message.sum(dim=1)  # num_atoms x hidden
                 rev_message = message[b2revb]  # num_bonds x hidden
                 message = a_message[b2a] - rev_message  # num_bonds x hidden
 
@@ -117,9 +136,13 @@ class MPNEncoder(nn.Module):
             message = self.act_func(input + message)  # num_bonds x hidden_size
             message = self.dropout_layer(message)  # num_bonds x hidden
 
-        a2x = a2a if self.atom_messages else a2b
-        nei_a_message = index_select_ND(message, a2x)  # num_atoms x max_num_bonds x hidden
-        a_message = nei_a_message.sum(dim=1)  # num_atoms x hidden
+        if self.scatter_messages:
+            nei_a_message = message[b2a] if self.atom_messages else message  # num_bonds x hidden
+            a_message = message.new_zeros(len(f_atoms), message.size(1)).index_add_(0, b2a_in, nei_a_message)  # num_atoms x hidden
+        else:
+            a2x = a2a if self.atom_messages else a2b
+            nei_a_message = index_select_ND(message, a2x)  # num_atoms x max_num_bonds x hidden
+            a_message = nei_a_message.sum(dim=1)  # num_atoms x hidden
         a_input = torch.cat([f_atoms, a_message], dim=1)  # num_atoms x (atom_fdim + hidden)
         atom_hiddens = self.act_func(self.W_o(a_input))  # num_atoms x hidden
         atom_hiddens = self.dropout_layer(atom_hiddens)  # num_atoms x hidden
@@ -134,22 +157,22 @@ class MPNEncoder(nn.Module):
             atom_hiddens = self.dropout_layer(atom_hiddens)                             # num_atoms x (hidden + descriptor size)
 
         # Readout
-        mol_vecs = []
-        for i, (a_start, a_size) in enumerate(a_scope):
-            if a_size == 0:
-                mol_vecs.append(self.cached_zero_vector)
-            else:
-                cur_hiddens = atom_hiddens.narrow(0, a_start, a_size)
-                mol_vec = cur_hiddens  # (num_atoms, hidden_size)
-                if self.aggregation == 'mean':
-                    mol_vec = mol_vec.sum(dim=0) / a_size
-                elif self.aggregation == 'sum':
-                    mol_vec = mol_vec.sum(dim=0)
-                elif self.aggregation == 'norm':
-                    mol_vec = mol_vec.sum(dim=0) / self.aggregation_norm
-                mol_vecs.append(mol_vec)
-
-        mol_vecs = torch.stack(mol_vecs, dim=0)  # (num_molecules, hidden_size)
+        # Sum the hidden states of the atoms of each molecule with a single index_add_. The padding atom (and any
+        # other atom outside of a_scope) is summed into an extra row which is dropped, and molecules without
+        # atoms are left as zero vectors.
+        a_start, a_size = torch.tensor(a_scope, dtype=torch.long).reshape(-1, 2).unbind(dim=1)
+        mol_index = torch.repeat_interleave(torch.arange(len(a_scope)), a_size)
+        atom_index = torch.arange(len(mol_index)) + \
+            torch.repeat_interleave(a_start - (a_size.cumsum(dim=0) - a_size), a_size)
+        a2mol = torch.full((atom_hiddens.size(0),), len(a_scope), dtype=torch.long)
+        a2mol[atom_index] = mol_index
+
+        mol_vecs = atom_hiddens.new_zeros(len(a_scope) + 1, atom_hiddens.size(1))
+        mol_vecs = mol_vecs.index_add_(0, a2mol.to(self.device), atom_hiddens)[:-1]  # (num_molecules, hidden_size)
+        if self.aggregation == 'mean':
+            mol_vecs = mol_vecs / a_size.clamp(min=1).unsqueeze(1).to(mol_vecs)
+        elif self.aggregation == 'norm':
+            mol_vecs = mol_vecs / self.aggregation_norm
 
         return mol_vecs  # num_molecules x hidden
 
@@ -282,6 +305,10 @@ class MPN(nn.Module):
                      else:
                          encodings.append(self.encoder_solvent(ba))
 
+        # Molecules repeated within the batch are encoded once and their encodings are gathered back to each row
+        encodings = [enc if ba.mol_index is None else enc[ba.mol_index.to(self.device)]
+                     for enc, ba in zip(encodings, batch)]
+
         output = reduce(lambda x, y: torch.cat((x, y), dim=1), encodings)
 
         if self.use_input_features:
@@ -3,6 +3,7 @@ from typing import List, Union
 
 import numpy as np
 import torch
+import torch.distributed as dist
 import torch.nn as nn
 from torch.optim import Optimizer
 from torch.optim.lr_scheduler import _LRScheduler
@@ -28,6 +29,31 @@ def compute_gnorm(model: nn.Module) -> float:
     return math.sqrt(sum([p.grad.norm().item() ** 2 for p in model.parameters() if p.grad is not None]))
 
 
+def all_reduce_gradients(model: nn.Module) -> None:
+    """
+    Averages the gradients of a model across the processes of distributed training.
+
+    The gradients of all trainable parameters are flattened into a single tensor so that they are
+    averaged with one all-reduce. Parameters without a gradient contribute zeros.
+
+    :param model: A PyTorch model whose gradients have been computed in each process.
+    """
+    params = [p for p in model.parameters() if p.requires_grad]
+    grads = torch.cat([p.grad.reshape(-1) if p.grad is not None else torch.zeros(p.numel(), device=p.device)
+                       for p in params])
+    dist.all_reduce(grads)
+    grads /= dist.get_world_size()
+
+    start = 0
+    for p in params:
+        grad = grads[start:start + p.numel()].view_as(p)
+        if p.grad is None:
+            p.grad = grad.clone()
+        else:
+            p.grad.copy_(grad)
+        start += p.numel()
+
+
 def param_count(model: nn.Module) -> int:
     """
     Determines number of trainable parameters.
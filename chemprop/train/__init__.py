@@ -2,15 +2,20 @@ from .metrics import get_metric_func, prc_auc, bce, rmse, bounded_mse, bounded_m
     bounded_rmse, accuracy, f1_metric, mcc_metric, sid_metric, wasserstein_metric
 from .loss_functions import get_loss_func, bounded_mse_loss, \
     mcc_class_loss, mcc_multiclass_loss, sid_loss, wasserstein_loss
+from .compile_data import chemprop_compile, compile_data
 from .cross_validate import chemprop_train, cross_validate, TRAIN_LOGGER_NAME
 from .evaluate import evaluate, evaluate_predictions
-from .make_predictions import chemprop_predict, make_predictions, load_model, set_features, load_data, predict_and_save
+from .make_predictions import chemprop_predict, make_predictions, load_model, set_features, load_data, predict_and_save, \
+    stream_predictions, set_uncertainty_method, load_calibrator
 from .molecule_fingerprint import chemprop_fingerprint, model_fingerprint
-from .predict import predict
+from .predict import predict, predict_ensemble
+from .predictor import Predictor
 from .run_training import run_training
 from .train import train
 
 __all__ = [
+    'chemprop_compile',
+    'compile_data',
     'chemprop_train',
     'cross_validate',
     'TRAIN_LOGGER_NAME',
@@ -23,7 +28,12 @@ __all__ = [
     'set_features',
     'load_data',
     'predict_and_save',
+    'stream_predictions',
+    'set_uncertainty_method',
+    'load_calibrator',
     'predict',
+    'predict_ensemble',
+    'Predictor',
     'run_training',
     'train',
     'get_metric_func',
@@ -0,0 +1,58 @@
+from chemprop.args import CompileArgs
+from chemprop.data import compile_dataset, get_data, get_task_names
+from chemprop.features import reset_featurization_parameters, set_adding_hs, set_explicit_h, set_reaction
+from chemprop.utils import timeit
+
+
+@timeit()
+def compile_data(args: CompileArgs) -> None:
+    """
+    Loads a data CSV file along with its features and compiles it into a memory-mappable binary dataset.
+
+    The compiled dataset can be passed as :code:`--data_path` (or :code:`--test_path`) instead of the CSV file,
+    which skips parsing the CSV file, loading and computing features, and featurizing the molecules.
+
+    :param args: A :class:`~chemprop.args.CompileArgs` object containing arguments for loading and compiling the data.
+    """
+    # Set explicit H option and reaction option so that graphs match those used in training
+    reset_featurization_parameters()
+    set_explicit_h(args.explicit_h)
+    set_adding_hs(args.adding_h)
+    if args.reaction:
+        set_reaction(args.reaction, args.reaction_mode)
+    elif args.reaction_solvent:
+        set_reaction(True, args.reaction_mode)
+
+    print('Loading data')
+    task_names = get_task_names(
+        path=args.data_path,
+        smiles_columns=args.smiles_columns,
+        target_columns=args.target_columns,
+        ignore_columns=args.ignore_columns,
+    )
+    data = get_data(
+        path=args.data_path,
+        args=args,
+        target_columns=task_names,
+        data_weights_path=args.data_weights_path,
+        loss_function='bounded_mse'  # keep inequality targets, which are checked when the data is loaded
+    )
+
+    print('Compiling data')
+    compile_dataset(
+        data=data,
+        path=args.compiled_path,
+        smiles_columns=args.smiles_columns,
+        task_names=task_names,
+        features_generator=args.features_generator,
+        atom_descriptors=args.atom_descriptors
+    )
+    print(f'Compiled {len(data):,} datapoints to "{args.compiled_path}"')
+
+
+def chemprop_compile() -> None:
+    """Compiles a dataset into a memory-mappable binary format.
+
+    This is the entry point for the command line command :code:`chemprop_compile`.
+    """
+    compile_data(args=CompileArgs().parse_args())
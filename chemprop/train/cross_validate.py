@@ -1,4 +1,5 @@
 from collections import defaultdict
+from copy import deepcopy
 import csv
 import json
 from logging import Logger
@@ -10,6 +11,7 @@ import subprocess
 import numpy as np
 import pandas as pd
 
+from .parallel import run_jobs, share_graphs
 from .run_training import run_training
 from chemprop.args import TrainArgs
 from chemprop.constants import TEST_SCORES_FILE_NAME, TRAIN_LOGGER_NAME
@@ -106,25 +108,41 @@ def cross_validate(args: TrainArgs,
     if args.target_weights is not None and len(args.target_weights) != args.num_tasks:
         raise ValueError('The number of provided target weights must match the number and order of the prediction tasks')
 
-    # Run training on different random seeds for each fold
-    all_scores = defaultdict(list)
-    for fold_num in range(args.num_folds):
+    # Run training on different random seeds for each fold. With several training jobs, the folds train
+    # concurrently in forked processes and the jobs of each fold are left for the models of its ensemble.
+    num_fold_jobs = min(args.num_train_jobs, args.num_folds)
+    num_model_jobs = max(1, args.num_train_jobs // num_fold_jobs)
+    if num_fold_jobs > 1:
+        share_graphs(data, args)
+
+    def train_fold(fold_num: int) -> Dict[str, List[float]]:
+        """
+        Trains and tests the models of a fold.
+
+        :param fold_num: The index of the fold.
+        :return: A dictionary mapping each metric to a list of test scores for each task.
+        """
         info(f'Fold {fold_num}')
-        args.seed = init_seed + fold_num
-        args.save_dir = os.path.join(save_dir, f'fold_{fold_num}')
-        makedirs(args.save_dir)
+        # Each fold trains with its own copy of the arguments so that the folds do not change those of the others
+        fold_args = deepcopy(args)
+        fold_args.seed = init_seed + fold_num
+        fold_args.save_dir = os.path.join(save_dir, f'fold_{fold_num}')
+        makedirs(fold_args.save_dir)
         data.reset_features_and_targets()
+        fold_args.num_train_jobs = num_model_jobs
 
         # If resuming experiment, load results from trained models
-        test_scores_path = os.path.join(args.save_dir, 'test_scores.json')
+        test_scores_path = os.path.join(fold_args.save_dir, 'test_scores.json')
         if args.resume_experiment and os.path.exists(test_scores_path):
             print('Loading scores')
             with open(test_scores_path) as f:
-                model_scores = json.load(f)
+                return json.load(f)
         # Otherwise, train the models
         else:
-            model_scores = train_func(args, data, logger)
+            return train_func(fold_args, data, logger)
 
+    all_scores = defaultdict(list)
+    for model_scores in run_jobs(train_fold, args.num_folds, num_processes=num_fold_jobs):
         for metric, scores in model_scores.items():
             all_scores[metric].append(scores)
     all_scores = dict(all_scores)
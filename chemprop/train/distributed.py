@@ -0,0 +1,178 @@
+"""Trains a model with data parallelism across local CPU processes using :mod:`torch.distributed`."""
+
+from contextlib import contextmanager
+import logging
+import multiprocessing as mp
+import os
+import socket
+from typing import Any, Dict, Iterator, List
+
+import torch
+import torch.distributed as dist
+from torch.optim.lr_scheduler import ExponentialLR
+
+from .loss_functions import get_loss_func
+from .train import train
+from chemprop.args import TrainArgs
+from chemprop.data import AtomBondScaler, cache_graph, cache_mol, MoleculeDataLoader, MoleculeDataset, \
+    set_cache_graph, set_cache_max_bytes, set_cache_mol
+from chemprop.features import featurization
+from chemprop.models import MoleculeModel
+from chemprop.utils import build_lr_scheduler, build_optimizer
+
+
+def get_num_threads(num_processes: int) -> int:
+    """
+    Splits the CPU cores among the processes of distributed training.
+
+    :param num_processes: The number of processes training together.
+    :return: The number of PyTorch threads of each process.
+    """
+    return max(1, (os.cpu_count() or 1) // num_processes)
+
+
+def build_train_data_loader(train_data: MoleculeDataset,
+                            args: TrainArgs,
+                            num_workers: int,
+                            seed: int,
+                            rank: int = 0) -> MoleculeDataLoader:
+    """
+    Builds the :class:`~chemprop.data.MoleculeDataLoader` of the shard of the training data of a process.
+
+    :param train_data: The training data.
+    :param args: A :class:`~chemprop.args.TrainArgs` object containing arguments for training the model.
+    :param num_workers: Number of workers used to build batches.
+    :param seed: Random seed used to shuffle the data, which must be the same in all processes.
+    :param rank: The rank of the process.
+    :return: A :class:`~chemprop.data.MoleculeDataLoader` over the shard of the training data of the process.
+    """
+    return MoleculeDataLoader(
+        dataset=train_data,
+        batch_size=args.batch_size,
+        num_workers=num_workers,
+        class_balance=args.class_balance,
+        shuffle=True,
+        seed=seed,
+        max_batch_atoms=args.batch_max_atoms,
+        max_batch_bonds=args.batch_max_bonds,
+        num_replicas=args.num_train_processes,
+        rank=rank
+    )
+
+
+def _train_worker(rank: int,
+                  init_method: str,
+                  model: MoleculeModel,
+                  train_data: MoleculeDataset,
+                  args_dict: Dict[str, Any],
+                  atom_bond_scaler: AtomBondScaler,
+                  num_workers: int,
+                  seed: int,
+                  params: featurization.Featurization_parameters,
+                  cache_settings: List[bool]) -> None:
+    """
+    Trains a copy of the model on a shard of the training data in a worker process for all epochs.
+
+    The worker builds the same optimizer and learning rate scheduler as the main process and takes the same
+    number of steps in each epoch, so that the models and learning rates of all processes stay identical.
+
+    :param rank: The rank of the worker.
+    :param init_method: The URL used to initialize the process group.
+    :param model: The model of the main process before training.
+    :param train_data: The training data.
+    :param args_dict: The arguments for training the model, as returned by :meth:`~chemprop.args.TrainArgs.as_dict`.
+    :param atom_bond_scaler: A :class:`~chemprop.data.scaler.AtomBondScaler` fitted on the atomic/bond targets.
+    :param num_workers: Number of workers used to build batches.
+    :param seed: Random seed used to shuffle the data.
+    :param params: The featurization parameters of the main process.
+    :param cache_settings: Whether the main process caches graphs and RDKit molecules.
+    """
+    args = TrainArgs().from_dict(args_dict, skip_unsettable=True)
+    featurization.PARAMS = params
+    set_cache_graph(cache_settings[0])
+    set_cache_mol(cache_settings[1])
+    set_cache_max_bytes(args.cache_graph_max_bytes, args.cache_mol_max_bytes)
+    torch.set_num_threads(get_num_threads(args.num_train_processes))
+
+    dist.init_process_group('gloo', init_method=init_method, rank=rank, world_size=args.num_train_processes)
+    try:
+        data_loader = build_train_data_loader(train_data, args, num_workers=num_workers, seed=seed, rank=rank)
+        optimizer = build_optimizer(model, args)
+        scheduler = build_lr_scheduler(optimizer, args, steps_per_epoch=len(data_loader))
+        loss_func = get_loss_func(args)
+
+        n_iter = 0
+        for _ in range(args.epochs):
+            n_iter = train(
+                model=model,
+                data_loader=data_loader,
+                loss_func=loss_func,
+                optimizer=optimizer,
+                scheduler=scheduler,
+                args=args,
+                n_iter=n_iter,
+                atom_bond_scaler=atom_bond_scaler,
+                logger=logging.getLogger(__name__),
+                disable_progress_bar=True
+            )
+            if isinstance(scheduler, ExponentialLR):
+                scheduler.step()
+    finally:
+        dist.destroy_process_group()
+
+
+@contextmanager
+def distributed_training(model: MoleculeModel,
+                         train_data: MoleculeDataset,
+                         args: TrainArgs,
+                         atom_bond_scaler: AtomBondScaler,
+                         num_workers: int,
+                         seed: int) -> Iterator[None]:
+    """
+    Starts the worker processes of distributed training and joins their process group as rank 0 within the context.
+
+    The workers train copies of :code:`model` on their shards of the training data for :code:`args.epochs` epochs,
+    while the main process trains on the shard of rank 0 (see :func:`build_train_data_loader`) and evaluates and
+    saves the model between epochs. The gradients are averaged across processes at each step by :func:`train`.
+    The CPU cores are split among the processes until the context exits, which waits for the workers to finish.
+
+    :param model: The model to train, which must not have been trained by the main process yet.
+    :param train_data: The training data.
+    :param args: A :class:`~chemprop.args.TrainArgs` object containing arguments for training the model.
+    :param atom_bond_scaler: A :class:`~chemprop.data.scaler.AtomBondScaler` fitted on the atomic/bond targets.
+    :param num_workers: Number of workers used to build batches in each process.
+    :param seed: Random seed used to shuffle the data.
+    """
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        init_method = f'tcp://127.0.0.1:{s.getsockname()[1]}'
+
+    context = mp.get_context('spawn')
+    processes = [
+        context.Process(target=_train_worker,
+                        args=(rank, init_method, model, train_data, args.as_dict(), atom_bond_scaler, num_workers, seed,
+                              featurization.PARAMS, [cache_graph(), cache_mol()]))
+        for rank in range(1, args.num_train_processes)
+    ]
+    for process in processes:
+        process.start()
+
+    num_threads = torch.get_num_threads()
+    torch.set_num_threads(get_num_threads(args.num_train_processes))
+    dist.init_process_group('gloo', init_method=init_method, rank=0, world_size=args.num_train_processes)
+    try:
+        yield
+    except BaseException:
+        # The workers would otherwise wait for the main process at their next step
+        for process in processes:
+            process.terminate()
+        raise
+    finally:
+        for process in processes:
+            process.join()
+        dist.destroy_process_group()
+        torch.set_num_threads(num_threads)
+
+    exit_codes = [process.exitcode for process in processes]
+    if any(exit_code != 0 for exit_code in exit_codes):
+        raise RuntimeError(f'A distributed training process failed with exit codes {exit_codes}.')
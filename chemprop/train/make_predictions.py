@@ -1,11 +1,14 @@
 from collections import OrderedDict
 import csv
-from typing import List, Optional, Union, Tuple
+import json
+import os
+from typing import Dict, List, Optional, Union, Tuple
 
 import numpy as np
 
 from chemprop.args import PredictArgs, TrainArgs
-from chemprop.data import get_data, get_data_from_smiles, MoleculeDataLoader, MoleculeDataset, StandardScaler
+from chemprop.data import deduplicate_data, features_cache, get_data, get_data_chunks, get_data_from_smiles, graph_cache, \
+    MoleculeDataLoader, MoleculeDataset, set_cache_graph, set_cache_mol, StandardScaler
 from chemprop.utils import load_args, load_checkpoint, load_scalers, makedirs, timeit, update_prediction_args
 from chemprop.features import set_extra_atom_fdim, set_extra_bond_fdim, set_reaction, set_explicit_h, set_adding_hs, reset_featurization_parameters
 from chemprop.models import MoleculeModel
@@ -32,7 +35,8 @@ def load_model(args: PredictArgs, generator: bool = False):
 
     # Load model and scalers
     models = (
-        load_checkpoint(checkpoint_path, device=args.device) for checkpoint_path in args.checkpoint_paths
+        load_checkpoint(checkpoint_path, device=args.device, factorized_bond_input=args.factorized_bond_input)
+        for checkpoint_path in args.checkpoint_paths
     )
     scalers = (
         load_scalers(checkpoint_path) for checkpoint_path in args.checkpoint_paths
@@ -44,6 +48,38 @@ def load_model(args: PredictArgs, generator: bool = False):
     return args, train_args, models, scalers, num_tasks, task_names
 
 
+def get_valid_indices(full_data: MoleculeDataset) -> Dict[int, int]:
+    """
+    Function to find the datapoints whose molecules are all valid.
+
+    :param full_data: A :class:`~chemprop.data.MoleculeDataset` containing all (valid and invalid) datapoints.
+    :return: A dictionary mapping the indices of valid datapoints in the full data to their indices among valid datapoints.
+    """
+    full_to_valid_indices = {}
+    valid_index = 0
+    for full_index in range(len(full_data)):
+        if all(mol is not None for mol in full_data[full_index].mol):
+            full_to_valid_indices[full_index] = valid_index
+            valid_index += 1
+
+    return full_to_valid_indices
+
+
+def expand_unique(values: Union[List, np.ndarray], unique_indices: List[int]) -> Union[List, np.ndarray]:
+    """
+    Function to copy the values of distinct inputs to every datapoint with that input.
+
+    :param values: A list or numpy array with the values of each distinct input.
+    :param unique_indices: A list with the index of the input of each datapoint, as returned by
+                           :func:`~chemprop.data.deduplicate_data`.
+    :return: A list or numpy array with the values of each datapoint.
+    """
+    if isinstance(values, np.ndarray):
+        return values[unique_indices]
+
+    return [values[i] for i in unique_indices]
+
+
 def load_data(args: PredictArgs, smiles: List[List[str]]):
     """
     Function to load data from a list of smiles or a file.
@@ -60,6 +96,7 @@ def load_data(args: PredictArgs, smiles: List[List[str]]):
             smiles=smiles,
             skip_invalid_smiles=False,
             features_generator=args.features_generator,
+            featurization_workers=args.featurization_workers,
         )
     else:
         full_data = get_data(
@@ -73,12 +110,7 @@ def load_data(args: PredictArgs, smiles: List[List[str]]):
         )
 
     print("Validating SMILES")
-    full_to_valid_indices = {}
-    valid_index = 0
-    for full_index in range(len(full_data)):
-        if all(mol is not None for mol in full_data[full_index].mol):
-            full_to_valid_indices[full_index] = valid_index
-            valid_index += 1
+    full_to_valid_indices = get_valid_indices(full_data)
 
     test_data = MoleculeDataset(
         [full_data[i] for i in sorted(full_to_valid_indices.keys())]
@@ -119,6 +151,104 @@ def set_features(args: PredictArgs, train_args: TrainArgs):
         set_reaction(True, train_args.reaction_mode)
 
 
+def set_uncertainty_method(args: PredictArgs) -> None:
+    """
+    Function to check the uncertainty options and to set the uncertainty method implied by the calibration options.
+
+    :param args: A :class:`~chemprop.args.PredictArgs` object containing arguments for
+                 loading data and a model and making predictions.
+    """
+    if args.uncertainty_method is not None and args.calibration_method in [
+        "conformal_regression",
+        "conformal_quantile_regression",
+    ]:
+        raise ValueError("Conformal regression is not compatible with an uncertainty method")
+
+    if args.uncertainty_method is None and (
+        args.calibration_method is not None or args.evaluation_methods is not None
+    ):
+        if args.dataset_type in ["classification", "multiclass"]:
+            args.uncertainty_method = "classification"
+        elif args.calibration_method == "conformal_regression":
+            args.uncertainty_method = "conformal_regression"
+        elif args.calibration_method == "conformal_quantile_regression":
+            args.uncertainty_method = "conformal_quantile_regression"
+        else:
+            raise ValueError(
+                "Cannot calibrate or evaluate uncertainty without selection of an uncertainty method."
+            )
+
+    if args.calibration_method is None and args.loss_function == "quantile_interval":
+        args.uncertainty_method = "conformal_quantile_regression"
+
+
+def load_calibrator(
+    args: PredictArgs,
+    train_args: TrainArgs,
+    models: List[MoleculeModel],
+    scalers: List[List[StandardScaler]],
+    num_models: int,
+    task_names: List[str],
+) -> UncertaintyCalibrator:
+    """
+    Function to fit an uncertainty calibrator on the calibration data.
+
+    :param args: A :class:`~chemprop.args.PredictArgs` object containing arguments for
+                 loading data and a model and making predictions.
+    :param train_args: A :class:`~chemprop.args.TrainArgs` object containing arguments for training the model.
+    :param models: A list or generator object of :class:`~chemprop.models.MoleculeModel`\ s. Generators are not
+                   consumed, the models are loaded again instead.
+    :param scalers: A list or generator object of :class:`~chemprop.features.scaler.StandardScaler` objects.
+    :param num_models: The number of models included in the models and scalers input.
+    :param task_names: A list of task names.
+    :return: A fitted :class:`~chemprop.uncertainty.UncertaintyCalibrator`.
+    """
+    calibration_data = get_data(
+        path=args.calibration_path,
+        smiles_columns=args.smiles_columns,
+        target_columns=task_names,
+        features_path=args.calibration_features_path,
+        features_generator=args.features_generator,
+        phase_features_path=args.calibration_phase_features_path,
+        atom_descriptors_path=args.calibration_atom_descriptors_path,
+        bond_features_path=args.calibration_bond_features_path,
+        max_data_size=args.max_data_size,
+        loss_function=args.loss_function,
+    )
+
+    calibration_data_loader = MoleculeDataLoader(
+        dataset=calibration_data,
+        batch_size=args.batch_size,
+        num_workers=args.num_workers,
+    )
+
+    if isinstance(models, List) and isinstance(scalers, List):
+        calibration_models = models
+        calibration_scalers = scalers
+    else:
+        calibration_model_objects = load_model(args, generator=True)
+        calibration_models = calibration_model_objects[2]
+        calibration_scalers = calibration_model_objects[3]
+
+    return build_uncertainty_calibrator(
+        calibration_method=args.calibration_method,
+        uncertainty_method=args.uncertainty_method,
+        interval_percentile=args.calibration_interval_percentile,
+        regression_calibrator_metric=args.regression_calibrator_metric,
+        calibration_data=calibration_data,
+        calibration_data_loader=calibration_data_loader,
+        models=calibration_models,
+        scalers=calibration_scalers,
+        num_models=num_models,
+        dataset_type=args.dataset_type,
+        loss_function=args.loss_function,
+        uncertainty_dropout_p=args.uncertainty_dropout_p,
+        conformal_alpha=args.conformal_alpha,
+        dropout_sampling_size=args.dropout_sampling_size,
+        spectra_phase_mask=getattr(train_args, "spectra_phase_mask", None),
+    )
+
+
 def predict_and_save(
     args: PredictArgs,
     train_args: TrainArgs,
@@ -134,6 +264,7 @@ def predict_and_save(
     calibrator: UncertaintyCalibrator = None,
     return_invalid_smiles: bool = False,
     save_results: bool = True,
+    append: bool = False,
 ):
     """
     Function to predict with a model and save the predictions to file.
@@ -153,10 +284,23 @@ def predict_and_save(
     :param calibrator: A :class: `~chemprop.uncertainty.UncertaintyCalibrator` object, for use in calibrating uncertainty predictions.
     :param return_invalid_smiles: Whether to return predictions of "Invalid SMILES" for invalid SMILES, otherwise will skip them in returned predictions.
     :param save_results: Whether to save the predictions in a csv. Function returns the predictions regardless.
+    :param append: Whether to append the predictions to the csv, writing the header only if the file is empty.
     :return:  A list of lists of target predictions.
     """
+    # Predict each distinct input once and copy its predictions to the rows with the same input
+    unique_data, unique_indices = test_data, None
+    if not args.no_deduplicate_smiles:
+        deduplicated_data, indices = deduplicate_data(test_data)
+        if len(deduplicated_data) < len(test_data):
+            print(f"Skipping {len(test_data) - len(deduplicated_data):,} redundant predictions of duplicate "
+                  f"molecules ({len(deduplicated_data):,} unique out of {len(test_data):,})")
+            unique_data, unique_indices = deduplicated_data, indices
+            test_data_loader = MoleculeDataLoader(
+                dataset=unique_data, batch_size=args.batch_size, num_workers=args.num_workers
+            )
+
     estimator = UncertaintyEstimator(
-        test_data=test_data,
+        test_data=unique_data,
         test_data_loader=test_data_loader,
         uncertainty_method=args.uncertainty_method,
         models=models,
@@ -180,6 +324,11 @@ def predict_and_save(
             estimator.individual_predictions()
         )  # shape(data, tasks, ensemble) or (data, tasks, classes, ensemble)
 
+    if unique_indices is not None:
+        preds, unc = expand_unique(preds, unique_indices), expand_unique(unc, unique_indices)
+        if args.individual_ensemble_predictions:
+            individual_preds = expand_unique(individual_preds, unique_indices)
+
     if args.evaluation_methods is not None:
 
         evaluation_data = get_data(
@@ -319,9 +468,10 @@ def predict_and_save(
                         datapoint.row[pred_name + f"_model_{idx}"] = pred
 
         # Save
-        with open(args.preds_path, "w") as f:
+        with open(args.preds_path, "a" if append else "w") as f:
             writer = csv.DictWriter(f, fieldnames=full_data[0].row.keys())
-            writer.writeheader()
+            if f.tell() == 0:
+                writer.writeheader()
             for datapoint in full_data:
                 writer.writerow(datapoint.row)
 
@@ -353,6 +503,138 @@ def predict_and_save(
         return preds, unc
 
 
+def stream_predictions(
+    args: PredictArgs,
+    train_args: TrainArgs,
+    task_names: List[str],
+    num_tasks: int,
+    models: List[MoleculeModel],
+    scalers: List[List[StandardScaler]],
+    num_models: int,
+    calibrator: UncertaintyCalibrator = None,
+) -> None:
+    """
+    Function to predict on the test CSV file chunk by chunk, appending the predictions of each chunk to file.
+
+    After each chunk is written, the number of rows read and the size of the predictions file are recorded in
+    :code:`<preds_path>.progress`. If that file exists when starting, the predictions file is truncated to the
+    last completed chunk and predicting resumes from the next row. The progress file is removed when done.
+
+    :param args: A :class:`~chemprop.args.PredictArgs` object containing arguments for
+                 loading data and a model and making predictions.
+    :param train_args: A :class:`~chemprop.args.TrainArgs` object containing arguments for training the model.
+    :param task_names: A list of task names.
+    :param num_tasks: Number of tasks.
+    :param models: A list of :class:`~chemprop.models.MoleculeModel`\ s, which is reused for every chunk.
+    :param scalers: A list of :class:`~chemprop.features.scaler.StandardScaler` objects, which is reused for every chunk.
+    :param num_models: The number of models included in the models and scalers input.
+    :param calibrator: A :class: `~chemprop.uncertainty.UncertaintyCalibrator` object, for use in calibrating uncertainty predictions.
+    """
+    progress_path = f"{args.preds_path}.progress"
+    progress = {
+        "test_path": os.path.abspath(args.test_path),
+        "checkpoint_paths": [os.path.abspath(path) for path in args.checkpoint_paths],
+        "num_rows": 0,
+        "num_bytes": 0,
+    }
+
+    if os.path.exists(progress_path):
+        with open(progress_path) as f:
+            saved_progress = json.load(f)
+        if any(saved_progress[key] != progress[key] for key in ["test_path", "checkpoint_paths"]):
+            raise ValueError(f'Found "{progress_path}" from predicting with different data or models. '
+                             f'Delete it to start predicting from the beginning.')
+        if not os.path.exists(args.preds_path) or os.path.getsize(args.preds_path) < saved_progress["num_bytes"]:
+            raise ValueError(f'Predictions file "{args.preds_path}" is missing rows recorded in "{progress_path}". '
+                             f'Delete it to start predicting from the beginning.')
+        progress = saved_progress
+
+        # Drop the rows of a chunk that was being written when the previous run stopped
+        os.truncate(args.preds_path, progress["num_bytes"])
+        print(f"Resuming predictions after {progress['num_rows']:,} rows")
+    else:
+        makedirs(args.preds_path, isfile=True)
+        open(args.preds_path, "w").close()
+
+    # Only keep graphs and molecules in memory when the caches are bounded
+    set_cache_graph(args.cache_graph_max_bytes is not None)
+    set_cache_mol(not args.no_cache_mol and args.cache_mol_max_bytes is not None)
+
+    chunks = get_data_chunks(
+        path=args.test_path,
+        chunk_size=args.predict_chunk_size,
+        smiles_columns=args.smiles_columns,
+        skip_rows=progress["num_rows"],
+        max_data_size=args.max_data_size,
+        features_generator=args.features_generator,
+        store_row=not args.drop_extra_columns,
+        args=args,
+    )
+
+    # Prediction columns, which replace input columns of the same name
+    if args.dataset_type == "multiclass":
+        pred_names = [f"{name}_class_{i}" for name in task_names for i in range(args.multiclass_num_classes)]
+    else:
+        pred_names = task_names
+
+    # Datapoints of leading chunks without valid SMILES, which are written once the prediction columns are known
+    pending = []
+    for chunk in chunks:
+        full_data = MoleculeDataset(pending + list(chunk))
+        full_to_valid_indices = get_valid_indices(full_data)
+
+        if len(full_to_valid_indices) > 0:
+            test_data = MoleculeDataset([full_data[i] for i in sorted(full_to_valid_indices.keys())])
+            test_data_loader = MoleculeDataLoader(
+                dataset=test_data, batch_size=args.batch_size, num_workers=args.num_workers
+            )
+            predict_and_save(
+                args=args,
+                train_args=train_args,
+                test_data=test_data,
+                task_names=task_names,
+                num_tasks=num_tasks,
+                test_data_loader=test_data_loader,
+                full_data=full_data,
+                full_to_valid_indices=full_to_valid_indices,
+                models=models,
+                scalers=scalers,
+                num_models=num_models,
+                calibrator=calibrator,
+                append=True,
+            )
+        elif os.path.getsize(args.preds_path) > 0:
+            # Fill the prediction columns of the existing header for invalid SMILES
+            with open(args.preds_path) as f:
+                fieldnames = next(csv.reader(f))
+            with open(args.preds_path, "a") as f:
+                writer = csv.DictWriter(f, fieldnames=fieldnames)
+                for datapoint in full_data:
+                    if args.drop_extra_columns:
+                        datapoint.row = OrderedDict(zip(args.smiles_columns, datapoint.smiles))
+                    for name in fieldnames:
+                        if name not in datapoint.row or name in pred_names:
+                            datapoint.row[name] = "Invalid SMILES"
+                    writer.writerow(datapoint.row)
+        else:
+            pending = list(full_data)
+            continue
+
+        pending = []
+        progress["num_rows"] += len(full_data)
+        progress["num_bytes"] = os.path.getsize(args.preds_path)
+        with open(f"{progress_path}.tmp", "w") as f:
+            json.dump(progress, f)
+        os.replace(f"{progress_path}.tmp", progress_path)
+        print(f"Saved predictions for {progress['num_rows']:,} rows")
+
+    if len(pending) > 0:
+        print(f"Warning: found no valid SMILES in {len(pending):,} rows, no predictions were saved")
+
+    if os.path.exists(progress_path):
+        os.remove(progress_path)
+
+
 @timeit()
 def make_predictions(
     args: PredictArgs,
@@ -374,7 +656,8 @@ def make_predictions(
     Loads data and a trained model and uses the model to make predictions on the data.
 
     If SMILES are provided, then makes predictions on smiles.
-    Otherwise makes predictions on :code:`args.test_data`.
+    Otherwise makes predictions on :code:`args.test_data`. If :code:`args.predict_chunk_size` is set, the predictions
+    on :code:`args.test_data` are streamed to file with :func:`stream_predictions` and None is returned.
 
     :param args: A :class:`~chemprop.args.PredictArgs` object containing arguments for
                 loading data and a model and making predictions.
@@ -390,11 +673,14 @@ def make_predictions(
     :param return_uncertainty: Whether to return uncertainty predictions alongside the model value predictions.
     :return: A list of lists of target predictions. If returning uncertainty, a tuple containing first prediction values then uncertainty estimates.
     """
+    # Streaming reuses the models for every chunk, so they are held in memory
+    streaming = smiles is None and args.predict_chunk_size is not None
+
     if model_objects:
         (args, train_args, models, scalers, num_tasks, task_names) = model_objects
     else:
         (args, train_args, models, scalers, num_tasks, task_names) = load_model(
-            args, generator=True
+            args, generator=not streaming
         )
 
     num_models = len(args.checkpoint_paths)
@@ -402,77 +688,33 @@ def make_predictions(
     set_features(args, train_args)
 
     # Note: to get the invalid SMILES for your data, use the get_invalid_smiles_from_file or get_invalid_smiles_from_list functions from data/utils.py
-    full_data, test_data, test_data_loader, full_to_valid_indices = load_data(args, smiles)
-
-    if args.uncertainty_method is not None and args.calibration_method in [
-        "conformal_regression",
-        "conformal_quantile_regression",
-    ]:
-        raise ValueError("Conformal regression is not compatible with an uncertainty method")
+    if not streaming:
+        full_data, test_data, test_data_loader, full_to_valid_indices = load_data(args, smiles)
 
-    if args.uncertainty_method is None and (
-        args.calibration_method is not None or args.evaluation_methods is not None
-    ):
-        if args.dataset_type in ["classification", "multiclass"]:
-            args.uncertainty_method = "classification"
-        elif args.calibration_method == "conformal_regression":
-            args.uncertainty_method = "conformal_regression"
-        elif args.calibration_method == "conformal_quantile_regression":
-            args.uncertainty_method = "conformal_quantile_regression"
-        else:
-            raise ValueError(
-                "Cannot calibrate or evaluate uncertainty without selection of an uncertainty method."
-            )
-
-    if args.calibration_method is None and args.loss_function == "quantile_interval":
-        args.uncertainty_method = "conformal_quantile_regression"
+    set_uncertainty_method(args)
 
     if calibrator is None and args.calibration_path is not None:
-
-        calibration_data = get_data(
-            path=args.calibration_path,
-            smiles_columns=args.smiles_columns,
-            target_columns=task_names,
-            features_path=args.calibration_features_path,
-            features_generator=args.features_generator,
-            phase_features_path=args.calibration_phase_features_path,
-            atom_descriptors_path=args.calibration_atom_descriptors_path,
-            bond_features_path=args.calibration_bond_features_path,
-            max_data_size=args.max_data_size,
-            loss_function=args.loss_function,
-        )
-
-        calibration_data_loader = MoleculeDataLoader(
-            dataset=calibration_data,
-            batch_size=args.batch_size,
-            num_workers=args.num_workers,
+        calibrator = load_calibrator(
+            args=args,
+            train_args=train_args,
+            models=models,
+            scalers=scalers,
+            num_models=num_models,
+            task_names=task_names,
         )
 
-        if isinstance(models, List) and isinstance(scalers, List):
-            calibration_models = models
-            calibration_scalers = scalers
-        else:
-            calibration_model_objects = load_model(args, generator=True)
-            calibration_models = calibration_model_objects[2]
-            calibration_scalers = calibration_model_objects[3]
-
-        calibrator = build_uncertainty_calibrator(
-            calibration_method=args.calibration_method,
-            uncertainty_method=args.uncertainty_method,
-            interval_percentile=args.calibration_interval_percentile,
-            regression_calibrator_metric=args.regression_calibrator_metric,
-            calibration_data=calibration_data,
-            calibration_data_loader=calibration_data_loader,
-            models=calibration_models,
-            scalers=calibration_scalers,
+    if streaming:
+        stream_predictions(
+            args=args,
+            train_args=train_args,
+            task_names=task_names,
+            num_tasks=num_tasks,
+            models=models,
+            scalers=scalers,
             num_models=num_models,
-            dataset_type=args.dataset_type,
-            loss_function=args.loss_function,
-            uncertainty_dropout_p=args.uncertainty_dropout_p,
-            conformal_alpha=args.conformal_alpha,
-            dropout_sampling_size=args.dropout_sampling_size,
-            spectra_phase_mask=getattr(train_args, "spectra_phase_mask", None),
+            calibrator=calibrator,
         )
+        return None
 
     # Edge case if empty list of smiles is provided
     if len(test_data) == 0:
@@ -495,6 +737,11 @@ def make_predictions(
             return_invalid_smiles=return_invalid_smiles,
         )
 
+    if graph_cache() is not None:
+        print(graph_cache().stats())
+    if features_cache() is not None:
+        print(features_cache().stats())
+
     if return_index_dict:
         preds_dict = {}
         unc_dict = {}
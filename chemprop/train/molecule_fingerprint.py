@@ -54,7 +54,8 @@ def molecule_fingerprint(args: FingerprintArgs, smiles: List[List[str]] = None)
         full_data = get_data_from_smiles(
             smiles=smiles,
             skip_invalid_smiles=False,
-            features_generator=args.features_generator
+            features_generator=args.features_generator,
+            featurization_workers=args.featurization_workers
         )
     else:
         full_data = get_data(path=args.test_path, smiles_columns=args.smiles_columns, target_columns=[], ignore_columns=[], skip_invalid_smiles=False,
@@ -107,7 +108,7 @@ def molecule_fingerprint(args: FingerprintArgs, smiles: List[List[str]] = None)
     print(f'Encoding smiles into a fingerprint vector from {len(args.checkpoint_paths)} models.')
 
     for index, checkpoint_path in enumerate(tqdm(args.checkpoint_paths, total=len(args.checkpoint_paths))):
-        model = load_checkpoint(checkpoint_path, device=args.device)
+        model = load_checkpoint(checkpoint_path, device=args.device, factorized_bond_input=args.factorized_bond_input)
         scaler, features_scaler, atom_descriptor_scaler, bond_feature_scaler = load_scalers(args.checkpoint_paths[index])
 
         # Normalize features
@@ -0,0 +1,86 @@
+"""Runs independent training jobs, such as the models of an ensemble or the folds of cross-validation, in parallel."""
+
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing as mp
+from typing import Callable, List, TypeVar
+
+import torch
+
+from chemprop.args import TrainArgs
+from chemprop.data import MoleculeDataset, set_cache_graph
+from chemprop.data.data import construct_molecule_batch
+
+
+T = TypeVar('T')
+JOB_FUNCTION = None
+
+
+def _init_job_worker(function: Callable[[int], T], num_threads: int) -> None:
+    """
+    Sets up a worker process of :func:`run_jobs`.
+
+    :param function: The function which runs a job, inherited from the main process without pickling.
+    :param num_threads: The number of PyTorch threads of the worker.
+    """
+    global JOB_FUNCTION
+    JOB_FUNCTION = function
+    torch.set_num_threads(num_threads)
+
+
+def _run_job(job: int) -> T:
+    """
+    Runs a job in a worker process of :func:`run_jobs`.
+
+    :param job: The index of the job.
+    :return: The result of the job.
+    """
+    return JOB_FUNCTION(job)
+
+
+def run_jobs(function: Callable[[int], T], num_jobs: int, num_processes: int = 1) -> List[T]:
+    """
+    Runs independent jobs, in parallel in a pool of local processes if :code:`num_processes > 1`.
+
+    The worker processes are forked from the main process, so :code:`function` may be a closure and the
+    data it uses (e.g., the loaded and featurized datasets) is shared copy-on-write rather than copied
+    to each worker. The PyTorch threads of the main process are split evenly between the workers.
+    Without the fork start method (e.g., on Windows), the jobs run sequentially.
+
+    :param function: A function which runs the job with the given index and returns a picklable result.
+    :param num_jobs: The number of jobs.
+    :param num_processes: The maximum number of jobs which run at the same time.
+    :return: The results of the jobs, in the order of their indices.
+    """
+    num_processes = min(num_processes, num_jobs)
+    if num_processes <= 1 or 'fork' not in mp.get_all_start_methods():
+        return [function(job) for job in range(num_jobs)]
+
+    num_threads = max(1, torch.get_num_threads() // num_processes)
+    with ProcessPoolExecutor(max_workers=num_processes,
+                             mp_context=mp.get_context('fork'),
+                             initializer=_init_job_worker,
+                             initargs=(function, num_threads)) as executor:
+        return list(executor.map(_run_job, range(num_jobs)))
+
+
+def share_graphs(data: MoleculeDataset, args: TrainArgs, chunk_size: int = 1000) -> None:
+    r"""
+    Featurizes the molecules of a dataset into the graph cache before training jobs are forked, so that
+    the jobs share the :class:`~chemprop.features.MolGraph`\ s instead of each featurizing the molecules.
+
+    Graphs are only computed if they would be cached during training (see :code:`args.cache_cutoff`) and
+    the molecules have no extra atom or bond features, since those are scaled separately for each split.
+
+    :param data: A :class:`~chemprop.data.MoleculeDataset`.
+    :param args: A :class:`~chemprop.args.TrainArgs` object containing the caching arguments.
+    :param chunk_size: The number of molecules featurized at once.
+    """
+    if len(data) == 0 or data[0].atom_features is not None or data[0].bond_features is not None:
+        return
+
+    if len(data) > args.cache_cutoff and args.cache_graph_max_bytes is None:
+        return
+
+    set_cache_graph(True)
+    for i in range(0, len(data), chunk_size):
+        construct_molecule_batch(data[i:i + chunk_size])
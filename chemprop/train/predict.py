@@ -44,7 +44,9 @@ def predict(
     for batch in tqdm(data_loader, disable=disable_progress_bar, leave=False):
         # Prepare batch
         batch: MoleculeDataset
-        mol_batch = batch.batch_graph()
+        mol_batch = batch.encodings()
+        if mol_batch is None:
+            mol_batch = batch.batch_graph()
         features_batch = batch.features()
         atom_descriptors_batch = batch.atom_descriptors()
         atom_features_batch = batch.atom_features()
@@ -111,3 +113,58 @@ def predict(
             return preds, lambdas, alphas, betas
 
     return preds
+
+
+def predict_ensemble(
+    models: List[MoleculeModel],
+    data_loader: MoleculeDataLoader,
+    scalers: List[StandardScaler],
+    features_scalers: List[StandardScaler] = None,
+    atom_descriptor_scalers: List[StandardScaler] = None,
+    bond_feature_scalers: List[StandardScaler] = None,
+    disable_progress_bar: bool = False,
+) -> List[List[List[float]]]:
+    """
+    Makes predictions on a dataset with each model of an ensemble while iterating over the data once.
+
+    Each batch is collated and featurized once and passed to every model, so the cost of featurization does not
+    grow with the number of models. The features of each batch are normalized with the scalers of each model
+    in turn, which gives the same values as normalizing the whole dataset per model.
+
+    :param models: A list of :class:`~chemprop.models.model.MoleculeModel`\ s.
+    :param data_loader: A :class:`~chemprop.data.data.MoleculeDataLoader`.
+    :param scalers: A list with the target :class:`~chemprop.features.scaler.StandardScaler` of each model.
+    :param features_scalers: A list with the features :class:`~chemprop.features.scaler.StandardScaler` of each model.
+    :param atom_descriptor_scalers: A list with the atom descriptor :class:`~chemprop.features.scaler.StandardScaler`
+                                    of each model.
+    :param bond_feature_scalers: A list with the bond feature :class:`~chemprop.features.scaler.StandardScaler`
+                                 of each model.
+    :param disable_progress_bar: Whether to disable the progress bar.
+    :return: A list with the predictions of each model, in the format returned by :func:`predict`.
+    """
+    features_scalers = features_scalers or [None] * len(models)
+    atom_descriptor_scalers = atom_descriptor_scalers or [None] * len(models)
+    bond_feature_scalers = bond_feature_scalers or [None] * len(models)
+    preds = [[] for _ in models]
+
+    for batch in tqdm(data_loader, disable=disable_progress_bar, leave=False):
+        batch: MoleculeDataset
+        for i, model in enumerate(models):
+            features_scaler, atom_descriptor_scaler, bond_feature_scaler = \
+                features_scalers[i], atom_descriptor_scalers[i], bond_feature_scalers[i]
+            if features_scaler is not None or atom_descriptor_scaler is not None or bond_feature_scaler is not None:
+                batch.reset_features_and_targets()
+                if features_scaler is not None:
+                    batch.normalize_features(features_scaler)
+                if atom_descriptor_scaler is not None:
+                    batch.normalize_features(atom_descriptor_scaler, scale_atom_descriptors=True)
+                if bond_feature_scaler is not None:
+                    batch.normalize_features(bond_feature_scaler, scale_bond_features=True)
+
+                # Extra atom and bond features are part of the graphs, which are rebuilt with this model's scaling
+                if batch.atom_features() is not None or batch.bond_features() is not None:
+                    batch._batch_graph = None
+
+            preds[i].extend(predict(model=model, data_loader=[batch], disable_progress_bar=True, scaler=scalers[i]))
+
+    return preds
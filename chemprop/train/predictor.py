@@ -0,0 +1,149 @@
+from typing import List, Tuple, Union
+
+import numpy as np
+
+from chemprop.args import PredictArgs
+from chemprop.data import deduplicate_data, make_datapoints, MoleculeDataset
+from chemprop.data.data import construct_molecule_batch
+from chemprop.uncertainty import UncertaintyCalibrator, UncertaintyEstimator
+from .make_predictions import expand_unique, load_calibrator, load_model, set_features, set_uncertainty_method
+from .predict import predict_ensemble
+
+
+class Predictor:
+    """
+    A :class:`Predictor` loads a model or ensemble of models once and then makes predictions on lists of SMILES
+    with low latency, e.g. in a service which predicts on many small requests.
+
+    The arguments are validated, the models, scalers and calibrator are loaded and the featurization options are
+    set when the :class:`Predictor` is built. Each call to :meth:`predict` only featurizes its molecules, collates
+    them into batches without a :class:`~chemprop.data.MoleculeDataLoader` and runs the models.
+
+    Since the featurization options are global, predictors of models trained with different featurization
+    options (e.g., :code:`explicit_h` or :code:`reaction`) should not be used in the same process.
+    """
+
+    def __init__(self, args: PredictArgs, calibrator: UncertaintyCalibrator = None):
+        """
+        :param args: A :class:`~chemprop.args.PredictArgs` object containing arguments for
+                     loading a model and making predictions. Input paths such as :code:`test_path` are ignored.
+        :param calibrator: A fitted :class:`~chemprop.uncertainty.UncertaintyCalibrator`. By default, a calibrator
+                           is fitted on :code:`args.calibration_path` if it is provided.
+        """
+        if any(path is not None for path in [args.features_path, args.phase_features_path,
+                                             args.atom_descriptors_path, args.bond_descriptors_path]):
+            raise ValueError('A Predictor can only compute features from SMILES with features generators, '
+                             'features cannot be loaded from files.')
+
+        args, self.train_args, self.models, self.scalers, self.num_tasks, self.task_names = \
+            load_model(args, generator=False)
+        self.args = args
+        self.num_models = len(args.checkpoint_paths)
+
+        set_features(args, self.train_args)
+        set_uncertainty_method(args)
+
+        if calibrator is None and args.calibration_path is not None:
+            calibrator = load_calibrator(
+                args=args,
+                train_args=self.train_args,
+                models=self.models,
+                scalers=self.scalers,
+                num_models=self.num_models,
+                task_names=self.task_names,
+            )
+        self.calibrator = calibrator
+
+        for model in self.models:
+            model.eval()
+
+    def predict(
+        self,
+        smiles: List[Union[str, List[str]]],
+        return_uncertainty: bool = False,
+    ) -> Union[List[List[Union[float, str]]], Tuple[List[List[Union[float, str]]], List[List[Union[float, str]]]]]:
+        """
+        Makes predictions on a list of SMILES.
+
+        :param smiles: A list of SMILES, or a list of lists of SMILES for models with several molecules per datapoint.
+        :param return_uncertainty: Whether to return uncertainty predictions alongside the model value predictions.
+        :return: A list of lists of target predictions, with predictions of "Invalid SMILES" for invalid SMILES.
+                 If returning uncertainty, a tuple containing first prediction values then uncertainty estimates.
+        """
+        args = self.args
+        full_data = list(make_datapoints(
+            {'smiles': [s] if isinstance(s, str) else s, 'features_generator': args.features_generator}
+            for s in smiles
+        ))
+        valid_indices = [i for i, d in enumerate(full_data) if all(mol is not None for mol in d.mol)]
+        test_data = MoleculeDataset([full_data[i] for i in valid_indices])
+
+        if len(test_data) > 0:
+            unique_data, unique_indices = test_data, None
+            if not args.no_deduplicate_smiles:
+                unique_data, unique_indices = deduplicate_data(test_data)
+
+            preds, unc = self._predict(unique_data)
+
+            if unique_indices is not None:
+                preds, unc = expand_unique(preds, unique_indices), expand_unique(unc, unique_indices)
+            num_unc_tasks = len(unc[0])
+        else:
+            preds, unc, num_unc_tasks = [], [], self.num_tasks
+
+        full_preds = [["Invalid SMILES"] * self.num_tasks for _ in full_data]
+        full_unc = [["Invalid SMILES"] * num_unc_tasks for _ in full_data]
+        for valid_index, full_index in enumerate(valid_indices):
+            full_preds[full_index] = preds[valid_index]
+            full_unc[full_index] = unc[valid_index]
+
+        if return_uncertainty:
+            return full_preds, full_unc
+
+        return full_preds
+
+    def _predict(self, data: MoleculeDataset) -> Tuple[List[List[float]], List[List[float]]]:
+        """
+        Makes predictions and uncertainty estimates on valid datapoints.
+
+        :param data: A :class:`~chemprop.data.MoleculeDataset` containing valid datapoints.
+        :return: A tuple of the predictions and uncertainty estimates of each datapoint.
+        """
+        args = self.args
+        batches = [construct_molecule_batch(data[i:i + args.batch_size])
+                   for i in range(0, len(data), args.batch_size)]
+
+        # Without uncertainty, the ensemble average is computed directly
+        if args.uncertainty_method is None and self.calibrator is None and not self.train_args.is_atom_bond_targets:
+            scalers, features_scalers, atom_descriptor_scalers, bond_feature_scalers = \
+                zip(*(scaler_list[:4] for scaler_list in self.scalers))
+            preds = np.mean(predict_ensemble(
+                models=self.models,
+                data_loader=batches,
+                scalers=scalers,
+                features_scalers=features_scalers,
+                atom_descriptor_scalers=atom_descriptor_scalers,
+                bond_feature_scalers=bond_feature_scalers,
+                disable_progress_bar=True,
+            ), axis=0)
+            unc = np.full_like(preds, np.nan)
+
+            return preds.tolist(), unc.tolist()
+
+        estimator = UncertaintyEstimator(
+            test_data=data,
+            test_data_loader=batches,
+            uncertainty_method=args.uncertainty_method,
+            models=self.models,
+            scalers=self.scalers,
+            num_models=self.num_models,
+            dataset_type=args.dataset_type,
+            loss_function=args.loss_function,
+            uncertainty_dropout_p=args.uncertainty_dropout_p,
+            conformal_alpha=args.conformal_alpha,
+            dropout_sampling_size=args.dropout_sampling_size,
+            individual_ensemble_predictions=False,
+            spectra_phase_mask=getattr(self.train_args, "spectra_phase_mask", None),
+        )
+
+        return estimator.calculate_uncertainty(calibrator=self.calibrator)
@@ -1,7 +1,9 @@
+from contextlib import nullcontext
 import json
 from logging import Logger
 import os
-from typing import Dict, List
+import time
+from typing import Callable, Dict, List, Optional
 
 import numpy as np
 import warnings
@@ -12,14 +14,18 @@ import torch
 from tqdm import trange
 from torch.optim.lr_scheduler import ExponentialLR
 
+from .distributed import build_train_data_loader, distributed_training
 from .evaluate import evaluate, evaluate_predictions
+from .molecule_fingerprint import model_fingerprint
+from .parallel import run_jobs, share_graphs
 from .predict import predict
 from .train import train
 from .loss_functions import get_loss_func
 from chemprop.spectra_utils import normalize_spectra, load_phase_mask
 from chemprop.args import TrainArgs
 from chemprop.constants import MODEL_FILE_NAME
-from chemprop.data import get_class_sizes, get_data, MoleculeDataLoader, MoleculeDataset, set_cache_graph, split_data
+from chemprop.data import cache_stats, features_cache, get_class_sizes, get_data, graph_cache, MoleculeDataLoader, \
+    MoleculeDataset, set_cache_graph, split_data
 from chemprop.models import MoleculeModel
 from chemprop.nn_utils import param_count, param_count_all
 from chemprop.utils import build_optimizer, build_lr_scheduler, load_checkpoint, makedirs, \
@@ -28,7 +34,8 @@ from chemprop.utils import build_optimizer, build_lr_scheduler, load_checkpoint,
 
 def run_training(args: TrainArgs,
                  data: MoleculeDataset,
-                 logger: Logger = None) -> Dict[str, List[float]]:
+                 logger: Logger = None,
+                 epoch_callback: Callable[[Dict[str, float]], None] = None) -> Dict[str, List[float]]:
     """
     Loads data, trains a Chemprop model, and returns test scores for the model checkpoint with the highest validation score.
 
@@ -36,6 +43,11 @@ def run_training(args: TrainArgs,
                  loading data and training the Chemprop model.
     :param data: A :class:`~chemprop.data.MoleculeDataset` containing the data.
     :param logger: A logger to record output.
+    :param epoch_callback: A function called after each epoch of each model with a dictionary containing the
+                           :code:`model_idx`, the :code:`epoch`, the average training :code:`loss`, the mean
+                           validation score of each metric, the :code:`best_score` so far and the training
+                           throughput in :code:`molecules_per_second`. When the models train concurrently
+                           (see :code:`args.num_train_jobs`), it is called in the process training the model.
     :return: A dictionary mapping each metric in :code:`args.metrics` to a list of values for each task.
 
     """
@@ -210,8 +222,8 @@ def run_training(args: TrainArgs,
     else:
         sum_test_preds = np.zeros((len(test_smiles), args.num_tasks))
 
-    # Automatically determine whether to cache
-    if len(data) <= args.cache_cutoff:
+    # Automatically determine whether to cache (a bounded cache is used regardless of the dataset size)
+    if len(data) <= args.cache_cutoff or args.cache_graph_max_bytes is not None:
         set_cache_graph(True)
         num_workers = 0
     else:
@@ -225,24 +237,61 @@ def run_training(args: TrainArgs,
         num_workers=num_workers,
         class_balance=args.class_balance,
         shuffle=True,
-        seed=args.seed
+        seed=args.seed,
+        max_batch_atoms=args.batch_max_atoms,
+        max_batch_bonds=args.batch_max_bonds
     )
     val_data_loader = MoleculeDataLoader(
         dataset=val_data,
         batch_size=args.batch_size,
-        num_workers=num_workers
+        num_workers=num_workers,
+        max_batch_atoms=args.batch_max_atoms,
+        max_batch_bonds=args.batch_max_bonds,
+        cache_batches_max_bytes=args.cache_eval_batches_max_bytes
     )
     test_data_loader = MoleculeDataLoader(
         dataset=test_data,
         batch_size=args.batch_size,
-        num_workers=num_workers
+        num_workers=num_workers,
+        max_batch_atoms=args.batch_max_atoms,
+        max_batch_bonds=args.batch_max_bonds,
+        cache_batches_max_bytes=args.cache_eval_batches_max_bytes
     )
 
     if args.class_balance:
         debug(f'With class_balance, effective train size = {train_data_loader.iter_size:,}')
 
-    # Train ensemble of models
-    for model_idx in range(args.ensemble_size):
+    # Train ensemble of models, concurrently in forked processes which share the featurized data if requested
+    train_models_concurrently = min(args.num_train_jobs, args.ensemble_size) > 1
+    if train_models_concurrently:
+        for dataset in [train_data, val_data, test_data]:
+            share_graphs(dataset, args)
+
+    # Compute the outputs of the frozen encoder once before training so that training only runs the feed-forward
+    # layers (the encoder loaded from checkpoint_frzn is the same for all models of the ensemble). The encodings
+    # are computed before the training jobs are forked, so concurrently trained models share them.
+    if args.precompute_frozen_encodings:
+        debug('Precomputing encodings of the frozen encoder')
+        # Building the encoder does not advance the random state used to initialize the models
+        with torch.random.fork_rng(devices=[]):
+            frozen_model = load_frzn_model(model=MoleculeModel(args), path=args.checkpoint_frzn,
+                                           current_args=args, logger=logger).to(args.device)
+        for dataset in [train_data, val_data, test_data]:
+            encodings = model_fingerprint(
+                model=frozen_model,
+                data_loader=MoleculeDataLoader(dataset=dataset, batch_size=args.batch_size, num_workers=num_workers),
+                fingerprint_type='MPN'
+            )
+            dataset.set_encodings(np.array(encodings, dtype=np.float32))
+        del frozen_model
+
+    def train_model(model_idx: int) -> Optional[List[List[float]]]:
+        """
+        Trains a model of the ensemble and evaluates it on the test set.
+
+        :param model_idx: The index of the model in the ensemble.
+        :return: The predictions of the model on the test set, or None if the test set is empty.
+        """
         # Tensorboard writer
         save_dir = os.path.join(args.save_dir, f'model_{model_idx}')
         makedirs(save_dir)
@@ -252,6 +301,8 @@ def run_training(args: TrainArgs,
             writer = SummaryWriter(logdir=save_dir)
 
         # Load/build model
+        if train_models_concurrently:
+            torch.manual_seed(args.pytorch_seed + model_idx)
         if args.checkpoint_paths is not None:
             debug(f'Loading model {model_idx} from {args.checkpoint_paths[model_idx]}')
             model = load_checkpoint(args.checkpoint_paths[model_idx], logger=logger)
@@ -284,60 +335,91 @@ def run_training(args: TrainArgs,
         # Optimizers
         optimizer = build_optimizer(model, args)
 
+        # With distributed training, each process trains on its own shard of the batches of each epoch,
+        # and models trained concurrently shuffle the training data differently
+        if args.num_train_processes > 1 or train_models_concurrently:
+            model_train_data_loader = build_train_data_loader(train_data, args, num_workers=num_workers,
+                                                              seed=args.seed + model_idx)
+        else:
+            model_train_data_loader = train_data_loader
+
         # Learning rate schedulers
-        scheduler = build_lr_scheduler(optimizer, args)
+        if args.batch_max_atoms is not None or args.batch_max_bonds is not None or args.num_train_processes > 1:
+            scheduler = build_lr_scheduler(optimizer, args, steps_per_epoch=len(model_train_data_loader))
+        else:
+            scheduler = build_lr_scheduler(optimizer, args)
 
         # Run training
         best_score = float('inf') if args.minimize_score else -float('inf')
         best_epoch, n_iter = 0, 0
-        for epoch in trange(args.epochs):
-            debug(f'Epoch {epoch}')
-            n_iter = train(
-                model=model,
-                data_loader=train_data_loader,
-                loss_func=loss_func,
-                optimizer=optimizer,
-                scheduler=scheduler,
-                args=args,
-                n_iter=n_iter,
-                atom_bond_scaler=atom_bond_scaler,
-                logger=logger,
-                writer=writer
-            )
-            if isinstance(scheduler, ExponentialLR):
-                scheduler.step()
-            val_scores = evaluate(
-                model=model,
-                data_loader=val_data_loader,
-                num_tasks=args.num_tasks,
-                metrics=args.metrics,
-                dataset_type=args.dataset_type,
-                loss_function=args.loss_function,
-                scaler=scaler,
-                quantiles=args.quantiles,
-                atom_bond_scaler=atom_bond_scaler,
-                logger=logger
-            )
-
-            for metric, scores in val_scores.items():
-                # Average validation score\
-                mean_val_score = multitask_mean(scores, metric=metric)
-                debug(f'Validation {metric} = {mean_val_score:.6f}')
-                writer.add_scalar(f'validation_{metric}', mean_val_score, n_iter)
-
-                if args.show_individual_scores:
-                    # Individual validation scores
-                    for task_name, val_score in zip(args.task_names, scores):
-                        debug(f'Validation {task_name} {metric} = {val_score:.6f}')
-                        writer.add_scalar(f'validation_{task_name}_{metric}', val_score, n_iter)
-
-            # Save model checkpoint if improved validation score
-            mean_val_score = multitask_mean(val_scores[args.metric], metric=args.metric)
-            if args.minimize_score and mean_val_score < best_score or \
-                    not args.minimize_score and mean_val_score > best_score:
-                best_score, best_epoch = mean_val_score, epoch
-                save_checkpoint(os.path.join(save_dir, MODEL_FILE_NAME), model, scaler, features_scaler,
-                                atom_descriptor_scaler, bond_descriptor_scaler, atom_bond_scaler, args)
+        if args.num_train_processes > 1:
+            training = distributed_training(model, train_data, args, atom_bond_scaler, num_workers=num_workers,
+                                            seed=args.seed + model_idx)
+        else:
+            training = nullcontext()
+
+        with training:
+            for epoch in trange(args.epochs):
+                debug(f'Epoch {epoch}')
+                epoch_start, losses = time.perf_counter(), []
+                n_iter = train(
+                    model=model,
+                    data_loader=model_train_data_loader,
+                    loss_func=loss_func,
+                    optimizer=optimizer,
+                    scheduler=scheduler,
+                    args=args,
+                    n_iter=n_iter,
+                    atom_bond_scaler=atom_bond_scaler,
+                    logger=logger,
+                    writer=writer,
+                    losses=losses
+                )
+                epoch_time = time.perf_counter() - epoch_start
+                if isinstance(scheduler, ExponentialLR):
+                    scheduler.step()
+                val_scores = evaluate(
+                    model=model,
+                    data_loader=val_data_loader,
+                    num_tasks=args.num_tasks,
+                    metrics=args.metrics,
+                    dataset_type=args.dataset_type,
+                    loss_function=args.loss_function,
+                    scaler=scaler,
+                    quantiles=args.quantiles,
+                    atom_bond_scaler=atom_bond_scaler,
+                    logger=logger
+                )
+
+                for metric, scores in val_scores.items():
+                    # Average validation score\
+                    mean_val_score = multitask_mean(scores, metric=metric)
+                    debug(f'Validation {metric} = {mean_val_score:.6f}')
+                    writer.add_scalar(f'validation_{metric}', mean_val_score, n_iter)
+
+                    if args.show_individual_scores:
+                        # Individual validation scores
+                        for task_name, val_score in zip(args.task_names, scores):
+                            debug(f'Validation {task_name} {metric} = {val_score:.6f}')
+                            writer.add_scalar(f'validation_{task_name}_{metric}', val_score, n_iter)
+
+                # Save model checkpoint if improved validation score
+                mean_val_score = multitask_mean(val_scores[args.metric], metric=args.metric)
+                if args.minimize_score and mean_val_score < best_score or \
+                        not args.minimize_score and mean_val_score > best_score:
+                    best_score, best_epoch = mean_val_score, epoch
+                    save_checkpoint(os.path.join(save_dir, MODEL_FILE_NAME), model, scaler, features_scaler,
+                                    atom_descriptor_scaler, bond_descriptor_scaler, atom_bond_scaler, args)
+
+                if epoch_callback is not None:
+                    epoch_callback({
+                        'model_idx': model_idx,
+                        'epoch': epoch,
+                        'loss': float(np.mean(losses)) if len(losses) > 0 else None,
+                        **{metric: float(multitask_mean(scores, metric=metric)) for metric, scores in val_scores.items()},
+                        'best_score': float(best_score),
+                        'molecules_per_second': model_train_data_loader.iter_size * args.num_train_processes / epoch_time
+                    })
 
         # Evaluate on test set using model with best validation score
         info(f'Model {model_idx} best validation {args.metric} = {best_score:.6f} on epoch {best_epoch}')
@@ -345,6 +427,7 @@ def run_training(args: TrainArgs,
 
         if empty_test_set:
             info(f'Model {model_idx} provided with no test set, no metric evaluation will be performed.')
+            test_preds = None
         else:
             test_preds = predict(
                 model=model,
@@ -365,12 +448,6 @@ def run_training(args: TrainArgs,
                 logger=logger
             )
 
-            if len(test_preds) != 0:
-                if args.is_atom_bond_targets:
-                    sum_test_preds += np.array(test_preds, dtype=object)
-                else:
-                    sum_test_preds += np.array(test_preds)
-
             # Average test score
             for metric, scores in test_scores.items():
                 avg_test_score = np.nanmean(scores)
@@ -384,6 +461,25 @@ def run_training(args: TrainArgs,
                         writer.add_scalar(f'test_{task_name}_{metric}', test_score, n_iter)
         writer.close()
 
+        return test_preds
+
+    for test_preds in run_jobs(train_model, args.ensemble_size, num_processes=args.num_train_jobs):
+        if test_preds is not None and len(test_preds) != 0:
+            if args.is_atom_bond_targets:
+                sum_test_preds += np.array(test_preds, dtype=object)
+            else:
+                sum_test_preds += np.array(test_preds)
+
+    if args.precompute_frozen_encodings:
+        for dataset in [train_data, val_data, test_data]:
+            dataset.set_encodings(None)
+
+    debug(cache_stats())
+    if graph_cache() is not None:
+        debug(graph_cache().stats())
+    if features_cache() is not None:
+        debug(features_cache().stats())
+
     # Evaluate ensemble on test set
     if empty_test_set:
         ensemble_scores = {
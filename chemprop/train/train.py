@@ -1,9 +1,10 @@
 import logging
-from typing import Callable
+from typing import Callable, List
 
 import numpy as np
 from tensorboardX import SummaryWriter
 import torch
+import torch.distributed as dist
 import torch.nn as nn
 from torch.optim import Optimizer
 from torch.optim.lr_scheduler import _LRScheduler
@@ -12,7 +13,7 @@ from tqdm import tqdm
 from chemprop.args import TrainArgs
 from chemprop.data import MoleculeDataLoader, MoleculeDataset, AtomBondScaler
 from chemprop.models import MoleculeModel
-from chemprop.nn_utils import compute_gnorm, compute_pnorm, NoamLR
+from chemprop.nn_utils import all_reduce_gradients, compute_gnorm, compute_pnorm, NoamLR
 
 
 def train(
@@ -26,10 +27,15 @@ def train(
     atom_bond_scaler: AtomBondScaler = None,
     logger: logging.Logger = None,
     writer: SummaryWriter = None,
+    losses: List[float] = None,
+    disable_progress_bar: bool = False,
 ) -> int:
     """
     Trains a model for an epoch.
 
+    If a :mod:`torch.distributed` process group is initialized, the gradients of each step are averaged
+    across the processes, which each load their own shard of the data.
+
     :param model: A :class:`~chemprop.models.model.MoleculeModel`.
     :param data_loader: A :class:`~chemprop.data.data.MoleculeDataLoader`.
     :param loss_func: Loss function.
@@ -40,6 +46,8 @@ def train(
     :param atom_bond_scaler: A :class:`~chemprop.data.scaler.AtomBondScaler` fitted on the atomic/bond targets.
     :param logger: A logger for recording output.
     :param writer: A tensorboardX SummaryWriter.
+    :param losses: A list to which the average loss of each logging interval is appended.
+    :param disable_progress_bar: Whether to disable the progress bar.
     :return: The total number of iterations (training examples) trained on so far.
     """
     debug = logger.debug if logger is not None else print
@@ -50,12 +58,14 @@ def train(
     else:
         loss_sum = iter_count = 0
 
-    for batch in tqdm(data_loader, total=len(data_loader), leave=False):
+    for batch in tqdm(data_loader, total=len(data_loader), disable=disable_progress_bar, leave=False):
         # Prepare batch
         batch: MoleculeDataset
         mol_batch, features_batch, target_batch, mask_batch, atom_descriptors_batch, atom_features_batch, bond_descriptors_batch, bond_features_batch, constraints_batch, data_weights_batch = \
-            batch.batch_graph(), batch.features(), batch.targets(), batch.mask(), batch.atom_descriptors(), \
+            batch.encodings(), batch.features(), batch.targets(), batch.mask(), batch.atom_descriptors(), \
             batch.atom_features(), batch.bond_descriptors(), batch.bond_features(), batch.constraints(), batch.data_weights()
+        if mol_batch is None:  # Graphs are only needed without precomputed encodings of a frozen encoder
+            mol_batch = batch.batch_graph()
 
         if model.is_atom_bond_targets:
             targets = []
@@ -221,6 +231,8 @@ def train(
             iter_count += 1
 
             loss.backward()
+        if dist.is_available() and dist.is_initialized():
+            all_reduce_gradients(model)
         if args.grad_clip:
             nn.utils.clip_grad_norm_(model.parameters(), args.grad_clip)
         optimizer.step()
@@ -245,6 +257,9 @@ def train(
             lrs_str = ", ".join(f"lr_{i} = {lr:.4e}" for i, lr in enumerate(lrs))
             debug(f"Loss = {loss_avg:.4e}, PNorm = {pnorm:.4f}, GNorm = {gnorm:.4f}, {lrs_str}")
 
+            if losses is not None:
+                losses.append(loss_avg)
+
             if writer is not None:
                 writer.add_scalar("train_loss", loss_avg, n_iter)
                 writer.add_scalar("param_norm", pnorm, n_iter)
@@ -1,12 +1,12 @@
 from abc import ABC, abstractmethod
-from typing import Iterator, List
+from typing import Iterator, List, Tuple
 
 import numpy as np
 from tqdm import tqdm
 
 from chemprop.data import MoleculeDataset, StandardScaler, MoleculeDataLoader
 from chemprop.models import MoleculeModel
-from chemprop.train.predict import predict
+from chemprop.train.predict import predict, predict_ensemble
 from chemprop.spectra_utils import normalize_spectra, roundrobin_sid
 from chemprop.multitask_utils import reshape_values, reshape_individual_preds
 
@@ -72,6 +72,36 @@ class UncertaintyPredictor(ABC):
         Calculate the uncalibrated predictions and store them as attributes
         """
 
+    def predict_ensemble(self) -> List[Tuple[MoleculeModel, List[List[float]]]]:
+        """
+        Make predictions with all models, featurizing each batch of the test data once for the whole ensemble.
+        Returns a list of each model paired with its predictions.
+        """
+        models, scalers, features_scalers, atom_descriptor_scalers, bond_descriptor_scalers = [], [], [], [], []
+        for model, scaler_list in zip(self.models, self.scalers):
+            (
+                scaler,
+                features_scaler,
+                atom_descriptor_scaler,
+                bond_descriptor_scaler,
+                atom_bond_scaler,
+            ) = scaler_list
+            models.append(model)
+            scalers.append(scaler)
+            features_scalers.append(features_scaler)
+            atom_descriptor_scalers.append(atom_descriptor_scaler)
+            bond_descriptor_scalers.append(bond_descriptor_scaler)
+
+        preds = predict_ensemble(
+            models=models,
+            data_loader=self.test_data_loader,
+            scalers=scalers,
+            features_scalers=features_scalers,
+            atom_descriptor_scalers=atom_descriptor_scalers,
+            bond_feature_scalers=bond_descriptor_scalers,
+        )
+        return list(zip(models, preds))
+
     def get_uncal_preds(self):
         """
         Return the predicted values for the test data.
@@ -120,40 +150,7 @@ class NoUncertaintyPredictor(UncertaintyPredictor):
         return "no_uncertainty_method"
 
     def calculate_predictions(self):
-        for i, (model, scaler_list) in enumerate(
-            tqdm(zip(self.models, self.scalers), total=self.num_models)
-        ):
-            (
-                scaler,
-                features_scaler,
-                atom_descriptor_scaler,
-                bond_descriptor_scaler,
-                atom_bond_scaler,
-            ) = scaler_list
-            if (
-                features_scaler is not None
-                or atom_descriptor_scaler is not None
-                or bond_descriptor_scaler is not None
-            ):
-                self.test_data.reset_features_and_targets()
-                if features_scaler is not None:
-                    self.test_data.normalize_features(features_scaler)
-                if atom_descriptor_scaler is not None:
-                    self.test_data.normalize_features(
-                        atom_descriptor_scaler, scale_atom_descriptors=True
-                    )
-                if bond_descriptor_scaler is not None:
-                    self.test_data.normalize_features(
-                        bond_descriptor_scaler, scale_bond_descriptors=True
-                    )
-
-            preds = predict(
-                model=model,
-                data_loader=self.test_data_loader,
-                scaler=scaler,
-                atom_bond_scaler=atom_bond_scaler,
-                return_unc_parameters=False,
-            )
+        for i, (model, preds) in enumerate(self.predict_ensemble()):
             if i == 0:
                 sum_preds = np.array(preds)
                 if self.individual_ensemble_predictions:
@@ -1013,39 +1010,7 @@ class EnsemblePredictor(UncertaintyPredictor):
             )
 
     def calculate_predictions(self):
-        for i, (model, scaler_list) in enumerate(
-            tqdm(zip(self.models, self.scalers), total=self.num_models)
-        ):
-            (
-                scaler,
-                features_scaler,
-                atom_descriptor_scaler,
-                bond_descriptor_scaler,
-                atom_bond_scaler,
-            ) = scaler_list
-            if (
-                features_scaler is not None
-                or atom_descriptor_scaler is not None
-                or bond_descriptor_scaler is not None
-            ):
-                self.test_data.reset_features_and_targets()
-                if features_scaler is not None:
-                    self.test_data.normalize_features(features_scaler)
-                if atom_descriptor_scaler is not None:
-                    self.test_data.normalize_features(
-                        atom_descriptor_scaler, scale_atom_descriptors=True
-                    )
-                if bond_descriptor_scaler is not None:
-                    self.test_data.normalize_features(
-                        bond_descriptor_scaler, scale_bond_descriptors=True
-                    )
-            preds = predict(
-                model=model,
-                data_loader=self.test_data_loader,
-                scaler=scaler,
-                atom_bond_scaler=atom_bond_scaler,
-                return_unc_parameters=False,
-            )
+        for i, (model, preds) in enumerate(self.predict_ensemble()):
             if self.dataset_type == "spectra":
                 preds = normalize_spectra(
                     spectra=preds,
@@ -1260,39 +1225,7 @@ class ClassPredictor(UncertaintyPredictor):
             )
 
     def calculate_predictions(self):
-        for i, (model, scaler_list) in enumerate(
-            tqdm(zip(self.models, self.scalers), total=self.num_models)
-        ):
-            (
-                scaler,
-                features_scaler,
-                atom_descriptor_scaler,
-                bond_descriptor_scaler,
-                atom_bond_scaler,
-            ) = scaler_list
-            if (
-                features_scaler is not None
-                or atom_descriptor_scaler is not None
-                or bond_descriptor_scaler is not None
-            ):
-                self.test_data.reset_features_and_targets()
-                if features_scaler is not None:
-                    self.test_data.normalize_features(features_scaler)
-                if atom_descriptor_scaler is not None:
-                    self.test_data.normalize_features(
-                        atom_descriptor_scaler, scale_atom_descriptors=True
-                    )
-                if bond_descriptor_scaler is not None:
-                    self.test_data.normalize_features(
-                        bond_descriptor_scaler, scale_bond_descriptors=True
-                    )
-
-            preds = predict(
-                model=model,
-                data_loader=self.test_data_loader,
-                scaler=scaler,
-                return_unc_parameters=False,
-            )
+        for i, (model, preds) in enumerate(self.predict_ensemble()):
             if i == 0:
                 sum_preds = np.array(preds)
                 if self.individual_ensemble_predictions:
@@ -87,7 +87,10 @@ def save_checkpoint(
 
 
 def load_checkpoint(
-    path: str, device: torch.device = None, logger: logging.Logger = None
+    path: str,
+    device: torch.device = None,
+    logger: logging.Logger = None,
+    factorized_bond_input: bool = None,
 ) -> MoleculeModel:
     """
     Loads a model checkpoint.
@@ -95,6 +98,8 @@ def load_checkpoint(
     :param path: Path where checkpoint is saved.
     :param device: Device where the model will be moved.
     :param logger: A logger for recording output.
+    :param factorized_bond_input: Whether the encoder computes its bond input layer in factorized form.
+                                  By default, uses the setting saved in the checkpoint.
     :return: The loaded :class:`~chemprop.models.model.MoleculeModel`.
     """
     if logger is not None:
@@ -110,6 +115,8 @@ def load_checkpoint(
 
     if device is not None:
         args.device = device
+    if factorized_bond_input is not None:
+        args.factorized_bond_input = factorized_bond_input
 
     # Build model
     model = MoleculeModel(args)
@@ -450,7 +457,7 @@ def build_optimizer(model: nn.Module, args: TrainArgs) -> Optimizer:
 
 
 def build_lr_scheduler(
-    optimizer: Optimizer, args: TrainArgs, total_epochs: List[int] = None
+    optimizer: Optimizer, args: TrainArgs, total_epochs: List[int] = None, steps_per_epoch: int = None
 ) -> _LRScheduler:
     """
     Builds a PyTorch learning rate scheduler.
@@ -458,6 +465,7 @@ def build_lr_scheduler(
     :param optimizer: The Optimizer whose learning rate will be scheduled.
     :param args: A :class:`~chemprop.args.TrainArgs` object containing learning rate arguments.
     :param total_epochs: The total number of epochs for which the model will be run.
+    :param steps_per_epoch: The number of batches in an epoch. By default, computed from the batch size.
     :return: An initialized learning rate scheduler.
     """
     # Learning rate scheduler
@@ -465,7 +473,7 @@ def build_lr_scheduler(
         optimizer=optimizer,
         warmup_epochs=[args.warmup_epochs],
         total_epochs=total_epochs or [args.epochs] * args.num_lrs,
-        steps_per_epoch=args.train_data_size // args.batch_size,
+        steps_per_epoch=steps_per_epoch or args.train_data_size // args.batch_size,
         init_lr=[args.init_lr],
         max_lr=[args.max_lr],
         final_lr=[args.final_lr],
@@ -132,7 +132,34 @@ def get_ckpts(user_id: int) -> List[sqlite3.Row]:
     if not user_id:
         user_id = app.config['DEFAULT_USER_ID']
 
-    return query_db(f'SELECT * FROM ckpt WHERE associated_user = {user_id}')
+    # Checkpoints without stats were uploaded or trained before training jobs recorded their state
+    return query_db(f'SELECT * FROM ckpt WHERE associated_user = {user_id} AND (completed OR stats IS NULL)')
+
+
+def get_ckpt(ckpt_id: int) -> Optional[sqlite3.Row]:
+    """
+    Returns the checkpoint with the given id.
+
+    :param ckpt_id: The id of the checkpoint.
+    :return The checkpoint, or None if it does not exist.
+    """
+    return query_db(f'SELECT * FROM ckpt WHERE id = {ckpt_id}', one=True)
+
+
+def get_training_jobs(user_id: int, limit: int = 10) -> List[sqlite3.Row]:
+    """
+    Returns the most recent checkpoints trained by training jobs of the given user.
+    If no user_id is provided, return the jobs of the default user.
+
+    :param user_id: The id of the user whose training jobs are returned.
+    :param limit: The maximum number of jobs to return.
+    :return A list of checkpoints, with the state of their training jobs in their stats.
+    """
+    if not user_id:
+        user_id = app.config['DEFAULT_USER_ID']
+
+    return query_db(f'SELECT * FROM ckpt WHERE associated_user = {user_id} AND stats IS NOT NULL '
+                    f'ORDER BY id DESC LIMIT {int(limit)}')
 
 
 def insert_ckpt(ckpt_name: str,
@@ -1,18 +1,21 @@
 """Defines a number of routes/views for the flask app."""
 
+from collections import OrderedDict
+from contextlib import contextmanager
+import csv
 from functools import wraps
 import io
 import os
 import sys
 import shutil
 from tempfile import TemporaryDirectory, NamedTemporaryFile
+import threading
 import time
-from typing import Callable, List, Tuple
-import multiprocessing as mp
+from typing import Callable, Dict, Hashable, Iterator, List, Optional, Tuple
 import zipfile
 
-from flask import json, jsonify, redirect, render_template, request, send_file, send_from_directory, url_for
-import numpy as np
+from flask import json, jsonify, redirect, render_template, request, Response, send_file, send_from_directory, \
+    stream_with_context, url_for
 from rdkit import Chem
 from werkzeug.utils import secure_filename
 
@@ -21,13 +24,30 @@ from chemprop.web.app import app, db
 sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.realpath(__file__)))))
 
 from chemprop.args import PredictArgs, TrainArgs
-from chemprop.constants import MODEL_FILE_NAME, TRAIN_LOGGER_NAME
-from chemprop.data import get_data, get_header, get_smiles, get_task_names, validate_data
-from chemprop.train import make_predictions, run_training
-from chemprop.utils import create_logger, load_task_names, load_args
+from chemprop.constants import MODEL_FILE_NAME
+from chemprop.data import get_data, get_header, get_smiles, validate_data
+from chemprop.features import featurization_parameters_hash
+from chemprop.train import Predictor, set_features
+from chemprop.utils import load_args
+from chemprop.web.batching import PredictionBatcher
+from chemprop.web.jobs import COMPLETED, FAILED, TrainingJobQueue
 
-TRAINING = 0
-PROGRESS = mp.Value('d', 0.0)
+# Training jobs, which are run in a pool of worker processes created on first use
+TRAINING_JOBS = None
+TRAINING_JOBS_LOCK = threading.Lock()
+
+# Resident models of each checkpoint and device, which are loaded once and shared by all requests. At most
+# MAX_RESIDENT_MODELS are kept, in order of use so that the least recently used models are evicted first.
+MODEL_POOL: 'OrderedDict[Tuple[int, str], Tuple[Predictor, PredictionBatcher]]' = OrderedDict()
+MODEL_POOL_LOCK = threading.Lock()
+
+# Locks held while the models of a checkpoint and device are loaded, so that they are only loaded once
+MODEL_LOAD_LOCKS: Dict[Tuple[int, str], threading.Lock] = {}
+
+# Featurization options are global, so only predictions which use the same options run at the same time
+FEATURIZATION_CONDITION = threading.Condition()
+ACTIVE_FEATURIZATION = None
+NUM_ACTIVE_PREDICTIONS = 0
 
 
 def check_not_demo(func: Callable) -> Callable:
@@ -46,27 +66,6 @@ def check_not_demo(func: Callable) -> Callable:
     return decorated_function
 
 
-def progress_bar(args: TrainArgs, progress: mp.Value):
-    """
-    Updates a progress bar displayed during training.
-
-    :param args: Arguments.
-    :param progress: The current progress.
-    """
-    # no code to handle crashes in model training yet, though
-    current_epoch = -1
-    while current_epoch < args.epochs - 1:
-        if os.path.exists(os.path.join(args.save_dir, 'verbose.log')):
-            with open(os.path.join(args.save_dir, 'verbose.log'), 'r') as f:
-                content = f.read()
-                if 'Epoch ' + str(current_epoch + 1) in content:
-                    current_epoch += 1
-                    progress.value = (current_epoch + 1) * 100 / args.epochs
-        else:
-            pass
-        time.sleep(0)
-
-
 def find_unused_path(path: str) -> str:
     """
     Given an initial path, finds an unused path by appending different numbers to the filename.
@@ -115,33 +114,172 @@ def get_upload_warnings_errors(upload_item: str) -> Tuple[List[str], List[str]]:
     return warnings, errors
 
 
-def format_float(value: float, precision: int = 4) -> str:
+def get_job_queue() -> TrainingJobQueue:
+    """Gets the queue of training jobs, starting its worker processes on first use."""
+    global TRAINING_JOBS
+
+    with TRAINING_JOBS_LOCK:
+        if TRAINING_JOBS is None:
+            TRAINING_JOBS = TrainingJobQueue(
+                db_path=app.config['DB_PATH'],
+                checkpoint_folder=app.config['CHECKPOINT_FOLDER'],
+                max_workers=app.config['MAX_TRAINING_JOBS']
+            )
+
+        return TRAINING_JOBS
+
+
+@contextmanager
+def featurization_options(featurization: Hashable, set_options: Callable[[], None]) -> Iterator[None]:
+    """
+    Runs predictions with a set of global featurization options.
+
+    Predictions with the same options run concurrently, while predictions with other options wait until
+    the running predictions have finished and then set their options.
+
+    :param featurization: A key identifying the featurization options.
+    :param set_options: A function which sets the featurization options.
     """
-    Formats a float value to a specific precision.
+    global ACTIVE_FEATURIZATION, NUM_ACTIVE_PREDICTIONS
+
+    with FEATURIZATION_CONDITION:
+        FEATURIZATION_CONDITION.wait_for(
+            lambda: NUM_ACTIVE_PREDICTIONS == 0 or ACTIVE_FEATURIZATION == featurization
+        )
+        if ACTIVE_FEATURIZATION != featurization:
+            set_options()
+            ACTIVE_FEATURIZATION = featurization
+        NUM_ACTIVE_PREDICTIONS += 1
+
+    try:
+        yield
+    finally:
+        with FEATURIZATION_CONDITION:
+            NUM_ACTIVE_PREDICTIONS -= 1
+            FEATURIZATION_CONDITION.notify_all()
+
+
+def is_valid_gpu(gpu: Optional[str]) -> bool:
+    """
+    Checks whether predictions can be made on a GPU.
 
-    :param value: The float value to format.
-    :param precision: The number of decimal places to use.
-    :return: A string containing the formatted float.
+    :param gpu: The GPU to predict on, :code:`'None'` to predict on the CPU or None to use the default device.
+    :return: Whether the GPU is None, :code:`'None'` or one of the GPUs of the app.
     """
-    return f'{value:.{precision}f}'
+    return gpu is None or gpu == 'None' or gpu in [str(gpu_index) for gpu_index in app.config['GPUS']]
 
 
-def format_float_list(array: List[float], precision: int = 4) -> List[str]:
+def load_predictor(ckpt_id: int, gpu: str = None) -> Predictor:
     """
-    Formats a list of float values to a specific precision.
+    Loads the models of a checkpoint.
 
-    :param array: A list of float values to format.
-    :param precision: The number of decimal places to use.
-    :return: A list of strings containing the formatted floats.
+    :param ckpt_id: The id of the checkpoint.
+    :param gpu: The GPU to predict on, :code:`'None'` to predict on the CPU or None to use the default device.
+    :return: A :class:`~chemprop.train.Predictor` which predicts in batches of up to :code:`MAX_BATCH_SIZE` molecules.
     """
-    return [format_float(f, precision) for f in array]
+    models = db.get_models(ckpt_id)
+    model_paths = [os.path.join(app.config['CHECKPOINT_FOLDER'], f'{model["id"]}.pt') for model in models]
 
+    train_args = load_args(model_paths[0])
 
-@app.route('/receiver', methods=['POST'])
-@check_not_demo
-def receiver():
-    """Receiver monitoring the progress of training."""
-    return jsonify(progress=PROGRESS.value, training=TRAINING)
+    # Build arguments
+    arguments = [
+        '--test_path', 'None',
+        '--preds_path', os.path.join(app.config['TEMP_FOLDER'], app.config['PREDICTIONS_FILENAME']),
+        '--checkpoint_paths', *model_paths,
+        '--batch_size', str(app.config['MAX_BATCH_SIZE'])
+    ]
+
+    if gpu is not None:
+        if gpu == 'None':
+            arguments.append('--no_cuda')
+        else:
+            arguments += ['--gpu', gpu]
+
+    # Handle additional features
+    if train_args.features_path is not None:
+        # TODO: make it possible to specify the features generator if trained using features_path
+        arguments += [
+            '--features_generator', 'rdkit_2d_normalized',
+            '--no_features_scaling'
+        ]
+    elif train_args.features_generator is not None:
+        arguments += ['--features_generator', *train_args.features_generator]
+
+        if not train_args.features_scaling:
+            arguments.append('--no_features_scaling')
+
+    return Predictor(PredictArgs().parse_args(arguments))
+
+
+def get_model(ckpt_id: int, gpu: str = None) -> Tuple[Predictor, PredictionBatcher]:
+    """
+    Gets the resident models of a checkpoint, loading them on first use.
+
+    :param ckpt_id: The id of the checkpoint.
+    :param gpu: The GPU to predict on, :code:`'None'` to predict on the CPU or None to use the default device.
+    :return: A tuple with the :class:`~chemprop.train.Predictor` of the checkpoint and the
+             :class:`~chemprop.web.batching.PredictionBatcher` which coalesces the requests to it.
+    """
+    key = (ckpt_id, gpu)
+    with MODEL_POOL_LOCK:
+        if key in MODEL_POOL:
+            MODEL_POOL.move_to_end(key)
+            return MODEL_POOL[key]
+
+        load_lock = MODEL_LOAD_LOCKS.setdefault(key, threading.Lock())
+
+    # Models are loaded outside of MODEL_POOL_LOCK so that requests to resident models are not blocked
+    with load_lock:
+        with MODEL_POOL_LOCK:
+            if key in MODEL_POOL:
+                MODEL_POOL.move_to_end(key)
+                return MODEL_POOL[key]
+
+        try:
+            # Loading sets the featurization options, so it waits for all running predictions
+            with featurization_options(object(), lambda: None):
+                predictor = load_predictor(ckpt_id, gpu)
+                featurization = featurization_parameters_hash()
+        except BaseException:
+            with MODEL_POOL_LOCK:
+                MODEL_LOAD_LOCKS.pop(key, None)
+            raise
+
+        def predict_batch(smiles: List[str]) -> List[List]:
+            with featurization_options(featurization, lambda: set_features(predictor.args, predictor.train_args)):
+                return predictor.predict(smiles)
+
+        batcher = PredictionBatcher(
+            predict=predict_batch,
+            max_batch_size=app.config['MAX_BATCH_SIZE'],
+            max_wait=app.config['MAX_BATCH_WAIT']
+        )
+
+        with MODEL_POOL_LOCK:
+            MODEL_POOL[key] = predictor, batcher
+            MODEL_LOAD_LOCKS.pop(key, None)
+            num_evicted = max(0, len(MODEL_POOL) - app.config['MAX_RESIDENT_MODELS'])
+            evicted = [MODEL_POOL.popitem(last=False)[1] for _ in range(num_evicted)]
+
+    # Requests which already got an evicted batcher are still predicted (see PredictionBatcher.close)
+    for _, evicted_batcher in evicted:
+        evicted_batcher.close()
+
+    return predictor, batcher
+
+
+def remove_models(ckpt_id: int) -> None:
+    """
+    Removes the resident models of a checkpoint.
+
+    :param ckpt_id: The id of the checkpoint.
+    """
+    with MODEL_POOL_LOCK:
+        removed = [MODEL_POOL.pop(key) for key in list(MODEL_POOL) if key[0] == ckpt_id]
+
+    for _, batcher in removed:
+        batcher.close()
 
 
 @app.route('/')
@@ -178,6 +316,8 @@ def render_train(**kwargs):
                            gpus=app.config['GPUS'],
                            data_upload_warnings=data_upload_warnings,
                            data_upload_errors=data_upload_errors,
+                           jobs=[dict(job, stats=json.loads(job['stats']))
+                                 for job in db.get_training_jobs(request.cookies.get('currentUser'))],
                            users=db.get_all_users(),
                            **kwargs)
 
@@ -185,9 +325,7 @@ def render_train(**kwargs):
 @app.route('/train', methods=['GET', 'POST'])
 @check_not_demo
 def train():
-    """Renders the train page and performs training if request method is POST."""
-    global PROGRESS, TRAINING
-
+    """Renders the train page and queues a training job if request method is POST."""
     warnings, errors = [], []
 
     if request.method == 'GET':
@@ -200,18 +338,22 @@ def train():
     gpu = request.form.get('gpu')
     data_path = os.path.join(app.config['DATA_FOLDER'], f'{data_name}.csv')
     dataset_type = request.form.get('datasetType', 'regression')
-    use_progress_bar = request.form.get('useProgressBar', 'True') == 'True'
 
     # Create and modify args
-    args = TrainArgs().parse_args([
+    arguments = [
         '--data_path', data_path,
         '--dataset_type', dataset_type,
         '--epochs', str(epochs),
         '--ensemble_size', str(ensemble_size),
-    ])
+    ]
 
-    # Get task names
-    args.task_names = get_task_names(path=data_path, smiles_columns=args.smiles_columns)
+    if gpu is not None:
+        if gpu == 'None':
+            arguments.append('--no_cuda')
+        else:
+            arguments += ['--gpu', gpu]
+
+    args = TrainArgs().parse_args(arguments)
 
     # Check if regression/classification selection matches data
     data = get_data(path=data_path, smiles_columns=args.smiles_columns)
@@ -230,12 +372,6 @@ def train():
 
         return render_train(warnings=warnings, errors=errors)
 
-    if gpu is not None:
-        if gpu == 'None':
-            args.cuda = False
-        else:
-            args.gpu = int(gpu)
-
     current_user = request.cookies.get('currentUser')
 
     if not current_user:
@@ -249,45 +385,50 @@ def train():
                                         args.ensemble_size,
                                         len(targets))
 
-    with TemporaryDirectory() as temp_dir:
-        args.save_dir = temp_dir
+    # Check if name overlap
+    if checkpoint_name != ckpt_name:
+        warnings.append(name_already_exists_message('Checkpoint', checkpoint_name, ckpt_name))
+
+    # Train in a worker process, which records its progress in the database
+    get_job_queue().submit(ckpt_id, arguments)
+
+    return render_train(warnings=warnings, errors=errors)
 
-        if use_progress_bar:
-            process = mp.Process(target=progress_bar, args=(args, PROGRESS))
-            process.start()
-            TRAINING = 1
 
-        # Run training
-        logger = create_logger(name=TRAIN_LOGGER_NAME, save_dir=args.save_dir, quiet=args.quiet)
-        task_scores = run_training(args, data, logger)[args.metrics[0]]
+@app.route('/train/events/<int:checkpoint>')
+@check_not_demo
+def train_events(checkpoint: int):
+    """
+    Streams the progress of a training job as server-sent events until it completes or fails.
+
+    Each event is a JSON object with the :code:`status` and :code:`progress` of the job, the metrics of the
+    :code:`epochs` completed since the previous event and, once completed, the test scores of the checkpoint.
+
+    :param checkpoint: The id of the checkpoint trained by the job.
+    """
+    def events():
+        num_epochs, last_state = 0, None
+
+        while True:
+            ckpt = db.get_ckpt(checkpoint)
+            if ckpt is None:
+                yield f'data: {json.dumps({"status": "deleted"})}\n\n'
+                return
 
-        if use_progress_bar:
-            process.join()
+            stats = json.loads(ckpt['stats']) if ckpt['stats'] is not None else {'status': COMPLETED}
+            epochs = stats.pop('epochs', [])
+            state = (stats['status'], len(epochs))
 
-            # Reset globals
-            TRAINING = 0
-            PROGRESS = mp.Value('d', 0.0)
+            if state != last_state:
+                yield f'data: {json.dumps(dict(stats, epochs=epochs[num_epochs:]))}\n\n'
+                num_epochs, last_state = len(epochs), state
 
-        # Check if name overlap
-        if checkpoint_name != ckpt_name:
-            warnings.append(name_already_exists_message('Checkpoint', checkpoint_name, ckpt_name))
+            if stats['status'] in [COMPLETED, FAILED]:
+                return
 
-        # Move models
-        for root, _, files in os.walk(args.save_dir):
-            for fname in files:
-                if fname.endswith('.pt'):
-                    model_id = db.insert_model(ckpt_id)
-                    save_path = os.path.join(app.config['CHECKPOINT_FOLDER'], f'{model_id}.pt')
-                    shutil.move(os.path.join(args.save_dir, root, fname), save_path)
+            time.sleep(app.config['TRAINING_EVENTS_INTERVAL'])
 
-    return render_train(trained=True,
-                        metric=args.metric,
-                        num_tasks=len(args.task_names),
-                        task_names=args.task_names,
-                        task_scores=format_float_list(task_scores),
-                        mean_score=format_float(np.mean(task_scores)),
-                        warnings=warnings,
-                        errors=errors)
+    return Response(stream_with_context(events()), mimetype='text/event-stream', headers={'Cache-Control': 'no-cache'})
 
 
 def render_predict(**kwargs):
@@ -331,54 +472,34 @@ def predict():
         # Get remaining smiles
         smiles.extend(get_smiles(data_path))
 
-    smiles = [[s] for s in smiles]
+    if len(smiles) == 0:
+        return render_predict(errors=['No SMILES strings given'])
 
-    models = db.get_models(ckpt_id)
-    model_paths = [os.path.join(app.config['CHECKPOINT_FOLDER'], f'{model["id"]}.pt') for model in models]
-
-    task_names = load_task_names(model_paths[0])
-    num_tasks = len(task_names)
     gpu = request.form.get('gpu')
-    train_args = load_args(model_paths[0])
-
-    # Build arguments
-    arguments = [
-        '--test_path', 'None',
-        '--preds_path', os.path.join(app.config['TEMP_FOLDER'], app.config['PREDICTIONS_FILENAME']),
-        '--checkpoint_paths', *model_paths
-    ]
-
-    if gpu is not None:
-        if gpu == 'None':
-            arguments.append('--no_cuda')
-        else:
-            arguments += ['--gpu', gpu]
+    if not is_valid_gpu(gpu):
+        return render_predict(errors=[f'GPU "{gpu}" is not available'])
 
-    # Handle additional features
-    if train_args.features_path is not None:
-        # TODO: make it possible to specify the features generator if trained using features_path
-        arguments += [
-            '--features_generator', 'rdkit_2d_normalized',
-            '--no_features_scaling'
-        ]
-    elif train_args.features_generator is not None:
-        arguments += ['--features_generator', *train_args.features_generator]
-
-        if not train_args.features_scaling:
-            arguments.append('--no_features_scaling')
-
-    # Parse arguments
-    args = PredictArgs().parse_args(arguments)
+    predictor, batcher = get_model(int(ckpt_id), gpu)
+    task_names = predictor.task_names
 
     # Run predictions
-    preds = make_predictions(args=args, smiles=smiles, return_uncertainty=False)
+    preds = batcher.predict(smiles)
 
-    if all(p is None for p in preds):
+    invalid = [len(pred) > 0 and pred[0] == 'Invalid SMILES' for pred in preds]
+    if all(invalid):
         return render_predict(errors=['All SMILES are invalid'])
 
+    with open(os.path.join(app.config['TEMP_FOLDER'], app.config['PREDICTIONS_FILENAME']), 'w') as f:
+        writer = csv.writer(f)
+        writer.writerow(['smiles'] + task_names)
+        for s, pred in zip(smiles, preds):
+            writer.writerow([s] + list(pred))
+
     # Replace invalid smiles with message
     invalid_smiles_warning = 'Invalid SMILES String'
-    preds = [pred if pred is not None else [invalid_smiles_warning] * num_tasks for pred in preds]
+    preds = [pred if not is_invalid else [invalid_smiles_warning] * len(task_names)
+             for pred, is_invalid in zip(preds, invalid)]
+    smiles = [[s] for s in smiles]
 
     return render_predict(predicted=True,
                           smiles=smiles,
@@ -387,8 +508,59 @@ def predict():
                           task_names=task_names,
                           num_tasks=len(task_names),
                           preds=preds,
-                          warnings=["List contains invalid SMILES strings"] if None in preds else None,
-                          errors=["No SMILES strings given"] if len(preds) == 0 else None)
+                          warnings=["List contains invalid SMILES strings"] if any(invalid) else None)
+
+
+@app.route('/api/predict', methods=['POST'])
+@check_not_demo
+def api_predict():
+    """
+    Makes predictions on the SMILES of a JSON request with the resident models of a checkpoint.
+
+    The request contains the id of a :code:`checkpoint`, a list of :code:`smiles` and optionally a :code:`gpu`.
+    Concurrent requests are predicted together in batches.
+    """
+    content = request.get_json(silent=True)
+    if not isinstance(content, dict) or 'checkpoint' not in content or not isinstance(content.get('smiles'), list) \
+            or not all(isinstance(s, str) or (isinstance(s, list) and all(isinstance(x, str) for x in s))
+                       for s in content['smiles']):
+        return jsonify(error='The request must contain a checkpoint id and a list of smiles, '
+                             'each either a SMILES string or a list of SMILES strings'), 400
+
+    try:
+        ckpt_id = int(content['checkpoint'])
+    except (TypeError, ValueError):
+        return jsonify(error=f'Invalid checkpoint id "{content["checkpoint"]}"'), 400
+
+    gpu = str(content['gpu']) if content.get('gpu') is not None else None
+    if not is_valid_gpu(gpu):
+        return jsonify(error=f'GPU "{gpu}" is not available'), 400
+
+    # Checkpoints with stats are trained by a job, whose models are only complete once it has finished
+    ckpt = db.get_ckpt(ckpt_id)
+    if ckpt is None or (ckpt['stats'] is not None and not ckpt['completed']) or len(db.get_models(ckpt_id)) == 0:
+        return jsonify(error=f'Checkpoint {ckpt_id} does not exist or is still training'), 404
+
+    predictor, batcher = get_model(ckpt_id, gpu)
+
+    number_of_molecules = predictor.train_args.number_of_molecules
+    if any(len([s] if isinstance(s, str) else s) != number_of_molecules for s in content['smiles']):
+        return jsonify(error=f'Checkpoint {ckpt_id} takes {number_of_molecules} SMILES per datapoint'), 400
+
+    return jsonify(task_names=predictor.task_names, predictions=batcher.predict(content['smiles']))
+
+
+@app.route('/api/stats')
+@check_not_demo
+def api_stats():
+    """Returns the throughput and latency of the predictions of each resident checkpoint."""
+    with MODEL_POOL_LOCK:
+        models = list(MODEL_POOL.items())
+
+    return jsonify(stats=[
+        dict(checkpoint=ckpt_id, gpu=gpu, **batcher.stats())
+        for (ckpt_id, gpu), (_, batcher) in models
+    ])
 
 
 @app.route('/download_predictions')
@@ -597,4 +769,5 @@ def delete_checkpoint(checkpoint: int):
     :param checkpoint: The id of the checkpoint to delete.
     """
     db.delete_ckpt(checkpoint)
+    remove_models(checkpoint)
     return redirect(url_for('checkpoints'))
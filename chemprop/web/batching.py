@@ -0,0 +1,201 @@
+"""Coalesces concurrent prediction requests of the web app into batches."""
+
+from collections import deque
+import queue
+import threading
+import time
+from typing import Any, Callable, Dict, List
+
+import numpy as np
+
+
+class PredictionRequest:
+    """A :class:`PredictionRequest` holds the SMILES of a request until its predictions are made."""
+
+    def __init__(self, smiles: List[str]):
+        """
+        :param smiles: A list of SMILES.
+        """
+        self.smiles = smiles
+        self.preds = None
+        self.error = None
+        self.start_time = time.perf_counter()
+        self.done = threading.Event()
+
+
+class PredictionBatcher:
+    """
+    A :class:`PredictionBatcher` makes predictions for concurrent requests in batches.
+
+    Requests are queued and a worker thread coalesces the requests waiting in the queue into a batch of at most
+    :code:`max_batch_size` molecules, waiting at most :code:`max_wait` seconds after the first request of the batch
+    for more requests, and then makes the predictions of the whole batch with a single call. A request with more
+    than :code:`max_batch_size` molecules is predicted on its own.
+    """
+
+    def __init__(self,
+                 predict: Callable[[List[str]], List[List[Any]]],
+                 max_batch_size: int = 256,
+                 max_wait: float = 0.01,
+                 latency_window: int = 1000):
+        """
+        :param predict: A function which makes predictions on a list of SMILES, e.g.
+                        :meth:`~chemprop.train.Predictor.predict`.
+        :param max_batch_size: The maximum number of molecules in a batch.
+        :param max_wait: The maximum number of seconds to wait for more requests before predicting on a batch.
+        :param latency_window: The number of most recent requests whose latencies are reported by :meth:`stats`.
+        """
+        self.predict_function = predict
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+
+        self._queue = queue.Queue()
+        self._held_request = None
+        self._closed = False
+        self._close_lock = threading.Lock()
+        self._lock = threading.Lock()
+        self._latencies = deque(maxlen=latency_window)
+        self._start_time = time.perf_counter()
+        self._num_requests = self._num_molecules = self._num_batches = 0
+
+        self._worker = threading.Thread(target=self._run, daemon=True)
+        self._worker.start()
+
+    def predict(self, smiles: List[str]) -> List[List[Any]]:
+        """
+        Makes predictions on a list of SMILES, blocking until the batch containing them has been predicted.
+
+        :param smiles: A list of SMILES.
+        :return: The predictions of each SMILES.
+        """
+        if len(smiles) == 0:
+            return []
+
+        request = PredictionRequest(smiles)
+        with self._close_lock:
+            closed = self._closed
+            if not closed:
+                self._queue.put(request)
+
+        # Requests made after closing (e.g., while the models are evicted) are predicted on their own
+        if closed:
+            return self.predict_function(smiles)
+
+        request.done.wait()
+
+        if request.error is not None:
+            raise request.error
+
+        return request.preds
+
+    def close(self) -> None:
+        """
+        Stops the worker thread once the queued requests have been predicted.
+
+        Later requests are predicted directly without batching.
+        """
+        with self._close_lock:
+            if not self._closed:
+                self._closed = True
+                self._queue.put(None)
+
+        self._worker.join()
+
+    def _next_batch(self) -> List[PredictionRequest]:
+        """
+        Waits for a request and collects the requests which arrive within :code:`max_wait` seconds of it.
+
+        :return: A list of requests, or None if the batcher has been closed.
+        """
+        if self._held_request is not None:
+            request, self._held_request = self._held_request, None
+        else:
+            request = self._queue.get()
+        if request is None:
+            return None
+
+        batch, num_molecules = [request], len(request.smiles)
+        deadline = time.perf_counter() + self.max_wait
+        while num_molecules < self.max_batch_size:
+            try:
+                request = self._queue.get(timeout=max(0.0, deadline - time.perf_counter()))
+            except queue.Empty:
+                break
+
+            # Keep a request which does not fit (or the signal to stop) for the next batch
+            if request is None or num_molecules + len(request.smiles) > self.max_batch_size:
+                self._held_request = request
+                break
+
+            batch.append(request)
+            num_molecules += len(request.smiles)
+
+        return batch
+
+    def _predict_batch(self, batch: List[PredictionRequest]) -> None:
+        """
+        Makes the predictions of a batch of requests with a single call and records their latencies.
+
+        :param batch: A list of requests.
+        """
+        smiles = [s for request in batch for s in request.smiles]
+        preds = self.predict_function(smiles)
+
+        end_time, start = time.perf_counter(), 0
+        with self._lock:
+            for request in batch:
+                request.preds = preds[start:start + len(request.smiles)]
+                start += len(request.smiles)
+                self._latencies.append(end_time - request.start_time)
+            self._num_requests += len(batch)
+            self._num_molecules += len(smiles)
+            self._num_batches += 1
+
+    def _run(self) -> None:
+        """
+        Predicts on batches of requests until the batcher is closed.
+
+        If the predictions of a batch fail, its requests are predicted one at a time so that an error
+        (e.g., of a malformed request) is only raised by the request which caused it.
+        """
+        while True:
+            batch = self._next_batch()
+            if batch is None:
+                break
+
+            try:
+                self._predict_batch(batch)
+            except Exception as e:
+                if len(batch) == 1:
+                    batch[0].error = e
+                else:
+                    for request in batch:
+                        try:
+                            self._predict_batch([request])
+                        except Exception as request_error:
+                            request.error = request_error
+
+            for request in batch:
+                request.done.set()
+
+    def stats(self) -> Dict[str, float]:
+        """
+        Returns the throughput and latency of the predictions made so far.
+
+        :return: A dictionary with the number of requests, molecules and batches, the mean number of molecules
+                 per batch, the throughput in molecules per second since the batcher was created, the number of
+                 queued requests and the median (P50) and 99th percentile (P99) latency in milliseconds of the
+                 most recent requests.
+        """
+        with self._lock:
+            latencies = 1e3 * np.array(self._latencies)
+            return {
+                'requests': self._num_requests,
+                'molecules': self._num_molecules,
+                'batches': self._num_batches,
+                'molecules_per_batch': self._num_molecules / self._num_batches if self._num_batches > 0 else 0.0,
+                'molecules_per_second': self._num_molecules / (time.perf_counter() - self._start_time),
+                'queued_requests': self._queue.qsize(),
+                'latency_p50_ms': float(np.percentile(latencies, 50)) if len(latencies) > 0 else None,
+                'latency_p99_ms': float(np.percentile(latencies, 99)) if len(latencies) > 0 else None
+            }
@@ -13,3 +13,17 @@ PREDICTIONS_FILENAME = 'predictions.csv'
 DB_FILENAME = 'chemprop.sqlite3'
 CUDA = torch.cuda.is_available()
 GPUS = list(range(torch.cuda.device_count()))
+
+# Concurrent prediction requests are predicted together in batches of at most MAX_BATCH_SIZE molecules,
+# waiting at most MAX_BATCH_WAIT seconds for more requests
+MAX_BATCH_SIZE = 256
+MAX_BATCH_WAIT = 0.01
+
+# The models of at most MAX_RESIDENT_MODELS checkpoints (and devices) are kept in memory,
+# evicting the least recently used models first
+MAX_RESIDENT_MODELS = 8
+
+# Training jobs run in a pool of at most MAX_TRAINING_JOBS worker processes, and the progress of a job
+# is sent to the browser every TRAINING_EVENTS_INTERVAL seconds while it changes
+MAX_TRAINING_JOBS = 2
+TRAINING_EVENTS_INTERVAL = 0.5
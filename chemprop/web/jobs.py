@@ -0,0 +1,197 @@
+"""Runs the training jobs of the web app in a pool of worker processes."""
+
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import closing
+import json
+import multiprocessing as mp
+import os
+import shutil
+import sqlite3
+from tempfile import TemporaryDirectory
+import threading
+from typing import Any, Callable, Dict, List
+
+import numpy as np
+
+from chemprop.args import TrainArgs
+from chemprop.constants import TRAIN_LOGGER_NAME
+from chemprop.data import get_data, get_task_names
+from chemprop.train import run_training
+from chemprop.utils import create_logger
+
+
+# States of a training job, recorded in the stats of its checkpoint
+QUEUED = 'queued'
+RUNNING = 'running'
+COMPLETED = 'completed'
+FAILED = 'failed'
+
+
+def connect(db_path: str) -> sqlite3.Connection:
+    """
+    Connects to the database of the web app outside of a request, e.g. in a worker process.
+
+    :param db_path: Path to the database.
+    :return: A connection to the database.
+    """
+    connection = sqlite3.connect(db_path, timeout=60)
+    connection.row_factory = sqlite3.Row
+
+    return connection
+
+
+def update_job(db_path: str, ckpt_id: int, completed: bool = False, **stats: Any) -> bool:
+    """
+    Updates the state of a training job in the stats of its checkpoint.
+
+    :param db_path: Path to the database.
+    :param ckpt_id: The id of the checkpoint trained by the job.
+    :param completed: Whether the checkpoint is ready to make predictions.
+    :param stats: Values which replace those in the stats of the checkpoint.
+    :return: Whether the checkpoint still exists, i.e. it has not been deleted while training.
+    """
+    with closing(connect(db_path)) as connection, connection:
+        row = connection.execute('SELECT stats FROM ckpt WHERE id = ?', [ckpt_id]).fetchone()
+        if row is None:
+            return False
+
+        job_stats = json.loads(row['stats'] or '{}')
+        job_stats.update(stats)
+        connection.execute('UPDATE ckpt SET stats = ?, completed = ? WHERE id = ?',
+                           [json.dumps(job_stats), completed, ckpt_id])
+
+    return True
+
+
+def run_training_job(db_path: str, checkpoint_folder: str, ckpt_id: int, arguments: List[str]) -> None:
+    """
+    Trains the models of a checkpoint, recording the metrics of each epoch in the stats of the checkpoint.
+
+    :param db_path: Path to the database.
+    :param checkpoint_folder: The folder where the model files of the checkpoints are saved.
+    :param ckpt_id: The id of the checkpoint to train.
+    :param arguments: The command line arguments of :class:`~chemprop.args.TrainArgs`.
+    """
+    args = TrainArgs().parse_args(arguments)
+    args.task_names = get_task_names(path=args.data_path, smiles_columns=args.smiles_columns)
+    data = get_data(path=args.data_path, smiles_columns=args.smiles_columns)
+
+    if not update_job(db_path, ckpt_id, status=RUNNING, progress=0.0, epochs=[]):
+        return
+
+    epochs = []
+
+    def record_epoch(epoch: Dict[str, float]) -> None:
+        # Scores which are not finite (e.g., undefined on a single class) are recorded as null in JSON
+        epochs.append({key: value if value is None or np.isfinite(value) else None for key, value in epoch.items()})
+        update_job(db_path, ckpt_id, epochs=epochs,
+                   progress=100 * len(epochs) / (args.epochs * args.ensemble_size))
+
+    with TemporaryDirectory() as temp_dir:
+        args.save_dir = temp_dir
+        logger = create_logger(name=TRAIN_LOGGER_NAME, save_dir=args.save_dir, quiet=True)
+        task_scores = run_training(args, data, logger, epoch_callback=record_epoch)[args.metrics[0]]
+
+        with closing(connect(db_path)) as connection, connection:
+            if connection.execute('SELECT id FROM ckpt WHERE id = ?', [ckpt_id]).fetchone() is None:
+                return
+
+            for root, _, files in os.walk(args.save_dir):
+                for fname in files:
+                    if fname.endswith('.pt'):
+                        model_id = connection.execute('INSERT INTO model (associated_ckpt) VALUES (?)',
+                                                      [ckpt_id]).lastrowid
+                        shutil.move(os.path.join(root, fname), os.path.join(checkpoint_folder, f'{model_id}.pt'))
+
+    update_job(db_path, ckpt_id, completed=True, status=COMPLETED, progress=100.0, metric=args.metric,
+               task_names=args.task_names,
+               task_scores=[float(score) if np.isfinite(score) else None for score in task_scores],
+               mean_score=float(np.nanmean(task_scores)) if np.any(np.isfinite(task_scores)) else None)
+
+
+class TrainingJobQueue:
+    """
+    A :class:`TrainingJobQueue` runs training jobs in a bounded pool of worker processes.
+
+    Jobs wait in a queue until a worker is free, so that the jobs of several users train concurrently up to the
+    number of workers. The state and the metrics of each epoch of a job are recorded as JSON in the :code:`stats`
+    of its checkpoint in the database, and the checkpoint is marked :code:`completed` once its models are saved.
+
+    If a worker process dies (e.g., when it is killed for running out of memory), the pool cannot run any more
+    jobs. The jobs of the pool are then recorded as failed and the next job starts a new pool.
+    """
+
+    def __init__(self,
+                 db_path: str,
+                 checkpoint_folder: str,
+                 max_workers: int = 2,
+                 run_job: Callable[[str, str, int, List[str]], None] = run_training_job):
+        """
+        :param db_path: Path to the database.
+        :param checkpoint_folder: The folder where the model files of the checkpoints are saved.
+        :param max_workers: The maximum number of jobs which train at the same time.
+        :param run_job: The function which runs a job in a worker process (see :func:`run_training_job`).
+        """
+        self.db_path = db_path
+        self.checkpoint_folder = checkpoint_folder
+        self.max_workers = max_workers
+        self.run_job = run_job
+
+        self._executor = self._build_executor()
+        self._futures = {}
+        self._lock = threading.Lock()
+
+    def _build_executor(self) -> ProcessPoolExecutor:
+        """Starts a pool of worker processes."""
+        # Workers are spawned rather than forked from the threads of the web server
+        return ProcessPoolExecutor(max_workers=self.max_workers, mp_context=mp.get_context('spawn'))
+
+    def submit(self, ckpt_id: int, arguments: List[str]) -> None:
+        """
+        Queues a training job.
+
+        :param ckpt_id: The id of the checkpoint to train, which must already be in the database.
+        :param arguments: The command line arguments of :class:`~chemprop.args.TrainArgs`.
+        """
+        update_job(self.db_path, ckpt_id, status=QUEUED, progress=0.0, epochs=[])
+
+        orphaned_ckpt_ids = []
+        with self._lock:
+            try:
+                future = self._executor.submit(self.run_job, self.db_path, self.checkpoint_folder, ckpt_id, arguments)
+            except BrokenProcessPool:
+                # A worker died, so the jobs of the pool will not finish and it must be replaced
+                orphaned_ckpt_ids = list(self._futures)
+                self._futures.clear()
+                self._executor.shutdown(wait=False)
+                self._executor = self._build_executor()
+                future = self._executor.submit(self.run_job, self.db_path, self.checkpoint_folder, ckpt_id, arguments)
+            self._futures[ckpt_id] = future
+
+        for orphaned_ckpt_id in orphaned_ckpt_ids:
+            update_job(self.db_path, orphaned_ckpt_id, status=FAILED, error='The training worker process died')
+        future.add_done_callback(lambda f: self._finish(ckpt_id, f))
+
+    def _finish(self, ckpt_id: int, future: Future) -> None:
+        """
+        Records the error of a job which failed.
+
+        :param ckpt_id: The id of the checkpoint trained by the job.
+        :param future: The future of the job.
+        """
+        with self._lock:
+            if self._futures.get(ckpt_id) is future:
+                del self._futures[ckpt_id]
+
+        if future.exception() is not None:
+            update_job(self.db_path, ckpt_id, status=FAILED, error=str(future.exception()))
+
+    def num_active_jobs(self) -> int:
+        """Returns the number of queued and running jobs."""
+        with self._lock:
+            return len(self._futures)
+
+    def shutdown(self) -> None:
+        """Waits for the jobs to finish and stops the worker processes."""
+        self._executor.shutdown(wait=True)
@@ -18,10 +18,18 @@ class WebArgs(Tap):
     demo: bool = False  # Display only demo features
     initdb: bool = False  # Initialize Database
     root_folder: str = None  # Root folder where web data and checkpoints will be saved (defaults to chemprop/web/app)
+    max_batch_size: int = 256  # Maximum number of molecules in a batch of concurrent prediction requests
+    max_batch_wait: float = 0.01  # Maximum number of seconds to wait for concurrent prediction requests to batch
+    max_resident_models: int = 8  # Maximum number of checkpoints whose models are kept in memory for predictions
+    max_training_jobs: int = 2  # Maximum number of training jobs which run at the same time
 
 
 def run_web(args: WebArgs) -> None:
     app.config['DEMO'] = args.demo
+    app.config['MAX_BATCH_SIZE'] = args.max_batch_size
+    app.config['MAX_BATCH_WAIT'] = args.max_batch_wait
+    app.config['MAX_RESIDENT_MODELS'] = args.max_resident_models
+    app.config['MAX_TRAINING_JOBS'] = args.max_training_jobs
 
     # Set up root folder and subfolders
     set_root_folder(
@@ -38,7 +46,7 @@ def run_web(args: WebArgs) -> None:
             db.init_db()
             print("-- INITIALIZED DATABASE --")
 
-    app.run(host=args.host, port=args.port, debug=args.debug)
+    app.run(host=args.host, port=args.port, debug=args.debug, threaded=True)
 
 
 def chemprop_web() -> None:
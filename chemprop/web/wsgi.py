@@ -22,5 +22,9 @@ def build_app(*args, **kwargs):
             print("-- INITIALIZED DATABASE --")
 
     app.config['DEMO'] = kwargs.get('demo', False)
+    app.config['MAX_BATCH_SIZE'] = kwargs.get('max_batch_size', app.config['MAX_BATCH_SIZE'])
+    app.config['MAX_BATCH_WAIT'] = kwargs.get('max_batch_wait', app.config['MAX_BATCH_WAIT'])
+    app.config['MAX_RESIDENT_MODELS'] = kwargs.get('max_resident_models', app.config['MAX_RESIDENT_MODELS'])
+    app.config['MAX_TRAINING_JOBS'] = kwargs.get('max_training_jobs', app.config['MAX_TRAINING_JOBS'])
 
     return app
@@ -0,0 +1,102 @@
+"""Benchmarks training batches of a fixed number of molecules against size-bucketed batches under an atom budget."""
+
+import os
+import sys
+import time
+from typing import Dict
+
+import torch
+from tap import Tap  # pip install typed-argument-parser (https://github.com/swansonk14/typed-argument-parser)
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+
+from chemprop.args import TrainArgs
+from chemprop.data import get_data, MoleculeDataLoader
+from chemprop.features import get_atom_fdim, get_bond_fdim
+from chemprop.models.mpn import MPNEncoder
+
+
+class Args(Tap):
+    data_path: str = os.path.join(os.path.dirname(os.path.dirname(os.path.realpath(__file__))),
+                                  'tests', 'data', 'regression.csv')  # Path to a CSV file with SMILES
+    smiles_column: str = None  # Name of the column containing SMILES strings. By default, uses the first column.
+    max_data_size: int = None  # Maximum number of molecules to load
+    batch_size: int = 50  # Number of molecules per batch with fixed-size batching
+    batch_max_atoms: int = None  # Atom budget of the bucketed batches. By default, the mean atoms of a fixed-size batch.
+    hidden_size: int = 300  # Hidden size of the message passing encoder
+    num_epochs: int = 2  # Number of epochs to time (the fastest epoch is reported)
+    seed: int = 0  # Random seed used to shuffle the data
+
+
+def batch_bytes(batch) -> int:
+    """Returns the number of bytes of the tensors of the :class:`~chemprop.features.BatchMolGraph` of a batch."""
+    return sum(tensor.element_size() * tensor.nelement() for tensor in batch.batch_graph()[0].get_components()[:5])
+
+
+def benchmark_loader(data_loader: MoleculeDataLoader, encoder: MPNEncoder, num_epochs: int) -> Dict[str, float]:
+    """
+    Times epochs of forward and backward passes of a message passing encoder over the batches of a data loader.
+
+    :param data_loader: A :class:`~chemprop.data.MoleculeDataLoader`.
+    :param encoder: A message passing encoder.
+    :param num_epochs: Number of epochs to time.
+    :return: A dictionary with the number of batches, the throughput in molecules per second, the largest batch
+             graph and the largest padded :code:`a2b` in bytes.
+    """
+    times, max_bytes, max_a2b_bytes, num_batches = [], 0, 0, 0
+    for _ in range(num_epochs):
+        start, num_batches = time.perf_counter(), 0
+        for batch in data_loader:
+            mol_graph = batch.batch_graph()[0]
+            encoder(mol_graph).sum().backward()
+            max_bytes = max(max_bytes, batch_bytes(batch))
+            max_a2b_bytes = max(max_a2b_bytes, mol_graph.a2b.element_size() * mol_graph.a2b.nelement())
+            num_batches += 1
+        times.append(time.perf_counter() - start)
+
+    return {
+        'batches': num_batches,
+        'molecules/s': data_loader.iter_size / min(times),
+        'max batch graph (MB)': max_bytes / 1e6,
+        'max a2b (MB)': max_a2b_bytes / 1e6
+    }
+
+
+def benchmark_batching(args: Args) -> None:
+    """
+    Reports the throughput and largest batch of fixed-size and size-bucketed batching.
+
+    :param args: Arguments.
+    """
+    data = get_data(path=args.data_path, smiles_columns=args.smiles_column, target_columns=[],
+                    max_data_size=args.max_data_size)
+    data.batch_graph()  # Caches the graphs so that featurization is not timed
+
+    batch_max_atoms = args.batch_max_atoms
+    if batch_max_atoms is None:
+        batch_max_atoms = round(args.batch_size * sum(d.mol[0].GetNumAtoms() for d in data) / len(data))
+    print(f'{len(data):,} molecules, {args.batch_size} molecules per fixed-size batch, '
+          f'{batch_max_atoms:,} atoms per bucketed batch')
+
+    train_args = TrainArgs().parse_args(['--data_path', args.data_path, '--dataset_type', 'regression',
+                                         '--hidden_size', str(args.hidden_size)])
+    train_args.device = torch.device('cpu')
+    torch.manual_seed(args.seed)
+    encoder = MPNEncoder(train_args, get_atom_fdim(), get_bond_fdim())
+
+    loaders = {
+        'fixed': MoleculeDataLoader(dataset=data, batch_size=args.batch_size, num_workers=0, shuffle=True,
+                                    seed=args.seed),
+        'bucketed': MoleculeDataLoader(dataset=data, num_workers=0, shuffle=True, seed=args.seed,
+                                       max_batch_atoms=batch_max_atoms)
+    }
+    results = {name: benchmark_loader(loader, encoder, args.num_epochs) for name, loader in loaders.items()}
+
+    print(f'{"":>10}' + ''.join(f'{column:>22}' for column in results['fixed']))
+    for name, result in results.items():
+        print(f'{name:>10}' + ''.join(f'{value:>22,}' if isinstance(value, int) else f'{value:>22,.2f}'
+                                      for value in result.values()))
+
+
+if __name__ == '__main__':
+    benchmark_batching(Args().parse_args())
@@ -0,0 +1,112 @@
+"""Benchmarks the collation of MolGraphs into a BatchMolGraph for batches of increasing size."""
+
+import os
+import sys
+import time
+from typing import List
+
+import numpy as np
+import torch
+from tap import Tap  # pip install typed-argument-parser (https://github.com/swansonk14/typed-argument-parser)
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+
+from chemprop.data import get_smiles
+from chemprop.features import BatchMolGraph, get_atom_fdim, get_bond_fdim, MolGraph
+
+
+class Args(Tap):
+    data_path: str = os.path.join(os.path.dirname(os.path.dirname(os.path.realpath(__file__))),
+                                  'tests', 'data', 'regression.csv')  # Path to a CSV file with SMILES
+    smiles_column: str = None  # Name of the column containing SMILES strings. By default, uses the first column.
+    batch_sizes: List[int] = [50, 500, 5000]  # Numbers of molecules per batch
+    num_repeats: int = 5  # Number of times to repeat each timing (the fastest run is reported)
+    seed: int = 0  # Random seed used to sample the molecules of each batch
+
+
+def collate_lists(mol_graphs: List[MolGraph]) -> List[torch.Tensor]:
+    """
+    Collates MolGraphs by extending Python lists per molecule, as BatchMolGraph used to.
+
+    :param mol_graphs: A list of MolGraphs.
+    :return: A list of the atom features, bond features, a2b, b2a and b2revb tensors.
+    """
+    n_atoms, n_bonds = 1, 1
+    f_atoms = [[0] * get_atom_fdim()]
+    f_bonds = [[0] * get_bond_fdim()]
+    a2b, b2a, b2revb = [[]], [0], [0]
+    for mol_graph in mol_graphs:
+        f_atoms.extend(mol_graph.f_atoms.tolist())
+        f_bonds.extend(mol_graph.f_bonds.tolist())
+
+        for in_bonds in mol_graph.a2b:
+            a2b.append([b + n_bonds for b in in_bonds])
+
+        for b in range(mol_graph.n_bonds):
+            b2a.append(n_atoms + int(mol_graph.b2a[b]))
+            b2revb.append(n_bonds + int(mol_graph.b2revb[b]))
+
+        n_atoms += mol_graph.n_atoms
+        n_bonds += mol_graph.n_bonds
+
+    max_num_bonds = max(1, max(len(in_bonds) for in_bonds in a2b))
+
+    return [torch.FloatTensor(f_atoms), torch.FloatTensor(f_bonds),
+            torch.LongTensor([in_bonds + [0] * (max_num_bonds - len(in_bonds)) for in_bonds in a2b]),
+            torch.LongTensor(b2a), torch.LongTensor(b2revb)]
+
+
+def collate_arrays(mol_graphs: List[MolGraph]) -> List[torch.Tensor]:
+    """
+    Collates MolGraphs with BatchMolGraph.
+
+    :param mol_graphs: A list of MolGraphs.
+    :return: A list of the atom features, bond features, a2b, b2a and b2revb tensors.
+    """
+    return list(BatchMolGraph(mol_graphs).get_components()[:5])
+
+
+def time_collation(collate, mol_graphs: List[MolGraph], num_repeats: int) -> float:
+    """
+    Times the collation of a batch of MolGraphs.
+
+    :param collate: A function collating a list of MolGraphs.
+    :param mol_graphs: A list of MolGraphs.
+    :param num_repeats: Number of times to repeat the timing.
+    :return: The fastest time in seconds.
+    """
+    times = []
+    for _ in range(num_repeats):
+        start = time.perf_counter()
+        collate(mol_graphs)
+        times.append(time.perf_counter() - start)
+
+    return min(times)
+
+
+def benchmark_collation(args: Args) -> None:
+    """
+    Reports the time to collate batches of MolGraphs with Python lists and with vectorized NumPy.
+
+    :param args: Arguments.
+    """
+    smiles = get_smiles(path=args.data_path, smiles_columns=args.smiles_column, flatten=True)
+    mol_graphs = [MolGraph(s) for s in dict.fromkeys(smiles)]
+    rng = np.random.default_rng(args.seed)
+
+    print(f'{"molecules":>9} {"atoms":>7} {"bonds":>7} {"lists (ms)":>11} {"arrays (ms)":>12} {"speedup":>8}')
+    for batch_size in args.batch_sizes:
+        batch = [mol_graphs[i] for i in rng.choice(len(mol_graphs), size=batch_size)]
+
+        for expected, tensor in zip(collate_lists(batch), collate_arrays(batch)):
+            assert torch.equal(expected, tensor)
+
+        lists_time = time_collation(collate_lists, batch, args.num_repeats)
+        arrays_time = time_collation(collate_arrays, batch, args.num_repeats)
+
+        print(f'{batch_size:>9} {sum(g.n_atoms for g in batch):>7} {sum(g.n_bonds for g in batch):>7} '
+              f'{1e3 * lists_time:>11.2f} {1e3 * arrays_time:>12.2f} {lists_time / arrays_time:>7.1f}x')
+
+
+if __name__ == '__main__':
+    benchmark_collation(Args().parse_args())
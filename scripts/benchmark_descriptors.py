@@ -0,0 +1,98 @@
+"""Benchmarks computing RDKit 2D descriptors one molecule at a time against the batch features generators."""
+
+import os
+import sys
+import time
+from typing import Callable, List
+
+import numpy as np
+from rdkit import Chem
+from tap import Tap  # pip install typed-argument-parser (https://github.com/swansonk14/typed-argument-parser)
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+
+from chemprop.data import get_smiles
+from chemprop.features import get_batch_features_generator, get_features_generator
+
+
+class Args(Tap):
+    data_path: str  # Path to data CSV
+    smiles_column: str = None  # Name of the column containing SMILES strings. By default, uses the first column.
+    features_generator: str = 'rdkit_2d_normalized'  # Descriptors to compute (rdkit_2d or rdkit_2d_normalized)
+    max_data_size: int = 1000  # Maximum number of molecules to featurize
+    chunk_size: int = 1000  # Number of molecules passed to the batch features generator at once
+    num_repeats: int = 3  # Number of times to repeat each timing (the fastest run is reported)
+
+    def configure(self) -> None:
+        self.add_argument('--features_generator', choices=['rdkit_2d', 'rdkit_2d_normalized'])
+
+
+def featurize_smiles(features_generator: str, mols: List[Chem.Mol]) -> None:
+    """Computes descriptors with a new descriptastorus generator for each molecule, which parses its SMILES."""
+    from descriptastorus.descriptors import rdDescriptors, rdNormalizedDescriptors
+
+    generator_class = rdDescriptors.RDKit2D if features_generator == 'rdkit_2d' \
+        else rdNormalizedDescriptors.RDKit2DNormalized
+    for mol in mols:
+        generator_class().process(Chem.MolToSmiles(mol, isomericSmiles=True))[1:]
+
+
+def featurize_mols(features_generator: str, mols: List[Chem.Mol]) -> None:
+    """Computes descriptors one molecule at a time with the registered features generator."""
+    features_generator = get_features_generator(features_generator)
+    for mol in mols:
+        features_generator(mol)
+
+
+def featurize_batches(features_generator: str, mols: List[Chem.Mol], chunk_size: int) -> None:
+    """Computes descriptors a chunk of molecules at a time with the batch features generator."""
+    batch_features_generator = get_batch_features_generator(features_generator)
+    for i in range(0, len(mols), chunk_size):
+        batch_features_generator(mols[i:i + chunk_size])
+
+
+def time_featurization(featurize: Callable[[], None], num_repeats: int) -> float:
+    """
+    Times a featurization function.
+
+    :param featurize: A function which featurizes the molecules.
+    :param num_repeats: Number of times to repeat the timing.
+    :return: The fastest time in seconds.
+    """
+    times = []
+    for _ in range(num_repeats):
+        start = time.perf_counter()
+        featurize()
+        times.append(time.perf_counter() - start)
+
+    return min(times)
+
+
+def benchmark_descriptors(args: Args) -> None:
+    """
+    Reports the descriptor computation time per molecule of each method.
+
+    :param args: Arguments.
+    """
+    smiles = get_smiles(path=args.data_path, smiles_columns=args.smiles_column, flatten=True)
+    mols = [Chem.MolFromSmiles(s) for s in smiles[:args.max_data_size]]
+    mols = [mol for mol in mols if mol is not None and mol.GetNumHeavyAtoms() > 0]
+    print(f'Computing {args.features_generator} descriptors of {len(mols):,} molecules')
+
+    features = np.array([get_features_generator(args.features_generator)(mol) for mol in mols], dtype=np.float64)
+    batch_features = get_batch_features_generator(args.features_generator)(mols)
+    print(f'Batch features match: {np.array_equal(features, batch_features, equal_nan=True)}')
+
+    smiles_time = time_featurization(lambda: featurize_smiles(args.features_generator, mols), args.num_repeats)
+    mol_time = time_featurization(lambda: featurize_mols(args.features_generator, mols), args.num_repeats)
+    batch_time = time_featurization(lambda: featurize_batches(args.features_generator, mols, args.chunk_size),
+                                    args.num_repeats)
+
+    print(f'SMILES round trip: {1e3 * smiles_time / len(mols):.2f} ms/molecule')
+    print(f'Molecules:         {1e3 * mol_time / len(mols):.2f} ms/molecule')
+    print(f'Batches:           {1e3 * batch_time / len(mols):.2f} ms/molecule')
+    print(f'Speedup: {smiles_time / batch_time:.2f}x')
+
+
+if __name__ == '__main__':
+    benchmark_descriptors(Args().parse_args())
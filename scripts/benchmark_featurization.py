@@ -0,0 +1,78 @@
+"""Benchmarks per-atom list featurization against the vectorized array featurization used by MolGraph."""
+
+import os
+import sys
+import time
+from typing import Callable, List
+
+import numpy as np
+from rdkit import Chem
+from tap import Tap  # pip install typed-argument-parser (https://github.com/swansonk14/typed-argument-parser)
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+
+from chemprop.data import get_smiles
+from chemprop.features import atom_features, atom_features_array, bond_features, bond_features_array
+
+
+class Args(Tap):
+    data_path: str  # Path to data CSV
+    smiles_column: str = None  # Name of the column containing SMILES strings. By default, uses the first column.
+    max_data_size: int = 10000  # Maximum number of molecules to featurize
+    num_repeats: int = 3  # Number of times to repeat each timing (the fastest run is reported)
+
+
+def featurize_lists(mols: List[Chem.Mol]) -> None:
+    """Featurizes the atoms and bonds of each molecule as lists and converts them to float32 arrays."""
+    for mol in mols:
+        np.array([atom_features(atom) for atom in mol.GetAtoms()], dtype=np.float32)
+        np.array([bond_features(bond) for bond in mol.GetBonds()], dtype=np.float32)
+
+
+def featurize_arrays(mols: List[Chem.Mol]) -> None:
+    """Featurizes the atoms and bonds of each molecule directly into float32 arrays."""
+    for mol in mols:
+        atom_features_array(list(mol.GetAtoms()))
+        bond_features_array(list(mol.GetBonds()))
+
+
+def time_featurization(featurize: Callable[[List[Chem.Mol]], None], mols: List[Chem.Mol], num_repeats: int) -> float:
+    """
+    Times a featurization function.
+
+    :param featurize: A function which featurizes a list of molecules.
+    :param mols: A list of RDKit molecules.
+    :param num_repeats: Number of times to repeat the timing.
+    :return: The fastest time in seconds.
+    """
+    times = []
+    for _ in range(num_repeats):
+        start = time.perf_counter()
+        featurize(mols)
+        times.append(time.perf_counter() - start)
+
+    return min(times)
+
+
+def benchmark_featurization(args: Args) -> None:
+    """
+    Reports the featurization time per molecule of both featurization methods.
+
+    :param args: Arguments.
+    """
+    smiles = get_smiles(path=args.data_path, smiles_columns=args.smiles_column, flatten=True)
+    mols = [Chem.MolFromSmiles(s) for s in smiles[:args.max_data_size]]
+    mols = [mol for mol in mols if mol is not None]
+    num_atoms = sum(mol.GetNumAtoms() for mol in mols)
+    print(f'Featurizing {len(mols):,} molecules with {num_atoms / len(mols):.1f} atoms on average')
+
+    list_time = time_featurization(featurize_lists, mols, args.num_repeats)
+    array_time = time_featurization(featurize_arrays, mols, args.num_repeats)
+
+    print(f'Lists:  {1e6 * list_time / len(mols):.1f} us/molecule')
+    print(f'Arrays: {1e6 * array_time / len(mols):.1f} us/molecule')
+    print(f'Speedup: {list_time / array_time:.2f}x')
+
+
+if __name__ == '__main__':
+    benchmark_featurization(Args().parse_args())
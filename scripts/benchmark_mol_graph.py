@@ -0,0 +1,85 @@
+"""Benchmarks how MolGraph construction scales with molecule size."""
+
+import os
+import sys
+import time
+from typing import Callable, List, Tuple
+
+from rdkit import Chem
+from tap import Tap  # pip install typed-argument-parser (https://github.com/swansonk14/typed-argument-parser)
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+
+from chemprop.features import MolGraph
+
+
+class Args(Tap):
+    num_residues: List[int] = [1, 5, 10, 25, 50, 100]  # Numbers of glycine residues of the peptides to featurize
+    adding_h: bool = False  # Whether to add explicit hydrogens to the peptides
+    num_repeats: int = 5  # Number of times to repeat each timing (the fastest run is reported)
+
+
+def polyglycine(num_residues: int) -> str:
+    """
+    Builds the SMILES of a polyglycine peptide.
+
+    :param num_residues: The number of glycine residues.
+    :return: The SMILES of the peptide.
+    """
+    return 'NCC(=O)' * num_residues + 'O'
+
+
+def find_bonds_all_pairs(mol: Chem.Mol) -> List[Tuple[int, int]]:
+    """Finds the bonded pairs of atoms by checking every pair of atoms."""
+    num_atoms = mol.GetNumAtoms()
+    return [(a1, a2) for a1 in range(num_atoms) for a2 in range(a1 + 1, num_atoms)
+            if mol.GetBondBetweenAtoms(a1, a2) is not None]
+
+
+def find_bonds_iteration(mol: Chem.Mol) -> List[Tuple[int, int]]:
+    """Finds the bonded pairs of atoms by iterating over the bonds."""
+    return sorted(tuple(sorted((bond.GetBeginAtomIdx(), bond.GetEndAtomIdx()))) for bond in mol.GetBonds())
+
+
+def time_function(function: Callable[[Chem.Mol], object], mol: Chem.Mol, num_repeats: int) -> float:
+    """
+    Times a function applied to a molecule.
+
+    :param function: A function taking an RDKit molecule.
+    :param mol: An RDKit molecule.
+    :param num_repeats: Number of times to repeat the timing.
+    :return: The fastest time in seconds.
+    """
+    times = []
+    for _ in range(num_repeats):
+        start = time.perf_counter()
+        function(mol)
+        times.append(time.perf_counter() - start)
+
+    return min(times)
+
+
+def benchmark_mol_graph(args: Args) -> None:
+    """
+    Reports bond discovery and MolGraph construction times for peptides of increasing size.
+
+    :param args: Arguments.
+    """
+    print(f'{"atoms":>6} {"bonds":>6} {"all pairs (ms)":>15} {"iteration (ms)":>15} {"MolGraph (ms)":>14}')
+    for num_residues in args.num_residues:
+        mol = Chem.MolFromSmiles(polyglycine(num_residues))
+        if args.adding_h:
+            mol = Chem.AddHs(mol)
+
+        assert find_bonds_all_pairs(mol) == find_bonds_iteration(mol)
+
+        all_pairs_time = time_function(find_bonds_all_pairs, mol, args.num_repeats)
+        iteration_time = time_function(find_bonds_iteration, mol, args.num_repeats)
+        mol_graph_time = time_function(MolGraph, mol, args.num_repeats)
+
+        print(f'{mol.GetNumAtoms():>6} {mol.GetNumBonds():>6} {1e3 * all_pairs_time:>15.3f} '
+              f'{1e3 * iteration_time:>15.3f} {1e3 * mol_graph_time:>14.3f}')
+
+
+if __name__ == '__main__':
+    benchmark_mol_graph(Args().parse_args())
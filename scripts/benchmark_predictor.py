@@ -0,0 +1,84 @@
+"""Benchmarks the latency of small prediction requests with make_predictions against a warm Predictor."""
+
+from contextlib import redirect_stdout
+import os
+import sys
+import time
+from typing import Callable, List
+
+import numpy as np
+from tap import Tap  # pip install typed-argument-parser (https://github.com/swansonk14/typed-argument-parser)
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+
+from chemprop.args import PredictArgs
+from chemprop.data import get_smiles
+from chemprop.train import make_predictions, Predictor
+
+
+class Args(Tap):
+    data_path: str  # Path to a CSV file with SMILES to sample requests from
+    checkpoint_dir: str  # Directory from which to load model checkpoints (walks directory and ensembles all models)
+    smiles_column: str = None  # Name of the column containing SMILES strings. By default, uses the first column.
+    features_generator: List[str] = None  # Features generators the models were trained with
+    request_sizes: List[int] = [1, 10, 100]  # Number of molecules in each request
+    num_requests: int = 100  # Number of requests to time for each request size
+    seed: int = 0  # Random seed used to sample the molecules of each request
+
+
+def time_requests(predict: Callable[[List[str]], None], requests: List[List[str]]) -> List[float]:
+    """
+    Times prediction requests one after another.
+
+    :param predict: A function which makes predictions on a list of SMILES.
+    :param requests: A list of requests, each a list of SMILES.
+    :return: The latency of each request in seconds.
+    """
+    predict(requests[0])  # Warm up
+
+    latencies = []
+    for smiles in requests:
+        start = time.perf_counter()
+        predict(smiles)
+        latencies.append(time.perf_counter() - start)
+
+    return latencies
+
+
+def benchmark_predictor(args: Args) -> None:
+    """
+    Reports the P50 and P99 latency of requests of each size.
+
+    :param args: Arguments.
+    """
+    predict_args = ['--test_path', args.data_path, '--preds_path', os.devnull, '--checkpoint_dir', args.checkpoint_dir,
+                    '--num_workers', '0']
+    if args.features_generator is not None:
+        predict_args += ['--features_generator', *args.features_generator]
+
+    with open(os.devnull, 'w') as devnull, redirect_stdout(devnull):
+        predictor = Predictor(PredictArgs().parse_args(predict_args))
+    model_objects = (predictor.args, predictor.train_args, predictor.models, predictor.scalers,
+                     predictor.num_tasks, predictor.task_names)
+
+    def predict_with_make_predictions(smiles: List[str]) -> None:
+        with open(os.devnull, 'w') as devnull, redirect_stdout(devnull):
+            make_predictions(args=predictor.args, smiles=[[s] for s in smiles], model_objects=model_objects,
+                             calibrator=predictor.calibrator)
+
+    smiles = get_smiles(path=args.data_path, smiles_columns=args.smiles_column, flatten=True)
+    rng = np.random.default_rng(args.seed)
+    print(f'{len(predictor.models)} models, {args.num_requests} requests per size')
+    print(f'{"molecules":>10}{"method":>18}{"P50 (ms)":>12}{"P99 (ms)":>12}')
+
+    for request_size in args.request_sizes:
+        requests = [list(rng.choice(smiles, size=request_size)) for _ in range(args.num_requests)]
+        for method, predict in [('make_predictions', predict_with_make_predictions),
+                                ('Predictor', predictor.predict)]:
+            latencies = 1e3 * np.array(time_requests(predict, requests))
+            print(f'{request_size:>10}{method:>18}{np.percentile(latencies, 50):>12.2f}'
+                  f'{np.percentile(latencies, 99):>12.2f}')
+
+
+if __name__ == '__main__':
+    benchmark_predictor(Args().parse_args())
@@ -1,17 +1,20 @@
 """Computes and saves molecular features for a dataset."""
 
+from functools import partial
+from itertools import chain
 from multiprocessing import Pool
 import os
 import shutil
 import sys
 from typing import List, Tuple
 
+import numpy as np
 from tqdm import tqdm
 from tap import Tap  # pip install typed-argument-parser (https://github.com/swansonk14/typed-argument-parser)
 
 sys.path.append(os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
 
-from chemprop.data import get_smiles
+from chemprop.data import FeaturesCache, get_smiles
 from chemprop.features import get_available_features_generators, get_features_generator, load_features, save_features
 from chemprop.utils import makedirs
 
@@ -24,6 +27,7 @@ class Args(Tap):
     save_frequency: int = 10000  # Frequency with which to save the features
     restart: bool = False  # Whether to not load partially complete featurization and instead start from scratch
     sequential: bool = False  # Whether to run sequentially rather than in parallel
+    features_cache_path: str = None  # Directory of a features cache to reuse stored features from and add new ones to
 
     def configure(self) -> None:
         self.add_argument('--features_generator', choices=get_available_features_generators())
@@ -51,6 +55,24 @@ def load_temp(temp_dir: str) -> Tuple[List[List[float]], int]:
     return features, temp_num
 
 
+def generate_cached_features(features_cache: FeaturesCache,
+                             features_generator: str,
+                             smiles: List[str]) -> List[np.ndarray]:
+    """
+    Loads the features of molecules from a features cache, computing and storing the missing ones.
+
+    :param features_cache: The features cache.
+    :param features_generator: The name of the features generator.
+    :param smiles: A list of SMILES strings.
+    :return: A list of the features of each molecule.
+    """
+    cached_features_generator = features_cache.features_generator(features_generator)
+    features = [cached_features_generator(s) for s in smiles]
+    features_cache.flush()
+
+    return features
+
+
 def generate_and_save_features(args: Args):
     """
     Computes and saves features for a dataset of molecules as a 2D array in a .npz file.
@@ -85,7 +107,14 @@ def generate_and_save_features(args: Args):
     # Build features map function
     smiles = smiles[len(features):]  # restrict to data for which features have not been computed yet
 
-    if args.sequential:
+    if args.features_cache_path is not None:
+        # Look up and store features in chunks so that new features are written to the cache in groups
+        features_generator = partial(generate_cached_features, FeaturesCache(args.features_cache_path),
+                                     args.features_generator)
+        chunks = [smiles[i:i + 100] for i in range(0, len(smiles), 100)]
+        chunks_map = map(features_generator, chunks) if args.sequential else Pool().imap(features_generator, chunks)
+        features_map = chain.from_iterable(chunks_map)
+    elif args.sequential:
         features_map = map(features_generator, smiles)
     else:
         features_map = Pool().imap(features_generator, smiles)
@@ -27,6 +27,7 @@ setup(
     entry_points={
         'console_scripts': [
             'chemprop_train=chemprop.train:chemprop_train',
+            'chemprop_compile=chemprop.train:chemprop_compile',
             'chemprop_predict=chemprop.train:chemprop_predict',
             'chemprop_fingerprint=chemprop.train:chemprop_fingerprint',
             'chemprop_hyperopt=chemprop.hyperparameter_optimization:chemprop_hyperopt',
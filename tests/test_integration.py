@@ -13,7 +13,7 @@ import numpy as np
 import pandas as pd
 from parameterized import parameterized
 
-from chemprop.constants import TEST_SCORES_FILE_NAME
+from chemprop.constants import MODEL_FILE_NAME, TEST_SCORES_FILE_NAME
 from chemprop.hyperparameter_optimization import chemprop_hyperopt
 from chemprop.interpret import chemprop_interpret
 from chemprop.sklearn_predict import sklearn_predict
@@ -27,6 +27,7 @@ from chemprop.train import (
 from chemprop.web.wsgi import build_app
 from chemprop.spectra_utils import normalize_spectra, load_phase_mask
 from chemprop.features import load_features
+from chemprop.utils import load_checkpoint
 
 
 TEST_DATA_DIR = "tests/data"
@@ -525,6 +526,58 @@ class ChempropTests(TestCase):
             ]
             self.assertTrue(columns == expected_columns)
 
+    def test_predict_streaming(self):
+        with TemporaryDirectory() as save_dir:
+            # Train
+            dataset_type = "regression"
+            self.train(dataset_type=dataset_type, metric="rmse", save_dir=save_dir)
+
+            # Predict all at once and in chunks
+            preds_path = os.path.join(save_dir, "preds.csv")
+            self.predict(dataset_type=dataset_type, preds_path=preds_path, save_dir=save_dir)
+            streamed_preds_path = os.path.join(save_dir, "streamed_preds.csv")
+            self.predict(
+                dataset_type=dataset_type,
+                preds_path=streamed_preds_path,
+                save_dir=save_dir,
+                flags=["--predict_chunk_size", "7"],
+            )
+
+            pred, streamed_pred = pd.read_csv(preds_path), pd.read_csv(streamed_preds_path)
+            pd.testing.assert_frame_equal(pred, streamed_pred)
+            self.assertFalse(os.path.exists(f"{streamed_preds_path}.progress"))
+
+    def test_train_concurrent_jobs(self):
+        with TemporaryDirectory() as save_dir:
+            # Train the folds and models one at a time and concurrently
+            flags = ["--ensemble_size", "2", "--epochs", "2"]
+            sequential_dir = os.path.join(save_dir, "sequential")
+            self.train(dataset_type="regression", metric="rmse", save_dir=sequential_dir, flags=flags)
+            concurrent_dir = os.path.join(save_dir, "concurrent")
+            self.train(
+                dataset_type="regression",
+                metric="rmse",
+                save_dir=concurrent_dir,
+                flags=flags + ["--num_train_jobs", str(2 * NUM_FOLDS)],
+            )
+
+            # The test scores of the folds are gathered in the same layout
+            sequential_scores = pd.read_csv(os.path.join(sequential_dir, TEST_SCORES_FILE_NAME))
+            concurrent_scores = pd.read_csv(os.path.join(concurrent_dir, TEST_SCORES_FILE_NAME))
+            self.assertEqual(list(concurrent_scores.columns), list(sequential_scores.columns))
+            self.assertEqual(list(concurrent_scores["Task"]), list(sequential_scores["Task"]))
+            self.assertFalse(concurrent_scores.drop(columns=["Task"]).isna().any().any())
+
+            # The models trained concurrently are seeded differently, so their weight matrices differ
+            for fold_num in range(NUM_FOLDS):
+                models = [
+                    load_checkpoint(os.path.join(concurrent_dir, f"fold_{fold_num}", f"model_{model_idx}", MODEL_FILE_NAME))
+                    for model_idx in range(2)
+                ]
+                for param, other_param in zip(models[0].parameters(), models[1].parameters()):
+                    if param.dim() > 1:
+                        self.assertFalse(np.allclose(param.detach().numpy(), other_param.detach().numpy()))
+
     @parameterized.expand(
         [
             (
@@ -689,11 +742,17 @@ class ChempropTests(TestCase):
                             "ensembleSize": ensemble_size,
                             "checkpointName": checkpoint_name,
                             "datasetType": dataset_type,
-                            "useProgressBar": False,
                         },
                     )
                     self.assertEqual(response.status_code, 200)
 
+                    # Wait for the training job, streaming its progress
+                    response = client.get(url_for("train_events", checkpoint=int(ckpt_name)))
+                    events = [json.loads(line[len("data: "):]) for line in response.get_data(as_text=True).split("\n")
+                              if line.startswith("data: ")]
+                    self.assertEqual(events[-1]["status"], "completed")
+                    self.assertEqual(sum(len(event["epochs"]) for event in events), epochs * ensemble_size)
+
                     # Predict
                     response = client.post(
                         url_for("predict"),
@@ -701,6 +760,29 @@ class ChempropTests(TestCase):
                     )
                     self.assertEqual(response.status_code, 200)
 
+                    # Predict with the resident model
+                    response = client.post(
+                        url_for("api_predict"),
+                        json={"checkpoint": int(ckpt_name), "smiles": test_smiles.split()},
+                    )
+                    self.assertEqual(response.status_code, 200)
+                    self.assertEqual(len(response.get_json()["predictions"]), len(test_smiles.split()))
+
+                    # Invalid prediction requests
+                    for content, status_code in [
+                        ({"checkpoint": "name", "smiles": ["C"]}, 400),
+                        ({"checkpoint": int(ckpt_name), "smiles": "C"}, 400),
+                        ({"checkpoint": int(ckpt_name), "smiles": [5]}, 400),
+                        ({"checkpoint": int(ckpt_name), "smiles": [["C", "CC"]]}, 400),
+                        ({"checkpoint": int(ckpt_name), "smiles": ["C"], "gpu": 1000}, 400),
+                        ({"checkpoint": int(ckpt_name) + 1000, "smiles": ["C"]}, 404),
+                    ]:
+                        response = client.post(url_for("api_predict"), json=content)
+                        self.assertEqual(response.status_code, status_code)
+
+                    response = client.get(url_for("api_stats"))
+                    self.assertEqual(response.get_json()["stats"][0]["requests"], 2)
+
     @parameterized.expand([
         (
             'spectra',
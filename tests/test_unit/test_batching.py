@@ -0,0 +1,102 @@
+"""Chemprop unit tests for chemprop/web/batching.py"""
+from concurrent.futures import ThreadPoolExecutor
+import threading
+from unittest import TestCase
+
+from chemprop.web.batching import PredictionBatcher
+
+
+class TestPredictionBatcher(TestCase):
+    """
+    Tests of coalescing concurrent prediction requests into batches.
+    """
+    def setUp(self):
+        self.batches = []
+        self.release = threading.Event()
+
+    def predict(self, smiles):
+        self.batches.append(smiles)
+        return [[len(s)] for s in smiles]
+
+    def blocking_predict(self, smiles):
+        self.release.wait()
+        return self.predict(smiles)
+
+    def test_coalesce(self):
+        """Testing that concurrent requests are predicted in one batch and get their own predictions"""
+        batcher = PredictionBatcher(predict=self.predict, max_batch_size=100, max_wait=1.0)
+        requests = [['C' * (i + 1)] * 2 for i in range(5)]
+        with ThreadPoolExecutor(max_workers=5) as executor:
+            preds = list(executor.map(batcher.predict, requests))
+        batcher.close()
+
+        self.assertEqual(preds, [[[i + 1]] * 2 for i in range(5)])
+        self.assertEqual(len(self.batches), 1)
+        self.assertEqual(batcher.stats()['molecules_per_batch'], 10)
+
+    def test_max_batch_size(self):
+        """Testing that a batch never exceeds the maximum number of molecules"""
+        batcher = PredictionBatcher(predict=self.blocking_predict, max_batch_size=5, max_wait=0.1)
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            futures = [executor.submit(batcher.predict, ['C', 'CC', 'CCC']) for _ in range(4)]
+            self.release.set()
+            preds = [future.result() for future in futures]
+        batcher.close()
+
+        self.assertEqual(preds, [[[1], [2], [3]]] * 4)
+        self.assertTrue(all(len(batch) <= 5 for batch in self.batches))
+        self.assertEqual(batcher.stats()['requests'], 4)
+
+    def test_error(self):
+        """Testing that the errors of a batch are raised by each of its requests"""
+        def predict(smiles):
+            raise ValueError('invalid')
+
+        batcher = PredictionBatcher(predict=predict, max_wait=0.0)
+        with self.assertRaises(ValueError):
+            batcher.predict(['C'])
+        batcher.close()
+
+    def test_error_isolation(self):
+        """Testing that the error of a request coalesced with others is only raised by that request"""
+        def predict(smiles):
+            self.release.wait()
+            if any(not isinstance(s, str) for s in smiles):
+                raise TypeError('SMILES must be strings')
+            return self.predict(smiles)
+
+        batcher = PredictionBatcher(predict=predict, max_batch_size=100, max_wait=1.0)
+        with ThreadPoolExecutor(max_workers=3) as executor:
+            futures = [executor.submit(batcher.predict, smiles) for smiles in [['C'], [5], ['CC', 'CCC']]]
+            self.release.set()
+            with self.assertRaises(TypeError):
+                futures[1].result()
+            preds = [futures[0].result(), futures[2].result()]
+        batcher.close()
+
+        self.assertEqual(preds, [[[1]], [[2], [3]]])
+        self.assertCountEqual(self.batches, [['C'], ['CC', 'CCC']])
+        self.assertEqual(batcher.stats()['requests'], 2)
+
+    def test_stats(self):
+        """Testing that the latency percentiles are reported once requests are predicted"""
+        batcher = PredictionBatcher(predict=self.predict, max_wait=0.0)
+        self.assertIsNone(batcher.stats()['latency_p50_ms'])
+        self.assertEqual(batcher.predict([]), [])
+
+        batcher.predict(['C'])
+        batcher.predict(['CC', 'CCC'])
+        batcher.close()
+
+        stats = batcher.stats()
+        self.assertEqual((stats['requests'], stats['molecules'], stats['batches']), (2, 3, 2))
+        self.assertLessEqual(stats['latency_p50_ms'], stats['latency_p99_ms'])
+
+    def test_closed(self):
+        """Testing that requests made after closing (e.g., when the models are evicted) are still predicted"""
+        batcher = PredictionBatcher(predict=self.predict, max_wait=0.0)
+        batcher.close()
+        batcher.close()
+
+        self.assertEqual(batcher.predict(['CC']), [[2]])
+        self.assertEqual(batcher.stats()['requests'], 0)
@@ -0,0 +1,64 @@
+"""Chemprop unit tests for chemprop/data/compiled.py"""
+import pickle
+from tempfile import TemporaryDirectory
+from unittest import TestCase
+
+import numpy as np
+import torch
+
+from chemprop.data import compile_dataset, is_compiled_dataset, load_compiled_dataset, MoleculeDatapoint, \
+    MoleculeDataset
+from chemprop.features import reset_featurization_parameters, set_adding_hs
+
+
+SMILES = ['CCO', 'c1ccccc1O', 'C[C@H](N)C(=O)[O-]', 'F/C=C/F', 'C#N', 'C']
+
+
+class TestCompiledDataset(TestCase):
+    """
+    Tests of compiling datasets to memory-mappable arrays.
+    """
+    def setUp(self):
+        reset_featurization_parameters()
+        self.temp_dir = TemporaryDirectory()
+        self.data = MoleculeDataset([
+            MoleculeDatapoint(smiles=[s], targets=[float(i), None if i % 2 else -1.0],
+                              features=np.arange(3, dtype=float) + i)
+            for i, s in enumerate(SMILES)
+        ])
+        compile_dataset(self.data, self.temp_dir.name, smiles_columns=['smiles'], task_names=['a', 'b'])
+
+    def test_round_trip(self):
+        """Testing that a compiled dataset loads the same targets, features and graphs"""
+        self.assertTrue(is_compiled_dataset(self.temp_dir.name))
+        data = load_compiled_dataset(self.temp_dir.name)
+
+        self.assertEqual(data.smiles(), self.data.smiles())
+        self.assertEqual(data.targets(), self.data.targets())
+        np.testing.assert_array_equal(data.features(), self.data.features())
+        for expected, component in zip(self.data.batch_graph()[0].get_components(),
+                                       data.batch_graph()[0].get_components()):
+            if isinstance(expected, torch.Tensor):
+                self.assertTrue(torch.equal(expected, component))
+            else:
+                self.assertEqual(expected, component)
+
+    def test_subset(self):
+        """Testing the selection of tasks and datapoints"""
+        data = load_compiled_dataset(self.temp_dir.name, target_columns=['b'], max_data_size=4, skip_none_targets=True)
+        self.assertEqual(data.targets(), [[-1.0], [-1.0]])
+
+    def test_pickle(self):
+        """Testing that pickled datapoints do not copy the memory-mapped graphs"""
+        datapoint = pickle.loads(pickle.dumps(load_compiled_dataset(self.temp_dir.name)[1]))
+        self.assertEqual(datapoint.mol_graphs.dataset._arrays, {})
+        np.testing.assert_array_equal(datapoint.mol_graphs[0].f_bonds, self.data.batch_graph()[0].f_bonds[5:19])
+
+    def test_featurization_change(self):
+        """Testing that stored graphs are not used with different featurization parameters"""
+        set_adding_hs(True)
+        self.assertIsNone(load_compiled_dataset(self.temp_dir.name)[0].mol_graphs)
+
+    def tearDown(self):
+        reset_featurization_parameters()
+        self.temp_dir.cleanup()
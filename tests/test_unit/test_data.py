@@ -0,0 +1,183 @@
+"""Chemprop unit tests for chemprop/data/data.py"""
+from unittest import TestCase
+
+import numpy as np
+
+from chemprop.data import MoleculeBatchSampler, MoleculeDataLoader, MoleculeDatapoint, MoleculeDataset, \
+    MoleculeSampler
+from chemprop.data.data import construct_molecule_batch
+
+
+SMILES = ['C', 'CCCCCC', 'CC', 'CCCCC', 'CCC', 'CCCC', 'O', 'CCCCCCC', 'CO', 'CCCCCCCC']
+
+
+class TestMoleculeBatchSampler(TestCase):
+    """
+    Tests of batching molecules under an atom or bond budget.
+    """
+    def setUp(self):
+        self.data = MoleculeDataset([MoleculeDatapoint(smiles=[s], targets=[float(i % 2)])
+                                     for i, s in enumerate(SMILES)])
+
+    def test_sequential(self):
+        """Testing that batches keep the order of the data without shuffling"""
+        batches = list(MoleculeBatchSampler(self.data, max_atoms=8))
+        self.assertEqual(batches, [[0, 1], [2, 3], [4, 5, 6], [7], [8], [9]])
+
+    def test_bond_budget(self):
+        """Testing that batches stay within a bond budget"""
+        sampler = MoleculeBatchSampler(self.data, max_bonds=6)
+        for batch in sampler:
+            self.assertTrue(len(batch) == 1 or sum(sampler.num_bonds[i] for i in batch) <= 6)
+
+    def test_shuffle(self):
+        """Testing that shuffled epochs cover all data in batches of similar size and differ between epochs"""
+        sampler = MoleculeBatchSampler(self.data, max_atoms=8, shuffle=True, seed=1)
+        epochs = []
+        for _ in range(3):
+            num_batches = len(sampler)
+            batches = list(sampler)
+            self.assertEqual(len(batches), num_batches)
+            self.assertEqual(sorted(i for batch in batches for i in batch), list(range(len(SMILES))))
+            for batch in batches:
+                self.assertTrue(len(batch) == 1 or sum(sampler.num_atoms[i] for i in batch) <= 8)
+            epochs.append(batches)
+        self.assertNotEqual(epochs[0], epochs[1])
+
+    def test_class_balance(self):
+        """Testing that class balance samples as many positives as negatives"""
+        sampler = MoleculeBatchSampler(self.data, max_atoms=8, class_balance=True, shuffle=True)
+        indices = [i for batch in sampler for i in batch]
+        self.assertEqual(sampler.num_samples, len(indices))
+        self.assertEqual(sum(self.data[i].targets[0] for i in indices), len(indices) / 2)
+
+    def test_data_loader(self):
+        """Testing that a data loader with an atom budget loads all data in order"""
+        data_loader = MoleculeDataLoader(self.data, num_workers=0, max_batch_atoms=8)
+        self.assertEqual(len(data_loader), 6)
+        self.assertEqual(data_loader.iter_size, len(SMILES))
+        self.assertEqual([s for batch in data_loader for s in batch.smiles()], [[s] for s in SMILES])
+        self.assertEqual(data_loader.targets, self.data.targets())
+
+
+class TestDistributedSampler(TestCase):
+    """
+    Tests of sharding the data of each epoch among the processes of distributed training.
+    """
+    def setUp(self):
+        self.data = MoleculeDataset([MoleculeDatapoint(smiles=[s], targets=[float(i % 2)])
+                                     for i, s in enumerate(SMILES)])
+
+    def test_shards(self):
+        """Testing that shuffled shards with the same seed are disjoint, cover the data and have equal lengths"""
+        samplers = [MoleculeSampler(self.data, shuffle=True, seed=1, num_replicas=3, rank=rank) for rank in range(3)]
+        for _ in range(2):
+            shards = [list(sampler) for sampler in samplers]
+            self.assertEqual([len(shard) for shard in shards], [4, 4, 4])
+            self.assertEqual([len(sampler) for sampler in samplers], [4, 4, 4])
+            indices = [i for shard in shards for i in shard]
+            self.assertEqual(set(indices), set(range(len(SMILES))))
+            self.assertEqual(len(indices) - len(set(indices)), 2)
+
+    def test_invalid_rank(self):
+        """Testing that the rank must be smaller than the number of processes"""
+        with self.assertRaises(ValueError):
+            MoleculeSampler(self.data, num_replicas=2, rank=2)
+
+    def test_batch_shards(self):
+        """Testing that every process takes the same number of batches which together cover the data"""
+        samplers = [MoleculeBatchSampler(self.data, max_atoms=8, shuffle=True, seed=1, num_replicas=4, rank=rank)
+                    for rank in range(4)]
+        num_batches = [len(sampler) for sampler in samplers]
+        shards = [list(sampler) for sampler in samplers]
+        self.assertEqual(len(set(num_batches)), 1)
+        self.assertEqual([len(shard) for shard in shards], num_batches)
+        self.assertEqual({i for shard in shards for batch in shard for i in batch}, set(range(len(SMILES))))
+
+    def test_data_loader(self):
+        """Testing that the data loaders of two processes load the two halves of the data"""
+        data_loaders = [MoleculeDataLoader(self.data, batch_size=2, num_workers=0, num_replicas=2, rank=rank)
+                        for rank in range(2)]
+        self.assertEqual([data_loader.iter_size for data_loader in data_loaders], [5, 5])
+        smiles = [[s for batch in data_loader for s in batch.smiles()] for data_loader in data_loaders]
+        self.assertEqual(smiles, [[[s] for s in SMILES[0::2]], [[s] for s in SMILES[1::2]]])
+
+
+class TestMoleculeDataLoaderCache(TestCase):
+    """
+    Tests of caching the collated batches of a data loader.
+    """
+    def setUp(self):
+        self.data = MoleculeDataset([MoleculeDatapoint(smiles=[s], targets=[float(i % 2)])
+                                     for i, s in enumerate(SMILES)])
+
+    def test_cached(self):
+        """Testing that later iterations return the batches of the first iteration"""
+        data_loader = MoleculeDataLoader(self.data, batch_size=3, num_workers=0,
+                                         cache_batches_max_bytes=float('inf'))
+        first_batches = list(data_loader)
+        self.assertTrue(data_loader.is_cached)
+        second_batches = list(data_loader)
+        self.assertEqual(len(second_batches), len(data_loader))
+        for first_batch, second_batch in zip(first_batches, second_batches):
+            self.assertIs(first_batch, second_batch)
+        self.assertEqual([s for batch in second_batches for s in batch.smiles()], [[s] for s in SMILES])
+
+    def test_budget(self):
+        """Testing that batches exceeding the budget are not cached"""
+        data_loader = MoleculeDataLoader(self.data, batch_size=3, num_workers=0, cache_batches_max_bytes=1000)
+        first_batches = list(data_loader)
+        self.assertFalse(data_loader.is_cached)
+        self.assertIsNot(first_batches[0], next(iter(data_loader)))
+
+    def test_shuffle(self):
+        """Testing that batches of shuffled data cannot be cached"""
+        with self.assertRaises(ValueError):
+            MoleculeDataLoader(self.data, num_workers=0, shuffle=True, cache_batches_max_bytes=float('inf'))
+
+
+class TestEncodings(TestCase):
+    """
+    Tests of precomputed encodings of molecules.
+    """
+    def setUp(self):
+        self.data = MoleculeDataset([MoleculeDatapoint(smiles=[s], targets=[float(i % 2)])
+                                     for i, s in enumerate(SMILES)])
+        self.encodings = np.arange(2 * len(SMILES), dtype=np.float32).reshape(len(SMILES), 2)
+
+    def test_set_encodings(self):
+        """Testing that encodings are set and removed"""
+        self.assertIsNone(self.data.encodings())
+        self.data.set_encodings(self.encodings)
+        np.testing.assert_array_equal(self.data.encodings(), self.encodings)
+        self.data.set_encodings(None)
+        self.assertIsNone(self.data.encodings())
+
+    def test_batch(self):
+        """Testing that batches of molecules with encodings do not build graphs"""
+        self.data.set_encodings(self.encodings)
+        batch = construct_molecule_batch(self.data[2:5])
+        self.assertIsNone(batch._batch_graph)
+        np.testing.assert_array_equal(batch.encodings(), self.encodings[2:5])
+
+
+class TestBatchGraphDedupe(TestCase):
+    """
+    Tests of encoding repeated molecules once per batch with multiple molecules per datapoint.
+    """
+    def test_dedupe(self):
+        """Testing that repeated molecules of a column are included once in its graph"""
+        solvents = ['O', 'CO', 'O', 'O', 'CO']
+        data = MoleculeDataset([MoleculeDatapoint(smiles=[s, solvent]) for s, solvent in zip(SMILES, solvents)])
+        solute_graph, solvent_graph = data.batch_graph()
+        self.assertIsNone(solute_graph.mol_index)
+        self.assertEqual(len(solute_graph.a_scope), len(solvents))
+        self.assertEqual(len(solvent_graph.a_scope), 2)
+        self.assertEqual(solvent_graph.mol_index.tolist(), [0, 1, 0, 0, 1])
+
+    def test_single_molecule(self):
+        """Testing that repeated molecules are not deduplicated with one molecule per datapoint"""
+        data = MoleculeDataset([MoleculeDatapoint(smiles=[s]) for s in ['C', 'C', 'CC']])
+        batch_graph, = data.batch_graph()
+        self.assertIsNone(batch_graph.mol_index)
+        self.assertEqual(len(batch_graph.a_scope), 3)
@@ -1,5 +1,6 @@
 """Chemprop unit tests for chemprop/data/utils.py"""
 import os
+from types import SimpleNamespace
 from unittest import TestCase
 from unittest.mock import patch
 from tempfile import TemporaryDirectory
@@ -7,7 +8,8 @@ from tempfile import TemporaryDirectory
 import numpy as np
 
 from chemprop.data import get_header, preprocess_smiles_columns, get_task_names, get_data_weights, \
-    get_smiles, filter_invalid_smiles, MoleculeDataset, MoleculeDatapoint, get_data, split_data
+    get_smiles, filter_invalid_smiles, deduplicate_data, MoleculeDataset, MoleculeDatapoint, get_data, get_data_chunks, split_data, \
+    make_datapoint_pool
 
 class TestGetHeader(TestCase):
     """
@@ -300,6 +302,33 @@ class TestFilterInvalidSmiles(TestCase):
         self.assertEqual(filtered_dataset.smiles(),[['C'],['CC'],['O']])
 
 
+class TestDeduplicateData(TestCase):
+    """
+    Tests for the deduplicate_data function.
+    """
+    def test_canonical_smiles(self):
+        """Test that molecules with the same canonical smiles are merged"""
+        smiles_list = [['CCO'],['OCC'],['C'],['C(C)O'],['C']]
+        dataset = MoleculeDataset([MoleculeDatapoint(s) for s in smiles_list])
+        unique_dataset, indices = deduplicate_data(dataset)
+        self.assertEqual(unique_dataset.smiles(),[['CCO'],['C']])
+        self.assertEqual(indices,[0,0,1,0,1])
+
+    def test_features(self):
+        """Test that molecules with different features are kept apart"""
+        dataset = MoleculeDataset([MoleculeDatapoint(['CCO'], features=np.array([f])) for f in [0., 1., 0.]])
+        unique_dataset, indices = deduplicate_data(dataset)
+        self.assertEqual(len(unique_dataset),2)
+        self.assertEqual(indices,[0,1,0])
+
+    def test_multiple_molecules(self):
+        """Test that datapoints are only merged if all of their molecules are the same"""
+        smiles_list = [['CCO','O'],['OCC','O'],['CCO','CO']]
+        dataset = MoleculeDataset([MoleculeDatapoint(s) for s in smiles_list])
+        unique_dataset, indices = deduplicate_data(dataset)
+        self.assertEqual(indices,[0,0,1])
+
+
 @patch(
     "chemprop.data.utils.get_data_weights",
     lambda *args, **kwargs : np.array([1,1.5,0.5])
@@ -385,6 +414,16 @@ class TestGetData(TestCase):
         )
         self.assertTrue(np.array_equal(data.phase_features(),[[0,1],[1,0],[1,0]]))
 
+    def test_featurization_workers(self):
+        """Testing that featurizing in worker processes gives the same datapoints in the same order"""
+        data = get_data(path=self.data_path, smiles_columns=['column0','column1'],
+                        features_generator=['morgan'])
+        parallel_data = get_data(path=self.data_path, smiles_columns=['column0','column1'],
+                                 features_generator=['morgan'], featurization_workers=2)
+        self.assertEqual(parallel_data.smiles(),data.smiles())
+        self.assertEqual(parallel_data.targets(),data.targets())
+        self.assertTrue(np.array_equal(parallel_data.features(),data.features()))
+
     @patch(
         "chemprop.data.utils.load_features",
         lambda *args, **kwargs : np.array([[0,1],[1,0],[1,0]])
@@ -415,6 +454,53 @@ class TestGetData(TestCase):
         self.temp_dir.cleanup()
 
 
+class TestGetDataChunks(TestCase):
+    """
+    Tests for the get_data_chunks function.
+    """
+    def setUp(self):
+        self.temp_dir = TemporaryDirectory()
+        self.data_path = os.path.join(self.temp_dir.name,'data.csv')
+        with open(self.data_path,'w') as f:
+            f.write('column0,column1\nC,0\nCC,1\nbad,2\nO,3\nCO,4')
+
+    def test_chunks(self):
+        """Testing that chunks cover the file in order, keeping invalid SMILES"""
+        chunks = get_data_chunks(path=self.data_path, chunk_size=2, smiles_columns=['column0'])
+        self.assertEqual([chunk.smiles() for chunk in chunks],[[['C'],['CC']],[['bad'],['O']],[['CO']]])
+
+    def test_skip_rows(self):
+        """Testing that skipped rows count towards the maximum data size"""
+        chunks = get_data_chunks(path=self.data_path, chunk_size=2, smiles_columns=['column0'], skip_rows=1,
+                                 max_data_size=4, store_row=True)
+        self.assertEqual([[d.row['column1'] for d in chunk] for chunk in chunks],[['1','2'],['3']])
+
+    def test_missing_smiles_column(self):
+        """Testing that a missing smiles column raises an error"""
+        with self.assertRaises(ValueError):
+            next(get_data_chunks(path=self.data_path, chunk_size=2, smiles_columns=['column2']))
+
+    def test_featurization_workers(self):
+        """Testing that the chunks featurized in worker processes match and are featurized by the same workers"""
+        args = SimpleNamespace(featurization_workers=2, overwrite_default_atom_features=False,
+                               overwrite_default_bond_features=False)
+        with patch('chemprop.data.utils.make_datapoint_pool', wraps=make_datapoint_pool) as pool:
+            chunks = list(get_data_chunks(path=self.data_path, chunk_size=2, smiles_columns=['column0'],
+                                          features_generator=['morgan'], args=args))
+        self.assertEqual(pool.call_count, 1)
+        self.assertEqual(len(chunks), 3)
+
+        expected_chunks = get_data_chunks(path=self.data_path, chunk_size=2, smiles_columns=['column0'],
+                                          features_generator=['morgan'])
+        for chunk, expected_chunk in zip(chunks, expected_chunks):
+            self.assertEqual(chunk.smiles(), expected_chunk.smiles())
+            for features, expected_features in zip(chunk.features(), expected_chunk.features()):
+                self.assertTrue(np.array_equal(features, expected_features))
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+
 class TestSplitData(TestCase):
     """
     Testing of the split_data function.
@@ -0,0 +1,87 @@
+"""Chemprop unit tests for chemprop/data/features_cache.py"""
+from tempfile import TemporaryDirectory
+from unittest import TestCase
+
+import numpy as np
+
+from chemprop.data import features_cache, FeaturesCache, MoleculeDatapoint, set_features_cache
+from chemprop.features import morgan_counts_features_generator, register_features_generator, \
+    reset_featurization_parameters, set_adding_hs
+from chemprop.features.features_generators import FEATURES_GENERATOR_REGISTRY
+
+
+class TestFeaturesCache(TestCase):
+    """
+    Tests of the persistent features cache.
+    """
+    def setUp(self):
+        self.temp_dir = TemporaryDirectory()
+        reset_featurization_parameters()
+
+    def test_round_trip(self):
+        """Testing that stored features are loaded by a new cache on the same directory"""
+        FeaturesCache(self.temp_dir.name).put('morgan_count', {'CCO': np.arange(3.0), 'CCN': np.full(3, np.nan)})
+        FeaturesCache(self.temp_dir.name).put('morgan_count', {'CCC': np.ones(3)})
+
+        cache = FeaturesCache(self.temp_dir.name)
+        features = cache.get('morgan_count', ['CCO', 'CCC', 'CCN', 'CO'])
+        self.assertEqual(set(features.keys()), {'CCO', 'CCC', 'CCN'})
+        np.testing.assert_array_equal(features['CCO'], np.arange(3.0))
+        np.testing.assert_array_equal(features['CCC'], np.ones(3))
+        self.assertTrue(np.isnan(features['CCN']).all())
+        self.assertEqual((cache.hits, cache.misses), (3, 1))
+
+    def test_num_features_mismatch(self):
+        """Testing that storing features of a different length raises an error"""
+        cache = FeaturesCache(self.temp_dir.name)
+        cache.put('morgan_count', {'CCO': np.arange(3.0)})
+        with self.assertRaises(ValueError):
+            cache.put('morgan_count', {'CCN': np.arange(4.0)})
+
+    def test_featurization_change(self):
+        """Testing that features are not reused when molecules are built with different settings"""
+        cache = FeaturesCache(self.temp_dir.name)
+        cache.put('morgan_count', {'CCO': np.arange(3.0)})
+
+        set_adding_hs(True)
+        self.assertEqual(cache.get('morgan_count', ['CCO']), {})
+
+    def test_generator_change(self):
+        """Testing that features are not reused when the code of a features generator changes"""
+        @register_features_generator('test_cache_generator')
+        def generator(mol):
+            return np.zeros(3)
+
+        try:
+            cache = FeaturesCache(self.temp_dir.name)
+            cache.put('test_cache_generator', {'CCO': np.zeros(3)})
+            self.assertEqual(set(cache.get('test_cache_generator', ['CCO']).keys()), {'CCO'})
+
+            # A features generator of the same name and signature with a different body
+            @register_features_generator('test_cache_generator')
+            def generator(mol):
+                return np.ones(3)
+
+            self.assertEqual(cache.get('test_cache_generator', ['CCO']), {})
+        finally:
+            del FEATURES_GENERATOR_REGISTRY['test_cache_generator']
+
+    def test_datapoint_features(self):
+        """Testing that datapoints load the same features from the cache as they compute"""
+        set_features_cache(self.temp_dir.name)
+        try:
+            datapoint = MoleculeDatapoint(smiles=['OCC', '[H][H]'], features_generator=['morgan_count'])
+            features_cache().flush()
+            cached_datapoint = MoleculeDatapoint(smiles=['C(O)C', '[H][H]'], features_generator=['morgan_count'])
+            hits = features_cache().hits
+        finally:
+            set_features_cache(None)
+
+        expected = np.concatenate((morgan_counts_features_generator('CCO'), np.zeros(2048)))
+        np.testing.assert_array_equal(datapoint.features, expected)
+        np.testing.assert_array_equal(cached_datapoint.features, expected)
+        self.assertEqual(hits, 2)
+
+    def tearDown(self):
+        reset_featurization_parameters()
+        self.temp_dir.cleanup()
@@ -0,0 +1,65 @@
+"""Chemprop unit tests for chemprop/features/features_generators.py"""
+from unittest import TestCase
+
+import numpy as np
+from rdkit import Chem
+
+from chemprop.data import make_datapoints
+from chemprop.features import get_batch_features_generator, get_features_generator
+
+
+SMILES = ['CCO', 'c1ccccc1O', 'C[C@H](N)C(=O)[O-]', 'F/C=C/F', '[Na+].[Cl-]', 'CC(C)(C)C1CCC1O']
+
+
+class TestBatchFeaturesGenerators(TestCase):
+    """
+    Tests that the batch features generators give the features of the features generators.
+    """
+    def setUp(self):
+        self.mols = [Chem.MolFromSmiles(s) for s in SMILES]
+
+    def assert_same_as_single(self, features_generator: str, mols):
+        features = get_batch_features_generator(features_generator)(mols)
+        expected_features = np.array([get_features_generator(features_generator)(mol) for mol in mols],
+                                     dtype=np.float64)
+
+        self.assertEqual(features.dtype, np.float64)
+        np.testing.assert_array_equal(features, expected_features)
+
+    def test_rdkit_2d(self):
+        """Testing the RDKit 2D descriptors"""
+        self.assert_same_as_single('rdkit_2d', self.mols)
+
+    def test_rdkit_2d_normalized(self):
+        """Testing the normalized RDKit 2D descriptors"""
+        self.assert_same_as_single('rdkit_2d_normalized', self.mols)
+
+    def test_fallback(self):
+        """Testing that features generators without a batch version are applied to each molecule"""
+        self.assert_same_as_single('morgan', self.mols)
+        self.assert_same_as_single('morgan_count', SMILES)
+
+    def test_explicit_h(self):
+        """Testing that molecules with explicit hydrogens get the descriptors of the molecules without them"""
+        mols_with_hs = [Chem.AddHs(mol) for mol in self.mols]
+        for features_generator in ['rdkit_2d', 'rdkit_2d_normalized']:
+            self.assert_same_as_single(features_generator, mols_with_hs)
+            # The round trip through SMILES may reorder the atoms, which changes the rounding of some descriptors
+            np.testing.assert_allclose(get_batch_features_generator(features_generator)(mols_with_hs),
+                                       get_batch_features_generator(features_generator)(self.mols), rtol=1e-12)
+
+    def test_make_datapoints(self):
+        """Testing that datapoints constructed in chunks get the features of each molecule in turn"""
+        smiles = [[s, t] for s, t in zip(SMILES, SMILES[::-1])] + [['[H][H]', 'invalid']]
+        data = list(make_datapoints([{'smiles': s, 'features_generator': ['rdkit_2d', 'morgan']} for s in smiles],
+                                    chunk_size=4))
+
+        zero_features = {name: np.zeros(len(get_features_generator(name)('C'))) for name in ['rdkit_2d', 'morgan']}
+        for d, s in zip(data, smiles):
+            mols = [Chem.MolFromSmiles(x) for x in s]
+            expected_features = np.concatenate([
+                get_features_generator(name)(mol) if mol.GetNumHeavyAtoms() > 0 else zero_features[name]
+                for name in ['rdkit_2d', 'morgan'] for mol in mols if mol is not None
+            ])
+            np.testing.assert_array_equal(d.features, np.where(np.isnan(expected_features), 0, expected_features))
+            np.testing.assert_array_equal(d.raw_features, d.features)
@@ -0,0 +1,82 @@
+"""Chemprop unit tests for chemprop/features/featurization.py"""
+from unittest import TestCase
+
+import numpy as np
+import torch
+from rdkit import Chem
+
+from chemprop.features import atom_features, atom_features_array, BatchMolGraph, bond_features, bond_features_array, \
+    MolGraph
+
+
+SMILES = ['CCO', 'c1ccccc1O', 'C[C@H](N)C(=O)[O-]', 'F/C=C/F', 'C#N', '[Fe+3]', '[U]', '[2H]C([2H])[N+](=O)[O-]']
+
+
+class TestFeaturizationArrays(TestCase):
+    """
+    Tests that the vectorized featurization matches the per-atom and per-bond featurization.
+    """
+    def setUp(self):
+        self.mols = [Chem.MolFromSmiles(s) for s in SMILES]
+
+    def test_atom_features_array(self):
+        """Testing that atom feature arrays match atom_features"""
+        for mol in self.mols:
+            expected = np.array([atom_features(atom) for atom in mol.GetAtoms()], dtype=np.float32)
+            np.testing.assert_array_equal(atom_features_array(list(mol.GetAtoms())), expected)
+
+    def test_bond_features_array(self):
+        """Testing that bond feature arrays match bond_features, including missing bonds"""
+        for mol in self.mols:
+            bonds = list(mol.GetBonds()) + [None]
+            expected = np.array([bond_features(bond) for bond in bonds], dtype=np.float32)
+            np.testing.assert_array_equal(bond_features_array(bonds), expected)
+
+    def test_empty(self):
+        """Testing featurization of empty sequences"""
+        self.assertEqual(atom_features_array([]).shape, (0, len(atom_features(self.mols[0].GetAtomWithIdx(0)))))
+        self.assertEqual(bond_features_array([]).shape, (0, len(bond_features(None))))
+
+    def test_mol_graph_bond_features(self):
+        """Testing that MolGraph bond features concatenate the origin atom and bond features"""
+        mol = self.mols[1]
+        mol_graph = MolGraph(mol)
+        b2a, b2revb, f_bonds = mol_graph.b2a.tolist(), mol_graph.b2revb.tolist(), mol_graph.f_bonds
+        for b, a in enumerate(b2a):
+            bond = mol.GetBondBetweenAtoms(a, b2a[b2revb[b]])
+            expected = np.array(atom_features(mol.GetAtomWithIdx(a)) + bond_features(bond), dtype=np.float32)
+            np.testing.assert_array_equal(f_bonds[b], expected)
+
+    def test_mol_graph_a2b(self):
+        """Testing that the CSR mapping from atoms to incoming bonds lists each incoming bond in order"""
+        for mol in self.mols:
+            mol_graph = MolGraph(mol)
+            b2a, b2revb = mol_graph.b2a.tolist(), mol_graph.b2revb.tolist()
+            expected = [[b for b in range(mol_graph.n_bonds) if b2a[b2revb[b]] == a] for a in range(mol_graph.n_atoms)]
+            self.assertEqual(mol_graph.a2b, expected)
+
+    def test_batch_mol_graph(self):
+        """Testing that BatchMolGraph offsets the features and mappings of each molecule"""
+        mol_graphs = [MolGraph(mol) for mol in self.mols]
+        batch = BatchMolGraph(mol_graphs)
+        f_atoms, f_bonds, a2b, b2a, b2revb, a_scope, b_scope = batch.get_components()
+
+        self.assertEqual(f_atoms[0].abs().sum().item(), 0)
+        self.assertEqual(f_bonds[0].abs().sum().item(), 0)
+        for mol_graph, (a_start, a_size), (b_start, b_size) in zip(mol_graphs, a_scope, b_scope):
+            np.testing.assert_array_equal(f_atoms[a_start:a_start + a_size].numpy(), mol_graph.f_atoms)
+            np.testing.assert_array_equal(f_bonds[b_start:b_start + b_size].numpy(), mol_graph.f_bonds)
+            np.testing.assert_array_equal(b2a[b_start:b_start + b_size].numpy(), mol_graph.b2a + a_start)
+            np.testing.assert_array_equal(b2revb[b_start:b_start + b_size].numpy(), mol_graph.b2revb + b_start)
+            for a, in_bonds in enumerate(mol_graph.a2b):
+                expected = [b + b_start for b in in_bonds] + [0] * (batch.max_num_bonds - len(in_bonds))
+                self.assertEqual(a2b[a_start + a].tolist(), expected)
+
+    def test_batch_mol_graph_bond_features(self):
+        """Testing that the bond features without atom features are the last columns of the combined features"""
+        batch = BatchMolGraph([MolGraph(mol) for mol in self.mols])
+        f_bonds = batch.get_components(atom_messages=True)[1]
+
+        self.assertEqual(f_bonds.shape[1], batch.bond_fdim - batch.atom_fdim)
+        self.assertTrue(torch.equal(f_bonds, batch.f_bonds[:, batch.atom_fdim:]))
+        self.assertTrue(torch.equal(batch.f_atoms[batch.b2a], batch.f_bonds[:, :batch.atom_fdim]))
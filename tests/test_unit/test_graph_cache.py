@@ -0,0 +1,56 @@
+"""Chemprop unit tests for chemprop/data/graph_cache.py"""
+import os
+from tempfile import TemporaryDirectory
+from unittest import TestCase
+
+import numpy as np
+
+from chemprop.data import empty_cache, GraphCache, MoleculeDatapoint, MoleculeDataset, set_graph_cache
+from chemprop.data.data import SMILES_TO_MOL
+from chemprop.features import MolGraph, reset_featurization_parameters, set_adding_hs
+
+
+class TestGraphCache(TestCase):
+    """
+    Tests of the persistent graph cache.
+    """
+    def setUp(self):
+        self.temp_dir = TemporaryDirectory()
+        self.path = os.path.join(self.temp_dir.name, 'graphs.sqlite3')
+        reset_featurization_parameters()
+
+    def test_round_trip(self):
+        """Testing that stored graphs are loaded by a new cache on the same file"""
+        GraphCache(self.path).put({'CCO': MolGraph('CCO')})
+
+        cache = GraphCache(self.path)
+        mol_graphs = cache.get(['CCO', 'CCN'])
+        self.assertEqual(list(mol_graphs.keys()), ['CCO'])
+        np.testing.assert_array_equal(mol_graphs['CCO'].f_bonds, MolGraph('CCO').f_bonds)
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+
+    def test_featurization_change(self):
+        """Testing that graphs are not reused when the featurization parameters change"""
+        cache = GraphCache(self.path)
+        cache.put({'CCO': MolGraph('CCO')})
+
+        set_adding_hs(True)
+        self.assertEqual(cache.get(['CCO']), {})
+
+    def test_batch_graph(self):
+        """Testing that batches store and load graphs by their input SMILES without parsing the molecules"""
+        set_graph_cache(self.path)
+        empty_cache()
+        MoleculeDataset([MoleculeDatapoint(['OCC'])]).batch_graph()
+        self.assertEqual(list(GraphCache(self.path).get(['OCC', 'CCO']).keys()), ['OCC'])
+
+        empty_cache()
+        batch = MoleculeDataset([MoleculeDatapoint(['OCC'])]).batch_graph()
+        self.assertNotIn('OCC', SMILES_TO_MOL)
+        np.testing.assert_array_equal(batch[0].f_atoms[1:], MolGraph('OCC').f_atoms)
+
+    def tearDown(self):
+        set_graph_cache(None)
+        empty_cache()
+        reset_featurization_parameters()
+        self.temp_dir.cleanup()
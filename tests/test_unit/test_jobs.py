@@ -0,0 +1,87 @@
+"""Chemprop unit tests for chemprop/web/jobs.py"""
+from contextlib import closing
+import json
+import os
+from tempfile import TemporaryDirectory
+import time
+from typing import List
+from unittest import TestCase
+
+from chemprop.web.jobs import COMPLETED, connect, FAILED, QUEUED, RUNNING, TrainingJobQueue, update_job
+
+
+SCHEMA_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+                           'chemprop', 'web', 'app', 'schema.sql')
+
+
+def run_job(db_path: str, checkpoint_folder: str, ckpt_id: int, arguments: List[str]) -> None:
+    """A stand-in for training which completes, fails or kills its worker process depending on the arguments."""
+    if arguments == ['fail']:
+        raise ValueError('Training failed')
+    if arguments == ['crash']:
+        os._exit(1)
+
+    update_job(db_path, ckpt_id, completed=True, status=COMPLETED, progress=100.0)
+
+
+class TestTrainingJobQueue(TestCase):
+    """
+    Tests of running training jobs in a pool of worker processes and recording their states.
+    """
+    def setUp(self):
+        self.temp_dir = TemporaryDirectory()
+        self.db_path = os.path.join(self.temp_dir.name, 'chemprop.sqlite3')
+        with closing(connect(self.db_path)) as connection, connection, open(SCHEMA_PATH) as f:
+            connection.executescript(f.read())
+            connection.executemany(
+                'INSERT INTO ckpt (id, ckpt_name, associated_user, class, ensemble_size, training_size) '
+                'VALUES (?, ?, 1, "regression", 1, 10)',
+                [(ckpt_id, f'ckpt_{ckpt_id}') for ckpt_id in range(1, 5)]
+            )
+        self.queue = TrainingJobQueue(db_path=self.db_path, checkpoint_folder=self.temp_dir.name,
+                                      max_workers=1, run_job=run_job)
+
+    def wait_for_job(self, ckpt_id: int, timeout: float = 60.0) -> dict:
+        """Waits until a job has finished and returns the stats and completion of its checkpoint."""
+        deadline = time.perf_counter() + timeout
+        while True:
+            with closing(connect(self.db_path)) as connection:
+                row = connection.execute('SELECT stats, completed FROM ckpt WHERE id = ?', [ckpt_id]).fetchone()
+            stats = json.loads(row['stats'] or '{}')
+            if stats.get('status') not in [QUEUED, RUNNING] or time.perf_counter() > deadline:
+                return dict(stats, completed=bool(row['completed']))
+            time.sleep(0.05)
+
+    def test_completed(self):
+        """Testing that a job which finishes is recorded as completed"""
+        self.queue.submit(1, [])
+        job = self.wait_for_job(1)
+
+        self.assertEqual(job['status'], COMPLETED)
+        self.assertTrue(job['completed'])
+
+    def test_failed(self):
+        """Testing that the error of a job is recorded and later jobs still run"""
+        self.queue.submit(1, ['fail'])
+        self.queue.submit(2, [])
+        failed_job, job = self.wait_for_job(1), self.wait_for_job(2)
+
+        self.assertEqual((failed_job['status'], failed_job['error']), (FAILED, 'Training failed'))
+        self.assertFalse(failed_job['completed'])
+        self.assertEqual(job['status'], COMPLETED)
+
+    def test_crashed_worker(self):
+        """Testing that a job whose worker dies is recorded as failed and the next jobs run in a new pool"""
+        self.queue.submit(1, ['crash'])
+        crashed_job = self.wait_for_job(1)
+
+        self.assertEqual(crashed_job['status'], FAILED)
+        self.assertFalse(crashed_job['completed'])
+
+        for ckpt_id in [2, 3]:
+            self.queue.submit(ckpt_id, [])
+            self.assertEqual(self.wait_for_job(ckpt_id)['status'], COMPLETED)
+
+    def tearDown(self):
+        self.queue.shutdown()
+        self.temp_dir.cleanup()
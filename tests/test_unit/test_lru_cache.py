@@ -0,0 +1,42 @@
+"""Chemprop unit tests for chemprop/data/lru_cache.py"""
+from unittest import TestCase
+
+from chemprop.data import LRUCache
+
+
+class TestLRUCache(TestCase):
+    """
+    Tests of the bounded least recently used cache.
+    """
+    def setUp(self):
+        self.cache = LRUCache(get_size=len, max_bytes=10)
+
+    def test_eviction(self):
+        """Testing that the least recently used entries are evicted once the budget is exceeded"""
+        self.cache['a'] = 'xxxx'
+        self.cache['b'] = 'xxxx'
+        self.cache.get('a')
+        self.cache['c'] = 'xxxx'
+
+        self.assertIn('a', self.cache)
+        self.assertNotIn('b', self.cache)
+        self.assertIn('c', self.cache)
+        self.assertEqual((self.cache.num_bytes, self.cache.evictions), (8, 1))
+
+    def test_hit_rate(self):
+        """Testing that lookups are counted as hits and misses"""
+        self.cache['a'] = 'x'
+        self.assertEqual(self.cache.get('a'), 'x')
+        self.assertIsNone(self.cache.get('b'))
+        self.assertEqual((self.cache.hits, self.cache.misses, self.cache.hit_rate), (1, 1, 0.5))
+
+    def test_set_max_bytes(self):
+        """Testing that bounding an unbounded cache evicts entries"""
+        cache = LRUCache(get_size=len)
+        for key in 'abc':
+            cache[key] = 'xxxx'
+        self.assertEqual(cache.num_bytes, 0)
+
+        cache.set_max_bytes(5)
+        self.assertEqual(list(cache._data.keys()), ['c'])
+        self.assertEqual(cache.num_bytes, 4)
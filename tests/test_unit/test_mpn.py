@@ -0,0 +1,150 @@
+"""Chemprop unit tests for chemprop/models/mpn.py"""
+from unittest import TestCase
+
+import numpy as np
+from rdkit import Chem
+import torch
+
+from chemprop.args import TrainArgs
+from chemprop.features import BatchMolGraph, get_atom_fdim, get_bond_fdim, mol2graph, MolGraph, \
+    reset_featurization_parameters, set_extra_bond_fdim
+from chemprop.models.mpn import MPNEncoder
+
+
+SMILES = ['CCO', 'c1ccccc1C(=O)N', 'C', '[Na+].[Cl-]', 'CC(C)(C)C1CCC1O']
+
+
+def build_args(*arguments: str) -> TrainArgs:
+    return TrainArgs().parse_args(['--data_path', 'dummy.csv', '--dataset_type', 'regression',
+                                   '--hidden_size', '16', '--depth', '3', '--no_cuda', *arguments])
+
+
+def build_encoder(args: TrainArgs) -> MPNEncoder:
+    return MPNEncoder(args, atom_fdim=get_atom_fdim(), bond_fdim=get_bond_fdim(atom_messages=args.atom_messages))
+
+
+class TestScatterMessages(TestCase):
+    """
+    Tests of aggregating messages with index_add_ instead of padded neighbor tensors.
+    """
+    def setUp(self):
+        torch.manual_seed(0)
+        self.batch = mol2graph(SMILES)
+
+    def assert_same_encodings(self, *arguments: str):
+        padded = build_encoder(build_args(*arguments))
+        scatter = build_encoder(build_args('--scatter_messages', *arguments))
+        scatter.load_state_dict(padded.state_dict())
+        torch.testing.assert_close(scatter(self.batch), padded(self.batch))
+
+    def test_bond_messages(self):
+        """Testing that scatter and padded aggregation give the same encodings with bond messages"""
+        self.assert_same_encodings()
+
+    def test_atom_messages(self):
+        """Testing that scatter and padded aggregation give the same encodings with atom messages"""
+        self.assert_same_encodings('--atom_messages')
+
+    def test_undirected(self):
+        """Testing that scatter and padded aggregation give the same encodings with undirected messages"""
+        self.assert_same_encodings('--undirected')
+
+    def test_bias(self):
+        """Testing that scatter messages are rejected with bias, which makes the padding bond's messages nonzero"""
+        with self.assertRaises(ValueError):
+            build_args('--scatter_messages', '--bias')
+        with self.assertRaises(ValueError):
+            build_args('--scatter_messages', '--bias', '--atom_messages')
+
+
+class TestReadout(TestCase):
+    """
+    Tests of the vectorized readout, which sums the atom hidden states of all molecules with one index_add_.
+    """
+    def setUp(self):
+        torch.manual_seed(0)
+        self.batch = mol2graph(['CCO', '', 'c1ccccc1C(=O)N', 'C', ''])
+
+    def assert_same_as_loop(self, *arguments: str):
+        encoder = build_encoder(build_args(*arguments))
+        outputs = []
+        encoder.W_o.register_forward_hook(lambda module, inputs, output: outputs.append(output))
+        mol_vecs = encoder(self.batch)
+        atom_hiddens = encoder.act_func(outputs[0])
+
+        # The readout before vectorization
+        expected_mol_vecs = []
+        for a_start, a_size in self.batch.get_components(atom_messages=False)[5]:
+            if a_size == 0:
+                expected_mol_vecs.append(encoder.cached_zero_vector)
+            else:
+                mol_vec = atom_hiddens.narrow(0, a_start, a_size).sum(dim=0)
+                if encoder.aggregation == 'mean':
+                    mol_vec = mol_vec / a_size
+                elif encoder.aggregation == 'norm':
+                    mol_vec = mol_vec / encoder.aggregation_norm
+                expected_mol_vecs.append(mol_vec)
+
+        torch.testing.assert_close(mol_vecs, torch.stack(expected_mol_vecs, dim=0))
+
+    def test_mean(self):
+        """Testing the mean aggregation, including molecules without atoms"""
+        self.assert_same_as_loop('--aggregation', 'mean')
+
+    def test_sum(self):
+        """Testing the sum aggregation, including molecules without atoms"""
+        self.assert_same_as_loop('--aggregation', 'sum')
+
+    def test_norm(self):
+        """Testing the norm aggregation, including molecules without atoms"""
+        self.assert_same_as_loop('--aggregation', 'norm', '--aggregation_norm', '50')
+
+    def test_atom_messages(self):
+        """Testing the readout with atom messages"""
+        self.assert_same_as_loop('--atom_messages')
+
+
+class TestFactorizedBondInput(TestCase):
+    """
+    Tests of computing the input of the bond messages without concatenating the atom and bond features of each bond.
+    """
+    def setUp(self):
+        torch.manual_seed(0)
+        self.batch = mol2graph(SMILES)
+
+    def assert_same_as_concatenation(self, *arguments: str):
+        encoder = build_encoder(build_args(*arguments))
+        factorized = build_encoder(build_args('--factorized_bond_input', *arguments))
+        factorized.load_state_dict(encoder.state_dict())
+
+        # W_i(cat(f_atoms[b2a], f_bonds)) is the input of the bond messages without factorization
+        inputs = []
+        for module in [encoder, factorized]:
+            module.act_func.register_forward_hook(lambda module, args, output: inputs.append(args[0]))
+        torch.testing.assert_close(factorized(self.batch), encoder(self.batch))
+        torch.testing.assert_close(inputs[len(inputs) // 2], inputs[0])
+
+        return factorized
+
+    def test_factorized(self):
+        """Testing that the factorized input equals the input computed from the concatenated features"""
+        self.assertTrue(self.assert_same_as_concatenation().factorized_bond_input)
+
+    def test_bias(self):
+        """Testing that the bias of the input layer is added once per bond"""
+        self.assert_same_as_concatenation('--bias')
+
+    def test_extra_bond_features(self):
+        """Testing the factorized input with extra bond features"""
+        mols = [Chem.MolFromSmiles(s) for s in SMILES]
+        set_extra_bond_fdim(3)
+        self.batch = BatchMolGraph([MolGraph(mol, bond_features_extra=np.random.rand(mol.GetNumBonds(), 3))
+                                    for mol in mols])
+        self.assert_same_as_concatenation()
+
+    def test_atom_messages(self):
+        """Testing that factorization is disabled with atom messages, whose input only uses the atom features"""
+        self.assertFalse(self.assert_same_as_concatenation('--atom_messages').factorized_bond_input)
+
+    def tearDown(self):
+        reset_featurization_parameters()
@@ -0,0 +1,63 @@
+"""Chemprop unit tests for chemprop/nn_utils.py"""
+import os
+from tempfile import TemporaryDirectory
+from unittest import TestCase
+
+import torch
+import torch.distributed as dist
+import torch.multiprocessing as mp
+import torch.nn as nn
+
+from chemprop.nn_utils import all_reduce_gradients
+
+
+WORLD_SIZE = 2
+
+
+def build_model() -> nn.Module:
+    torch.manual_seed(0)
+    model = nn.Sequential(nn.Linear(3, 4), nn.ReLU(), nn.Linear(4, 1), nn.Linear(1, 1))
+    model[0].bias.requires_grad_(False)
+
+    return model
+
+
+def build_batch() -> torch.Tensor:
+    return torch.arange(24, dtype=torch.float).view(8, 3) / 10
+
+
+def compute_gradients(model: nn.Module, batch: torch.Tensor) -> None:
+    # The last layer is unused, so its parameters have no gradient
+    model[:3](batch).pow(2).mean().backward()
+
+
+def all_reduce_worker(rank: int, temp_dir: str) -> None:
+    dist.init_process_group('gloo', init_method=f'file://{os.path.join(temp_dir, "store")}',
+                            rank=rank, world_size=WORLD_SIZE)
+    model = build_model()
+    compute_gradients(model, build_batch().chunk(WORLD_SIZE)[rank])
+    all_reduce_gradients(model)
+    torch.save([p.grad for p in model.parameters()], os.path.join(temp_dir, f'grads_{rank}.pt'))
+    dist.destroy_process_group()
+
+
+class TestAllReduceGradients(TestCase):
+    """
+    Tests that averaging the gradients of the shards of a batch across processes gives the gradients of the batch.
+    """
+    def test_all_reduce_gradients(self):
+        """Testing two gloo processes, including parameters which are frozen or have no gradient"""
+        with TemporaryDirectory() as temp_dir:
+            mp.spawn(all_reduce_worker, args=(temp_dir,), nprocs=WORLD_SIZE)
+            grads = [torch.load(os.path.join(temp_dir, f'grads_{rank}.pt')) for rank in range(WORLD_SIZE)]
+
+        model = build_model()
+        compute_gradients(model, build_batch())
+        for rank_grads in grads:
+            for param, grad in zip(model.parameters(), rank_grads):
+                if not param.requires_grad:
+                    self.assertIsNone(grad)
+                elif param.grad is None:
+                    torch.testing.assert_close(grad, torch.zeros_like(param))
+                else:
+                    torch.testing.assert_close(grad, param.grad)
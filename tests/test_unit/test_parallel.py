@@ -0,0 +1,34 @@
+"""Chemprop unit tests for chemprop/train/parallel.py"""
+import os
+from unittest import TestCase
+
+import numpy as np
+
+from chemprop.train.parallel import run_jobs
+
+
+class TestRunJobs(TestCase):
+    """
+    Tests of running independent training jobs in a pool of forked processes.
+    """
+    def setUp(self):
+        self.data = np.arange(10)
+
+    def test_sequential(self):
+        """Testing that a single process runs the jobs in the main process"""
+        results = run_jobs(lambda job: (job, os.getpid()), num_jobs=3)
+        self.assertEqual(results, [(job, os.getpid()) for job in range(3)])
+
+    def test_parallel(self):
+        """Testing that jobs run in worker processes, share the data of the closure and keep their order"""
+        results = run_jobs(lambda job: (int(self.data[job] ** 2), os.getpid()), num_jobs=5, num_processes=2)
+        self.assertEqual([result for result, _ in results], [job ** 2 for job in range(5)])
+        self.assertNotIn(os.getpid(), {pid for _, pid in results})
+
+    def test_error(self):
+        """Testing that the error of a job is raised in the main process"""
+        def fail(job):
+            raise ValueError(f'job {job}')
+
+        with self.assertRaises(ValueError):
+            run_jobs(fail, num_jobs=2, num_processes=2)
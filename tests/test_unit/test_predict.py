@@ -0,0 +1,100 @@
+"""Chemprop unit tests for chemprop/train/predict.py"""
+import os
+from unittest import TestCase
+
+import numpy as np
+from rdkit import Chem
+import torch
+
+from chemprop.args import TrainArgs
+from chemprop.data import get_data, MoleculeDataLoader, MoleculeDatapoint, MoleculeDataset, set_cache_graph, \
+    StandardScaler
+from chemprop.features import reset_featurization_parameters, set_extra_bond_fdim
+from chemprop.models import MoleculeModel
+from chemprop.train.predict import predict, predict_ensemble
+
+
+TEST_DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data')
+
+
+class TestPredictEnsemble(TestCase):
+    """
+    Tests that predicting with all models of an ensemble per batch gives the predictions of predicting
+    with one model at a time.
+    """
+    def setUp(self):
+        # Graphs with extra bond features are rebuilt for each model's scaling rather than cached
+        set_cache_graph(False)
+        set_extra_bond_fdim(2)
+
+        rng = np.random.default_rng(0)
+        smiles = get_data(path=os.path.join(TEST_DATA_DIR, 'regression.csv')).smiles(flatten=True)[:20]
+        mols = [Chem.MolFromSmiles(s) for s in smiles]
+        self.data = MoleculeDataset([
+            MoleculeDatapoint(
+                smiles=[s],
+                targets=[rng.normal()],
+                features=rng.normal(size=4),
+                atom_descriptors=rng.normal(size=(mol.GetNumAtoms(), 3)),
+                bond_features=rng.normal(size=(mol.GetNumBonds(), 2))
+            )
+            for s, mol in zip(smiles, mols)
+        ])
+
+        # Each model has its own (untrained) weights and scalers
+        self.models, self.scalers = [], []
+        for seed in range(3):
+            args = TrainArgs().parse_args([
+                '--data_path', 'regression.csv', '--dataset_type', 'regression', '--features_path', 'features.csv',
+                '--atom_descriptors', 'descriptor', '--atom_descriptors_path', 'atom_descriptors.npz',
+                '--hidden_size', '16', '--no_cuda', '--quiet'
+            ])
+            args.task_names, args.features_size, args.atom_descriptors_size = ['target'], 4, 3
+
+            torch.manual_seed(seed)
+            self.models.append(MoleculeModel(args))
+
+            self.data.reset_features_and_targets()
+            subset = MoleculeDataset(self.data[seed:])
+            self.scalers.append([
+                StandardScaler().fit(np.array(subset.targets()) + seed),
+                subset.normalize_features(replace_nan_token=0),
+                subset.normalize_features(replace_nan_token=0, scale_atom_descriptors=True),
+                subset.normalize_features(replace_nan_token=0, scale_bond_features=True)
+            ])
+        self.data.reset_features_and_targets()
+
+    def test_predict_ensemble(self):
+        """Testing that the predictions match the per-model loop with atom descriptors, bond features and scaling"""
+        data_loader = MoleculeDataLoader(dataset=self.data, batch_size=8, num_workers=0)
+
+        # The per-model loop, which normalizes the whole dataset with the scalers of each model
+        expected_preds = []
+        for model, (scaler, features_scaler, atom_descriptor_scaler, bond_feature_scaler) in zip(self.models,
+                                                                                                   self.scalers):
+            self.data.reset_features_and_targets()
+            self.data.normalize_features(features_scaler)
+            self.data.normalize_features(atom_descriptor_scaler, scale_atom_descriptors=True)
+            self.data.normalize_features(bond_feature_scaler, scale_bond_features=True)
+            expected_preds.append(predict(model=model, data_loader=data_loader, scaler=scaler,
+                                          disable_progress_bar=True))
+        self.data.reset_features_and_targets()
+
+        scalers, features_scalers, atom_descriptor_scalers, bond_feature_scalers = zip(*self.scalers)
+        preds = predict_ensemble(
+            models=self.models,
+            data_loader=data_loader,
+            scalers=scalers,
+            features_scalers=features_scalers,
+            atom_descriptor_scalers=atom_descriptor_scalers,
+            bond_feature_scalers=bond_feature_scalers,
+            disable_progress_bar=True
+        )
+
+        self.assertEqual(np.shape(preds), (len(self.models), len(self.data), 1))
+        np.testing.assert_allclose(preds, expected_preds, rtol=1e-5, atol=1e-6)
+        self.assertFalse(np.allclose(preds[0], preds[1]))
+
+    def tearDown(self):
+        set_cache_graph(True)
+        reset_featurization_parameters()
@@ -0,0 +1,86 @@
+"""Chemprop unit tests for chemprop/train/predictor.py"""
+import os
+from tempfile import TemporaryDirectory
+from unittest import TestCase
+
+import numpy as np
+import torch
+
+from chemprop.args import PredictArgs, TrainArgs
+from chemprop.data import get_data, get_task_names, StandardScaler
+from chemprop.models import MoleculeModel
+from chemprop.train import make_predictions, Predictor
+from chemprop.utils import save_checkpoint
+
+
+TEST_DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data')
+DATA_PATH = os.path.join(TEST_DATA_DIR, 'regression.csv')
+
+
+class TestPredictor(TestCase):
+    """
+    Tests that a :class:`Predictor` makes the same predictions as :func:`make_predictions`.
+    """
+    def setUp(self):
+        self.temp_dir = TemporaryDirectory()
+        data = get_data(path=DATA_PATH)
+        self.smiles = data.smiles(flatten=True)[:20] + ['invalid', data.smiles(flatten=True)[0]]
+
+        # Untrained models are enough to compare the predictions
+        self.checkpoint_paths = []
+        for seed in range(2):
+            train_args = TrainArgs().parse_args([
+                '--data_path', DATA_PATH, '--dataset_type', 'regression', '--save_dir', self.temp_dir.name,
+                '--features_generator', 'morgan', '--hidden_size', '16', '--quiet'
+            ])
+            train_args.task_names = get_task_names(DATA_PATH)
+            train_args.features_size = 2048
+
+            torch.manual_seed(seed)
+            path = os.path.join(self.temp_dir.name, f'model_{seed}.pt')
+            save_checkpoint(path, MoleculeModel(train_args), StandardScaler().fit(data.targets()), args=train_args)
+            self.checkpoint_paths.append(path)
+
+    def build_args(self, *arguments: str) -> PredictArgs:
+        return PredictArgs().parse_args([
+            '--test_path', DATA_PATH, '--preds_path', os.path.join(self.temp_dir.name, 'preds.csv'),
+            '--checkpoint_paths', *self.checkpoint_paths, '--features_generator', 'morgan', '--num_workers', '0',
+            *arguments
+        ])
+
+    def assert_same_predictions(self, preds, expected_preds):
+        self.assertEqual(len(preds), len(expected_preds))
+        for pred, expected_pred in zip(preds, expected_preds):
+            if expected_pred[0] == 'Invalid SMILES':
+                self.assertEqual(pred, expected_pred)
+            else:
+                np.testing.assert_allclose(pred, expected_pred, rtol=1e-5, atol=1e-6)
+
+    def assert_same_as_make_predictions(self, *arguments: str):
+        preds, unc = Predictor(self.build_args(*arguments)).predict(self.smiles, return_uncertainty=True)
+        expected_preds, expected_unc = make_predictions(
+            args=self.build_args(*arguments),
+            smiles=[[s] for s in self.smiles],
+            return_uncertainty=True
+        )
+
+        self.assertTrue(all(isinstance(u, list) for u in unc))
+        self.assert_same_predictions(preds, expected_preds)
+        self.assert_same_predictions(unc, expected_unc)
+
+    def test_predict(self):
+        """Testing that the predictions without uncertainty match, including those of invalid SMILES"""
+        self.assert_same_as_make_predictions()
+
+    def test_uncertainty(self):
+        """Testing that the predictions and uncertainty of an ensemble match"""
+        self.assert_same_as_make_predictions('--uncertainty_method', 'ensemble')
+
+    def test_calibrator(self):
+        """Testing that the predictions and calibrated uncertainty match"""
+        self.assert_same_as_make_predictions('--uncertainty_method', 'ensemble',
+                                             '--calibration_method', 'zscaling',
+                                             '--calibration_path', DATA_PATH)
+
+    def tearDown(self):
+        self.temp_dir.cleanup()